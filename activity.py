@@ -0,0 +1,199 @@
+# Registo de atividade por utilizador e agregados materializados
+# Cada evento (pesquisa, scan, predição, compra) é acrescentado ao log e os
+# contadores por utilizador/dia/mês/marketplace são atualizados incrementalmente.
+# O dashboard lê só os contadores; os agregados podem ser reconstruídos do log.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activity_events_user ON activity_events (user_id, id);
+CREATE TABLE IF NOT EXISTS activity_rollups (
+    user_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    marketplace TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (user_id, period, marketplace, metric)
+) WITHOUT ROWID;
+"""
+
+ALL = '*'
+
+# Métricas agregadas por máximo; as restantes são somas
+MAX_METRICS = {'best_roi'}
+
+UPSERT_SUM = (
+    'INSERT INTO activity_rollups (user_id, period, marketplace, metric, value) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (user_id, period, marketplace, metric) DO UPDATE SET value = value + excluded.value'
+)
+UPSERT_MAX = (
+    'INSERT INTO activity_rollups (user_id, period, marketplace, metric, value) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (user_id, period, marketplace, metric) DO UPDATE SET value = MAX(value, excluded.value)'
+)
+
+
+def event_deltas(kind, payload):
+    """Incrementos (marketplace, métrica, valor) produzidos por um evento"""
+    deltas = []
+    if kind == 'search':
+        deltas.append((ALL, 'searches', 1))
+        for marketplace, count in payload.get('results', {}).items():
+            deltas.append((marketplace, 'search_results', count))
+    elif kind == 'scan':
+        profitable = payload.get('profitable', [])
+        deltas.append((ALL, 'scans', 1))
+        deltas.append((ALL, 'opportunities_found', payload.get('candidates', len(profitable))))
+        deltas.append((ALL, 'opportunities_profitable', len(profitable)))
+        deltas.append((ALL, 'risk_alerts', sum(1 for o in profitable if o.get('risk') == 'high')))
+        for opportunity in profitable:
+            deltas.append((ALL, 'roi_sum', opportunity['roi']))
+            deltas.append((ALL, 'best_roi', opportunity['roi']))
+            deltas.append((opportunity['marketplace'], 'opportunities_profitable', 1))
+            deltas.append((opportunity['marketplace'], 'profit_sum', opportunity['profit']))
+    elif kind == 'prediction':
+        deltas.append((ALL, 'predictions', 1))
+        if abs(payload.get('change_percent', 0)) > 5:
+            deltas.append((ALL, 'trends_identified', 1))
+    elif kind == 'purchase':
+        marketplace = payload.get('marketplace', ALL)
+        succeeded = 1 if payload.get('succeeded', True) else 0
+        deltas.append((ALL, 'purchases', 1))
+        deltas.append((ALL, 'purchases_succeeded', succeeded))
+        deltas.append((ALL, 'revenue', payload.get('profit', 0) * succeeded))
+        if marketplace != ALL:
+            deltas.append((marketplace, 'purchases', 1))
+            deltas.append((marketplace, 'revenue', payload.get('profit', 0) * succeeded))
+    return deltas
+
+
+def periods(timestamp):
+    """Granularidades mantidas: dia, mês e total"""
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return (moment.strftime('%Y-%m-%d'), moment.strftime('%Y-%m'), ALL)
+
+
+def rollup_rows(user_id, kind, payload, created_at):
+    sums, maxes = [], []
+    for marketplace, metric, value in event_deltas(kind, payload):
+        rows = maxes if metric in MAX_METRICS else sums
+        for period in periods(created_at):
+            rows.append((user_id, period, marketplace, metric, value))
+    return sums, maxes
+
+
+class ActivityLog:
+    """Log append-only com agregados mantidos em lote por um flusher em background"""
+
+    def __init__(self, flush_interval=0.5, max_buffer=10000):
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _db(self):
+        return connect('activity', SCHEMA)
+
+    def record(self, user_id, kind, payload):
+        """Regista evento sem bloquear o pedido (gravado em menos de flush_interval)"""
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                self._buffer = []
+                threading.Thread(target=self._flush_loop, name='activity-flush', daemon=True).start()
+            if len(self._buffer) >= self.max_buffer:
+                return  # backpressure: descartar em vez de crescer sem limite
+            self._buffer.append((user_id, kind, time.time(), payload))
+
+    def flush(self):
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+
+        conn = self._db()
+        with transaction(conn):
+            conn.executemany(
+                'INSERT INTO activity_events (user_id, kind, created_at, payload) VALUES (?, ?, ?, ?)',
+                [(user_id, kind, created_at, json.dumps(payload)) for user_id, kind, created_at, payload in events]
+            )
+            self._apply(conn, events)
+        return len(events)
+
+    def _apply(self, conn, events):
+        sums, maxes = [], []
+        for user_id, kind, created_at, payload in events:
+            event_sums, event_maxes = rollup_rows(user_id, kind, payload, created_at)
+            sums.extend(event_sums)
+            maxes.extend(event_maxes)
+        conn.executemany(UPSERT_SUM, sums)
+        conn.executemany(UPSERT_MAX, maxes)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar atividade: {e}")
+
+    def rollups(self, user_id, now=None):
+        """Contadores do utilizador: {período: {marketplace: {métrica: valor}}}
+
+        Lê apenas hoje, este mês, o mês anterior e o total (número limitado de linhas).
+        """
+        today, month, _ = periods(now if now is not None else time.time())
+        year, month_number = int(month[:4]), int(month[5:])
+        previous_month = f'{year - 1}-12' if month_number == 1 else f'{year}-{month_number - 1:02d}'
+
+        result = {'today': {}, 'month': {}, 'previous_month': {}, 'total': {}}
+        names = {today: 'today', month: 'month', previous_month: 'previous_month', ALL: 'total'}
+        rows = self._db().execute(
+            'SELECT period, marketplace, metric, value FROM activity_rollups '
+            'WHERE user_id = ? AND period IN (?, ?, ?, ?)',
+            (user_id, today, month, previous_month, ALL)
+        )
+        for row in rows:
+            result[names[row['period']]].setdefault(row['marketplace'], {})[row['metric']] = row['value']
+        return result
+
+    def rebuild_rollups(self, user_id=None, chunk_size=5000):
+        """Recalcula os agregados a partir do log (todos ou de um utilizador)"""
+        self.flush()
+        conn = self._db()
+        with transaction(conn):
+            if user_id is None:
+                conn.execute('DELETE FROM activity_rollups')
+            else:
+                conn.execute('DELETE FROM activity_rollups WHERE user_id = ?', (user_id,))
+
+            last_id = 0
+            while True:
+                query = 'SELECT id, user_id, kind, created_at, payload FROM activity_events WHERE id > ?'
+                params = [last_id]
+                if user_id is not None:
+                    query += ' AND user_id = ?'
+                    params.append(user_id)
+                rows = conn.execute(query + ' ORDER BY id LIMIT ?', params + [chunk_size]).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                self._apply(conn, [
+                    (row['user_id'], row['kind'], row['created_at'], json.loads(row['payload'])) for row in rows
+                ])
+
+
+activity_log = ActivityLog()
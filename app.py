@@ -1,25 +1,48 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token
+from werkzeug.middleware.proxy_fix import ProxyFix
 import bcrypt
 import json
 import random
 import os
+import threading
+import time
 from datetime import datetime, timedelta
-import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-import requests
 
-# Inicializar Flask
-app = Flask(__name__)
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'gpas-2-0-super-secret-key-2024')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
+from model_store import ModelStore
+from auth_cache import auth_cache, auth_required, current_user, user_loader
+from rate_limit import rate_limited
+from activity import activity_log
+from price_history import price_history, series_id
+import training
+from marketplace_connectors import build_connectors, product_title
+from http_client import http_client
+import memory_report
 
-# Configurar CORS
-CORS(app, origins=["*"])
+# numpy e sklearn só são importados no primeiro uso do modelo (ver get_ai_model)
 
-# Configurar JWT
-jwt = JWTManager(app)
+def _env_flag(name, default='1'):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+# Configuração por omissão (pode ser substituída em create_app)
+DEFAULT_CONFIG = {
+    'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'gpas-2-0-super-secret-key-2024'),
+    'JWT_ACCESS_TOKEN_EXPIRES': timedelta(days=30),
+    'ENABLE_PAYMENTS': _env_flag('GPAS_ENABLE_PAYMENTS'),
+    'ENABLE_AUTONOMOUS': _env_flag('GPAS_ENABLE_AUTONOMOUS'),
+    'ENABLE_MARKETING': _env_flag('GPAS_ENABLE_MARKETING'),
+    'ENABLE_SCHEDULER': _env_flag('GPAS_ENABLE_SCHEDULER'),
+    # Importar a app não arranca threads: o post_fork do gunicorn e o __main__ arrancam-nas
+    'START_BACKGROUND': _env_flag('GPAS_START_BACKGROUND', '0'),
+    # Treina o modelo antes do fork para os workers partilharem as páginas
+    'PRELOAD_MODEL': _env_flag('GPAS_PRELOAD_MODEL', '0'),
+    # Proxies à frente da app em que se confia no X-Forwarded-For (o router do Heroku é um)
+    'PROXY_FIX_HOPS': int(os.environ.get('GPAS_PROXY_HOPS', '1' if 'DYNO' in os.environ else '0'))
+}
+
+# Rotas principais da API
+api_bp = Blueprint('api', __name__)
 
 # Base de dados simulada (em produção usar PostgreSQL)
 users_db = {
@@ -36,6 +59,18 @@ users_db = {
     }
 }
 
+@user_loader
+def _load_user(email):
+    return users_db.get(email)
+
+def _apply_subscription(email, state):
+    """Reflete mudanças de subscrição (webhooks) no utilizador e nas caches"""
+    user = users_db.get(email)
+    if user is not None:
+        user["plan"] = state["plan"]
+        user["subscription_status"] = state["status"]
+    auth_cache.invalidate(email)
+
 # Dados simulados de marketplaces
 marketplaces_data = {
     "amazon": {"name": "Amazon", "fee": 0.15, "active": True},
@@ -49,15 +84,44 @@ marketplaces_data = {
     "facebook": {"name": "Facebook Marketplace", "fee": 0.05, "active": True},
     "kuantokusta": {"name": "KuantoKusta", "fee": 0.08, "active": True}
 }
+marketplace_index = {marketplace_id: i for i, marketplace_id in enumerate(marketplaces_data)}
+marketplace_connectors = build_connectors(marketplaces_data)
+
+# Produtos das oportunidades simuladas (pesquisas cujos resultados alimentam o histórico)
+ARBITRAGE_PRODUCTS = ['iPhone Case', 'Bluetooth Speaker', 'Smartwatch', 'Headphones', 'Power Bank', 'Laptop Stand']
+
+def history_features(product, marketplace_id):
+    """Sazonalidade e procura do histórico de preços (valores neutros sem histórico)"""
+    features = price_history.features(series_id(product, marketplace_id))
+    if features is None:
+        return {"seasonality": 0, "demand": 1}
+    return {"seasonality": features["seasonality"], "demand": features["demand"]}
 
 # Modelo de IA para predição de preços
+# As árvores vivem em ficheiros mapeados em memória partilhados por todos os workers
 class PricePredictionAI:
-    def __init__(self):
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+    # Intervalo entre verificações de uma nova versão publicada pelo re-treino
+    RELOAD_INTERVAL = 5.0
+
+    def __init__(self, store=None):
+        self.store = store or ModelStore()
         self.is_trained = False
-        self.train_model()
+        self.forest = self.store.load()
+        self._checked_at = time.monotonic()
+        
+        if self.forest is None:
+            with self.store.training_lock():
+                # Outro worker pode ter publicado o modelo enquanto esperávamos
+                self.forest = self.store.load()
+                if self.forest is None:
+                    self.train_model()
+        
+        self.is_trained = True
     
     def train_model(self):
+        import numpy as np
+        from sklearn.ensemble import RandomForestRegressor
+
         # Dados de treino simulados (em produção usar dados reais)
         np.random.seed(42)
         n_samples = 10000
@@ -73,16 +137,35 @@ class PricePredictionAI:
         # Target: preço futuro com variação realista
         y = X[:, 0] * (1 + 0.1 * X[:, 3] + 0.05 * X[:, 4] + np.random.normal(0, 0.02, n_samples))
         
-        self.model.fit(X, y)
+        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model.fit(X, y)
+        
+        # Publicar as árvores e descartar a cópia privada deste processo
+        self.store.publish(model)
+        self.forest = self.store.load()
         self.is_trained = True
         print("🧠 Modelo de IA treinado com sucesso")
     
+    def refresh(self):
+        """Passa para a versão ativa se o pipeline de treino publicou outra"""
+        now = time.monotonic()
+        if now - self._checked_at < self.RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        version = self.store.current_version()
+        if version is not None and version != getattr(self.forest, "version", None):
+            self.forest = self.store.load(version)
+    
     def predict_price(self, current_price, category, marketplace, seasonality=0, demand=1):
         if not self.is_trained:
             return current_price * random.uniform(0.95, 1.15)
         
+        import numpy as np
+        
+        self.refresh()
+
         features = np.array([[current_price, category, marketplace, seasonality, demand]])
-        prediction = self.model.predict(features)[0]
+        prediction = float(self.forest.predict(features)[0])
         
         # Adicionar confiança da predição
         confidence = random.uniform(0.85, 0.97)
@@ -93,22 +176,33 @@ class PricePredictionAI:
             "change_percent": round(((prediction - current_price) / current_price) * 100, 2)
         }
 
-# Inicializar IA
-ai_model = PricePredictionAI()
+# IA inicializada no primeiro uso (ou antes do fork com PRELOAD_MODEL)
+_ai_model = None
+_ai_model_lock = threading.Lock()
+
+def get_ai_model():
+    """Devolve o modelo de IA, treinando-o no primeiro uso"""
+    global _ai_model
+    if _ai_model is None:
+        with _ai_model_lock:
+            if _ai_model is None:
+                _ai_model = PricePredictionAI()
+    return _ai_model
 
 # Rotas da API
 
-@app.route('/api/health', methods=['GET'])
+@api_bp.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         "status": "healthy",
         "version": "2.0.0",
-        "ai_status": "active" if ai_model.is_trained else "training",
+        "ai_status": "active" if _ai_model is not None and _ai_model.is_trained else "standby",
         "marketplaces": len(marketplaces_data),
         "timestamp": datetime.now().isoformat()
     })
 
-@app.route('/api/auth/register', methods=['POST'])
+@api_bp.route('/api/auth/register', methods=['POST'])
+@rate_limited(cost=5)
 def register():
     data = request.get_json()
     
@@ -153,7 +247,8 @@ def register():
         }
     })
 
-@app.route('/api/auth/login', methods=['POST'])
+@api_bp.route('/api/auth/login', methods=['POST'])
+@rate_limited(cost=5)
 def login():
     data = request.get_json()
     
@@ -185,72 +280,87 @@ def login():
         }
     })
 
-@app.route('/api/search', methods=['POST'])
-@jwt_required()
-def search_products():
-    current_user_email = get_jwt_identity()
-    user = users_db.get(current_user_email)
+def search_params():
+    """Valida o pedido de pesquisa: (utilizador, query, categoria, resposta de erro)"""
+    user = current_user()
     
     if not user:
-        return jsonify({"error": "Utilizador não encontrado"}), 404
+        return None, None, None, (jsonify({"error": "Utilizador não encontrado"}), 404)
     
     data = request.get_json()
     query = data.get('query', '')
+    category = int(data.get('category', -1))
     
     if not query:
-        return jsonify({"error": "Query de pesquisa é obrigatória"}), 400
-    
-    # Simular pesquisa em múltiplos marketplaces
+        return None, None, None, (jsonify({"error": "Query de pesquisa é obrigatória"}), 400)
+    return user, query, category, None
+
+def search_response(user, query, category, outcomes, started):
+    """Resposta de /api/search a partir de {marketplace: produtos ou exceção}"""
     results = []
+    failed = []
     
-    for marketplace_id, marketplace in marketplaces_data.items():
-        if marketplace['active']:
-            # Simular produtos encontrados
-            for i in range(random.randint(3, 8)):
-                base_price = random.uniform(10, 500)
-                
-                product = {
-                    "id": f"{marketplace_id}_{i}_{random.randint(1000, 9999)}",
-                    "title": f"{query} - Variante {i+1}",
-                    "marketplace": marketplace['name'],
-                    "marketplace_id": marketplace_id,
-                    "price": round(base_price, 2),
-                    "currency": "EUR",
-                    "availability": random.choice(["in_stock", "limited", "out_of_stock"]),
-                    "rating": round(random.uniform(3.5, 5.0), 1),
-                    "reviews": random.randint(10, 1000),
-                    "shipping_cost": round(random.uniform(0, 15), 2),
-                    "estimated_delivery": f"{random.randint(1, 14)} dias",
-                    "seller_rating": round(random.uniform(4.0, 5.0), 1),
-                    "image_url": f"https://via.placeholder.com/300x300?text={query.replace(' ', '+')}"
-                }
-                
-                results.append(product)
+    for marketplace_id, products in outcomes.items():
+        if isinstance(products, Exception):
+            print(f"Erro na pesquisa em {marketplace_id}: {products}")
+            failed.append(marketplace_id)
+            continue
+        
+        for product in products:
+            results.append(product)
+            price_history.record(product["title"], marketplace_id, product["price"],
+                                 category, marketplace_index[marketplace_id])
     
     # Atualizar contador de API calls
     user['api_calls_today'] += 1
+    results_per_marketplace = {}
+    for product in results:
+        marketplace_id = product["marketplace_id"]
+        results_per_marketplace[marketplace_id] = results_per_marketplace.get(marketplace_id, 0) + 1
+    activity_log.record(user["id"], "search", {"query": query, "results": results_per_marketplace})
     
     return jsonify({
         "query": query,
         "total_results": len(results),
-        "marketplaces_searched": len([m for m in marketplaces_data.values() if m['active']]),
+        "marketplaces_searched": len(outcomes),
+        "marketplaces_failed": failed,
         "results": results,
-        "search_time": f"{random.uniform(0.5, 2.0):.2f}s"
+        "search_time": f"{time.perf_counter() - started:.2f}s"
     })
 
-@app.route('/api/arbitrage/opportunities', methods=['GET'])
-@jwt_required()
+@api_bp.route('/api/search', methods=['POST'])
+@auth_required
+@rate_limited(cost=5)
+def search_products():
+    user, query, category, error = search_params()
+    if error:
+        return error
+    
+    # Pesquisar em cada marketplace ativo (simulado ou via GPAS_MARKETPLACE_API_URL)
+    started = time.perf_counter()
+    outcomes = {}
+    for marketplace_id, connector in marketplace_connectors.items():
+        try:
+            outcomes[marketplace_id] = connector.search(query)
+        except Exception as e:
+            outcomes[marketplace_id] = e
+    
+    return search_response(user, query, category, outcomes, started)
+
+@api_bp.route('/api/arbitrage/opportunities', methods=['GET'])
+@auth_required
+@rate_limited(cost=10)
 def get_arbitrage_opportunities():
-    current_user_email = get_jwt_identity()
-    user = users_db.get(current_user_email)
+    user = current_user()
     
     if not user:
         return jsonify({"error": "Utilizador não encontrado"}), 404
     
     # Simular oportunidades de arbitragem encontradas pela IA
     opportunities = []
+    candidates = random.randint(15, 50)
     
-    for i in range(random.randint(15, 50)):
+    for i in range(candidates):
         source_marketplace = random.choice(list(marketplaces_data.keys()))
         target_marketplace = random.choice([m for m in marketplaces_data.keys() if m != source_marketplace])
         
@@ -271,9 +381,11 @@ def get_arbitrage_opportunities():
         # Calcular score de risco (0-100, menor é melhor)
         risk_score = random.uniform(10, 85)
         
+        # Mesmo título que um resultado de /api/search: o histórico de preços é o da mesma série
+        product_name = product_title(random.choice(ARBITRAGE_PRODUCTS), random.randint(0, 7))
         opportunity = {
             "id": f"opp_{i+1}_{random.randint(1000, 9999)}",
-            "product_name": f"Produto {i+1} - {random.choice(['iPhone Case', 'Bluetooth Speaker', 'Smartwatch', 'Headphones', 'Power Bank', 'Laptop Stand'])}",
+            "product_name": product_name,
             "source": {
                 "marketplace": marketplaces_data[source_marketplace]['name'],
                 "marketplace_id": source_marketplace,
@@ -309,10 +421,11 @@ def get_arbitrage_opportunities():
                     "Novo no mercado"
                 ], random.randint(1, 3))
             },
-            "ai_prediction": ai_model.predict_price(
+            "ai_prediction": get_ai_model().predict_price(
                 target_price, 
                 random.randint(0, 9), 
-                random.randint(0, 4)
+                random.randint(0, 4),
+                **history_features(product_name, target_marketplace)
             ),
             "estimated_sales_per_month": random.randint(5, 50),
             "competition_level": random.choice(["low", "medium", "high"]),
@@ -327,6 +440,16 @@ def get_arbitrage_opportunities():
     # Ordenar por lucro líquido (maior primeiro)
     opportunities.sort(key=lambda x: x["profit"]["net"], reverse=True)
     
+    activity_log.record(user["id"], "scan", {
+        "candidates": candidates,
+        "profitable": [{
+            "marketplace": o["source"]["marketplace_id"],
+            "roi": o["profit"]["roi"],
+            "profit": o["profit"]["net"],
+            "risk": o["risk"]["level"]
+        } for o in opportunities]
+    })
+    
     # Limitar resultados baseado no plano
     plan_limits = {"starter": 20, "professional": 100, "enterprise": 1000}
     limit = plan_limits.get(user["plan"], 20)
@@ -346,8 +469,9 @@ def get_arbitrage_opportunities():
         "marketplaces_scanned": len(marketplaces_data)
     })
 
-@app.route('/api/predict/price', methods=['POST'])
-@jwt_required()
+@api_bp.route('/api/predict/price', methods=['POST'])
+@auth_required
+@rate_limited(cost=2)
 def predict_price():
     data = request.get_json()
     
@@ -358,11 +482,21 @@ def predict_price():
     if not current_price:
         return jsonify({"error": "Preço atual é obrigatório"}), 400
     
-    prediction = ai_model.predict_price(
+    # Com produto e marketplace identificados, usar o histórico de preços
+    features = {}
+    if data.get('product') and data.get('marketplace_id') in marketplaces_data:
+        features = history_features(data['product'], data['marketplace_id'])
+    
+    prediction = get_ai_model().predict_price(
         current_price, 
         product_category, 
-        marketplace
+        marketplace,
+        **features
     )
+    # Utilizador criado noutro worker (ou antes de um restart): a predição não depende dele
+    user = current_user()
+    if user is not None:
+        activity_log.record(user["id"], "prediction", {"change_percent": prediction["change_percent"]})
     
     return jsonify({
         "current_price": current_price,
@@ -371,17 +505,55 @@ def predict_price():
         "timestamp": datetime.now().isoformat()
     })
 
-@app.route('/api/stats/dashboard', methods=['GET'])
-@jwt_required()
+@api_bp.route('/api/prices/history', methods=['GET'])
+@auth_required
+@rate_limited(cost=2)
+def get_price_history():
+    product = request.args.get('product', '')
+    marketplace_id = request.args.get('marketplace_id', '')
+    
+    if not product or marketplace_id not in marketplaces_data:
+        return jsonify({"error": "Produto e marketplace são obrigatórios"}), 400
+    
+    days = min(request.args.get('days', 30, type=int), 365)
+    bucket = max(request.args.get('bucket', 86400, type=int), 60)
+    series = series_id(product, marketplace_id)
+    now = datetime.now().timestamp()
+    
+    return jsonify({
+        "product": product,
+        "marketplace_id": marketplace_id,
+        "bucket_seconds": bucket,
+        "history": price_history.downsample(series, bucket, now - days * 86400, now),
+        "features": price_history.features(series, now)
+    })
+
+@api_bp.route('/api/stats/dashboard', methods=['GET'])
+@auth_required
+@rate_limited(cost=1)
 def get_dashboard_stats():
-    current_user_email = get_jwt_identity()
-    user = users_db.get(current_user_email)
+    user = current_user()
     
     if not user:
         return jsonify({"error": "Utilizador não encontrado"}), 404
     
-    # Estatísticas simuladas baseadas no utilizador
-    base_revenue = user.get('total_revenue', 0)
+    # Contadores materializados (activity.py): leitura de poucas linhas, sem varrer o histórico
+    rollups = activity_log.rollups(user["id"])
+    today = rollups["today"].get("*", {})
+    month = rollups["month"].get("*", {})
+    previous_month = rollups["previous_month"].get("*", {})
+    total = rollups["total"].get("*", {})
+    
+    profitable_today = today.get("opportunities_profitable", 0)
+    purchases = total.get("purchases", 0)
+    month_revenue = month.get("revenue", 0)
+    previous_revenue = previous_month.get("revenue", 0)
+    marketplace_profit = {
+        marketplace: metrics.get("profit_sum", 0)
+        for marketplace, metrics in rollups["month"].items() if marketplace != "*"
+    }
+    
+    last_training = training.last_published()
     
     stats = {
         "user": {
@@ -391,40 +563,75 @@ def get_dashboard_stats():
             "api_calls_today": user["api_calls_today"]
         },
         "revenue": {
-            "total": round(base_revenue, 2),
-            "this_month": round(base_revenue * 0.15, 2),
-            "today": round(base_revenue * 0.005, 2),
-            "growth_rate": round(random.uniform(15, 45), 1)
+            "total": round(user.get('total_revenue', 0) + total.get("revenue", 0), 2),
+            "this_month": round(month_revenue, 2),
+            "today": round(today.get("revenue", 0), 2),
+            "growth_rate": round((month_revenue - previous_revenue) / previous_revenue * 100, 1) if previous_revenue else 0
         },
         "opportunities": {
-            "found_today": random.randint(50, 200),
-            "profitable": random.randint(30, 150),
-            "avg_roi": round(random.uniform(25, 85), 1),
-            "best_roi": round(random.uniform(100, 300), 1)
+            "found_today": int(today.get("opportunities_found", 0)),
+            "profitable": int(profitable_today),
+            "avg_roi": round(today.get("roi_sum", 0) / profitable_today, 1) if profitable_today else 0,
+            "best_roi": round(today.get("best_roi", 0), 1)
         },
         "automation": {
-            "active_scans": random.randint(5, 25),
-            "auto_purchases": random.randint(0, 15),
-            "success_rate": round(random.uniform(85, 97), 1),
-            "time_saved": f"{random.randint(2, 8)} horas/dia"
+            "active_scans": int(today.get("scans", 0)),
+            "auto_purchases": int(today.get("purchases", 0)),
+            "success_rate": round(total.get("purchases_succeeded", 0) / purchases * 100, 1) if purchases else 0,
+            # ~1 minuto por marketplace verificado manualmente
+            "time_saved": f"{round(today.get('scans', 0) * len(marketplaces_data) / 60, 1)} horas/dia"
         },
         "marketplaces": {
             "connected": len([m for m in marketplaces_data.values() if m['active']]),
             "total_available": len(marketplaces_data),
-            "most_profitable": random.choice(list(marketplaces_data.keys())),
+            "most_profitable": max(marketplace_profit, key=marketplace_profit.get) if marketplace_profit else None,
             "scan_frequency": "Cada 15 minutos"
         },
         "ai_insights": {
-            "predictions_accuracy": round(random.uniform(88, 96), 1),
-            "trends_identified": random.randint(15, 40),
-            "risk_alerts": random.randint(2, 8),
-            "recommendations": random.randint(10, 30)
+            # Precisão do modelo ativo no holdout do último re-treino
+            "predictions_accuracy": round(last_training["candidate"]["accuracy"], 1) if last_training else None,
+            "trends_identified": int(today.get("trends_identified", 0)),
+            "risk_alerts": int(today.get("risk_alerts", 0)),
+            "recommendations": int(today.get("predictions", 0))
         }
     }
     
     return jsonify(stats)
 
-@app.route('/api/marketplaces', methods=['GET'])
+@api_bp.route('/api/system/memory', methods=['GET'])
+@auth_required
+def get_memory_report():
+    """Memória partilhada vs privada de cada worker"""
+    report = memory_report.collect()
+    report["model"] = {
+        "loaded": _ai_model is not None,
+        "version": getattr(_ai_model.forest, "version", None) if _ai_model is not None else None,
+        "mapped_bytes": _ai_model.forest.nbytes if _ai_model is not None else 0
+    }
+    report["timestamp"] = datetime.now().isoformat()
+    return jsonify(report)
+
+@api_bp.route('/api/system/training', methods=['GET'])
+@auth_required
+def get_training_runs():
+    """Relatórios das últimas execuções do re-treino (tempo, memória, precisão)"""
+    return jsonify({
+        "active_version": ModelStore().current_version(),
+        "runs": training.runs(request.args.get('limit', 20, type=int))
+    })
+
+@api_bp.route('/api/system/http', methods=['GET'])
+@auth_required
+def get_http_stats():
+    """Chamadas externas deste worker por host: latências, erros, tentativas e circuito"""
+    return jsonify({
+        "pid": os.getpid(),
+        "hosts": http_client.stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@api_bp.route('/api/marketplaces', methods=['GET'])
+@rate_limited(cost=1)
 def get_marketplaces():
     return jsonify({
         "marketplaces": marketplaces_data,
@@ -433,7 +640,7 @@ def get_marketplaces():
     })
 
 # Rota para servir frontend (em produção usar servidor web dedicado)
-@app.route('/')
+@api_bp.route('/')
 def serve_frontend():
     return """
     <!DOCTYPE html>
@@ -451,11 +658,70 @@ def serve_frontend():
     </html>
     """
 
+def start_background_services(app=None):
+    """Arranca serviços em background deste processo (chamar depois do fork)"""
+    config = app.config if app is not None else DEFAULT_CONFIG
+    if config['ENABLE_SCHEDULER']:
+        from scheduler import scheduler
+        scheduler.start()
+    
+    if config['ENABLE_PAYMENTS']:
+        from payments import webhook_queue
+        from subscriptions import subscription_store
+        subscription_store.start_listener()
+        webhook_queue.start_workers()
+
+def create_app(config=None):
+    """Cria a aplicação Flask; os módulos opcionais só são importados se ativos"""
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    
+    # IP real do cliente (buckets anónimos do rate limiting) atrás de proxies de confiança
+    if app.config['PROXY_FIX_HOPS']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'],
+                                x_proto=app.config['PROXY_FIX_HOPS'])
+    
+    # Configurar CORS
+    CORS(app, origins=["*"])
+    
+    # Configurar JWT
+    JWTManager(app)
+    
+    app.register_blueprint(api_bp)
+    
+    if app.config['ENABLE_PAYMENTS']:
+        from payments import register_payments
+        from subscriptions import subscription_store
+        register_payments(app)
+        if _apply_subscription not in subscription_store.listeners:
+            subscription_store.on_change(_apply_subscription)
+    
+    if app.config['ENABLE_AUTONOMOUS']:
+        from autonomous_features import register_autonomous_features
+        register_autonomous_features(app)
+    
+    if app.config['ENABLE_MARKETING']:
+        from viral_marketing import register_marketing  # também regista tarefas no agendador
+        register_marketing(app)
+    
+    if app.config['PRELOAD_MODEL']:
+        get_ai_model()
+    
+    if app.config['START_BACKGROUND']:
+        start_background_services(app)
+    
+    return app
+
+# Instância usada pelo gunicorn (app:app)
+app = create_app()
+
 if __name__ == '__main__':
     print("🚀 GPAS 2.0 Backend iniciado!")
     print("🧠 IA de predição ativa")
     print("🔒 Segurança de nível bancário ativa")
     print("=" * 50)
     
+    start_background_services(app)
     app.run(host='0.0.0.0', port=5000, debug=False)
-
@@ -0,0 +1,140 @@
+# Modo ASGI do GPAS 2.0 (GPAS_ASGI=1, uvicorn workers no gunicorn)
+# /api/search, /api/arbitrage/opportunities e /success correm como handlers
+# assíncronos: um pedido à espera de um marketplace ou do Stripe já não ocupa o
+# worker inteiro. O resto da app Flask é servido através do WsgiToAsgi.
+
+import asyncio
+import time
+from io import BytesIO
+from urllib.parse import quote
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import app as gpas
+from auth_cache import auth_required
+from checkout_cache import checkout_cache
+from http_client import http_client
+from payments import STRIPE_API_BASE, STRIPE_SECRET_KEY, render_success_page
+from rate_limit import rate_limited
+
+flask_app = gpas.app
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+
+# Handlers assíncronos (mesmas regras de autenticação e limites que as rotas Flask;
+# auth_required e rate_limited verificam numa thread, fora do event loop)
+
+@auth_required
+@rate_limited(cost=5)
+async def search_products():
+    user, query, category, error = gpas.search_params()
+    if error:
+        return error
+
+    # Todos os marketplaces em paralelo
+    started = time.perf_counter()
+    connectors = gpas.marketplace_connectors
+    outcomes = await asyncio.gather(
+        *(connector.search_async(query) for connector in connectors.values()),
+        return_exceptions=True
+    )
+    return gpas.search_response(user, query, category, dict(zip(connectors, outcomes)), started)
+
+
+async def arbitrage_opportunities():
+    # Trabalho de CPU (modelo) e SQLite: numa thread, para não bloquear o event loop.
+    # to_thread copia o contexto, pelo que o pedido Flask continua disponível.
+    return await asyncio.to_thread(gpas.get_arbitrage_opportunities)
+
+
+async def payment_success():
+    session_id = request.args.get('session_id')
+    if not session_id or not session_id.startswith('cs_'):
+        return "Sessão inválida", 400
+
+    try:
+        session = await asyncio.to_thread(checkout_cache.get, session_id)
+        if session is None:
+            # O id vem do cliente: escapado, nunca sai de /v1/checkout/sessions/
+            response = await http_client.request_async(
+                'GET', f"{STRIPE_API_BASE}/v1/checkout/sessions/{quote(session_id, safe='')}",
+                auth=(STRIPE_SECRET_KEY, '')
+            )
+            response.raise_for_status()
+            session = await asyncio.to_thread(checkout_cache.put, response.json())
+        return render_success_page(session_id, session)
+    except Exception as e:
+        return f"Erro ao verificar pagamento: {e}", 500
+
+
+ASYNC_ROUTES = {
+    ('POST', '/api/search'): search_products,
+    ('GET', '/api/arbitrage/opportunities'): arbitrage_opportunities
+}
+if flask_app.config['ENABLE_PAYMENTS']:
+    ASYNC_ROUTES[('GET', '/success')] = payment_success
+
+
+async def read_body(receive):
+    body = BytesIO()
+    while True:
+        message = await receive()
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+async def dispatch(view, scope, receive, send):
+    """Corre um handler assíncrono dentro de um contexto de pedido Flask"""
+    adapter = WsgiToAsgiInstance(flask_app)
+    adapter.scope = scope
+    environ = adapter.build_environ(scope, await read_body(receive))
+    if isinstance(flask_app.wsgi_app, ProxyFix):
+        # Estes handlers não passam pelo wsgi_app: aplica o mesmo ProxyFix ao environ
+        ProxyFix(lambda environ, start_response: None, x_for=flask_app.wsgi_app.x_for,
+                 x_proto=flask_app.wsgi_app.x_proto)(environ, None)
+
+    with flask_app.request_context(environ):
+        try:
+            rv = flask_app.preprocess_request()
+            if rv is None:
+                rv = await view()
+        except Exception as e:
+            # Erros de JWT e HTTPException têm handlers registados na app
+            try:
+                rv = flask_app.handle_user_exception(e)
+            except Exception as unhandled:
+                rv = flask_app.handle_exception(unhandled)
+        response = flask_app.process_response(flask_app.make_response(rv))
+        body = response.get_data()
+        headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()]
+
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await http_client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    view = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if view is None:
+        await wsgi_fallback(scope, receive, send)
+        return
+    await dispatch(view, scope, receive, send)
@@ -0,0 +1,166 @@
+# Camada de autenticação com cache de tokens verificados
+# Guarda as claims já verificadas (chave: hash do token) junto com o utilizador,
+# evitando verificar a assinatura e ir à base de dados em cada pedido.
+
+import asyncio
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+# Token malformado, expirado ou com assinatura inválida
+TOKEN_ERRORS = (JWTExtendedException, PyJWTError)
+
+
+class AuthCache:
+    """Cache LRU de tokens verificados, limitada pela expiração de cada token"""
+
+    def __init__(self, max_entries=10000, max_ttl=60):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.entries = OrderedDict()
+        self.by_identity = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def token_key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token, now=None):
+        key = self.token_key(token)
+        now = now if now is not None else time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry['expires_at'] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token, claims, user, now=None):
+        key = self.token_key(token)
+        now = now if now is not None else time.time()
+        identity = claims['sub']
+        entry = {
+            'identity': identity,
+            'claims': claims,
+            'user': user,
+            # Nunca para além da expiração do próprio token
+            'expires_at': min(claims.get('exp', now + self.max_ttl), now + self.max_ttl)
+        }
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.by_identity.setdefault(identity, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+        return entry
+
+    def invalidate(self, identity):
+        """Descarta todos os tokens em cache de um utilizador (mudança de plano, webhook)"""
+        with self.lock:
+            for key in list(self.by_identity.get(identity, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_identity.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        keys = self.by_identity.get(entry['identity'])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_identity[entry['identity']]
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+auth_cache = AuthCache(
+    max_entries=int(os.environ.get('GPAS_AUTH_CACHE_SIZE', 10000)),
+    max_ttl=int(os.environ.get('GPAS_AUTH_CACHE_TTL', 60))
+)
+
+_user_loader = lambda identity: None
+
+
+def user_loader(func):
+    """Regista função identity -> utilizador (decorador, como no flask_jwt_extended)"""
+    global _user_loader
+    _user_loader = func
+    return func
+
+
+def _bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[7:].strip() or None
+    return None
+
+
+def authenticate(optional=False):
+    """Autentica o pedido atual, usando a cache quando possível
+
+    Devolve a entrada {'identity', 'claims', 'user'} ou None (só com optional=True).
+    Erros de token propagam as exceções do flask_jwt_extended (respostas 401/422).
+    """
+    if g.get('auth') is not None or ('auth' in g and optional):
+        return g.auth
+
+    token = _bearer_token()
+    entry = auth_cache.get(token) if token else None
+    if entry is None:
+        if verify_jwt_in_request(optional=optional) is None:
+            g.auth = None
+            return None
+        claims = get_jwt()
+        user = _user_loader(claims['sub'])
+        if user is None:
+            entry = {'identity': claims['sub'], 'claims': claims, 'user': None}
+        else:
+            entry = auth_cache.put(token, claims, user)
+
+    g.auth = entry
+    return entry
+
+
+def auth_required(view):
+    """Substitui @jwt_required(): exige token válido e hidrata o utilizador"""
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            # Cache, verificação do JWT e user_loader são síncronos: fora do event loop
+            await asyncio.to_thread(authenticate)
+            return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        authenticate()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def current_identity():
+    return g.auth['identity'] if g.get('auth') else None
+
+
+def current_user():
+    return g.auth['user'] if g.get('auth') else None
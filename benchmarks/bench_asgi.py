@@ -0,0 +1,123 @@
+# Capacidade por worker: gunicorn síncrono vs. modo ASGI (GPAS_ASGI=1)
+# Arranca o stand-in dos marketplaces com latência fixa e, para cada modo, o
+# gunicorn com os mesmos workers; mede throughput, p50 e p99 de /api/search a
+# vários níveis de ligações concorrentes.
+#
+# Uso:
+#   python benchmarks/bench_asgi.py --concurrency 1,8,32,128 --marketplace-latency-ms 150
+#   python benchmarks/bench_asgi.py --mode asgi --mix search=3,arbitrage=1 --output asgi.json
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import Client, Stats, login, parse_mix, run_mix, start_gunicorn  # noqa: E402
+from standins.marketplace_standin import MarketplaceStandin  # noqa: E402
+
+
+def run_level(base_url, token, mix, concurrency, duration):
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=run_mix, args=(base_url, stats, token, mix, deadline, 0))
+        for _ in range(concurrency)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.report(time.monotonic() - started)
+
+
+def run_mode(args, mode, marketplaces):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(args.workers),
+        GPAS_ASGI='1' if mode == 'asgi' else '0',
+        GPAS_DATA_DIR=tempfile.mkdtemp(prefix='gpas-bench-asgi-'),
+        GPAS_MARKETPLACE_API_URL=marketplaces.url,
+        GPAS_RATE_LIMIT='0'
+    )
+    proc, base_url = start_gunicorn(args, env)
+    try:
+        token = login(Client(base_url, Stats()))
+        if token is None:
+            raise RuntimeError('login do utilizador demo falhou')
+        run_level(base_url, token, args.mix, 1, args.warmup)
+
+        levels = []
+        for concurrency in args.concurrency:
+            report = run_level(base_url, token, args.mix, concurrency, args.duration)
+            latencies = [e['latency_ms'] for e in report['endpoints'].values()]
+            levels.append({
+                'concurrency': concurrency,
+                'throughput_rps': report['throughput_rps'],
+                'throughput_rps_per_worker': round(report['throughput_rps'] / args.workers, 2),
+                'error_rate': report['error_rate'],
+                'p50_ms': max(l['p50'] for l in latencies) if latencies else None,
+                'p99_ms': max(l['p99'] for l in latencies) if latencies else None,
+                'endpoints': {
+                    name: {k: e[k] for k in ('requests', 'throughput_rps', 'errors', 'status', 'latency_ms')}
+                    for name, e in report['endpoints'].items()
+                }
+            })
+            print(f"{mode:>4} c={concurrency:<4} {report['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {levels[-1]['p50_ms']} ms  p99 {levels[-1]['p99_ms']} ms  "
+                  f"erros {report['error_rate']:.2%}", file=sys.stderr)
+        return levels
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capacidade por worker: gunicorn síncrono vs. ASGI')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--mode', action='append', choices=['sync', 'asgi'], help='repetível; omissão: ambos')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', default='1,8,32,128')
+    parser.add_argument('--duration', type=float, default=15, help='segundos por nível')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('search'))
+    parser.add_argument('--marketplace-latency-ms', type=float, default=150)
+    parser.add_argument('--marketplace-jitter-ms', type=float, default=20)
+    parser.add_argument('--boot-timeout', type=float, default=180)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(',')]
+
+    marketplaces = MarketplaceStandin(latency_ms=args.marketplace_latency_ms,
+                                      jitter_ms=args.marketplace_jitter_ms).start()
+    try:
+        modes = {mode: run_mode(args, mode, marketplaces) for mode in (args.mode or ['sync', 'asgi'])}
+    finally:
+        marketplaces.stop()
+
+    report = {
+        'label': args.label,
+        'config': {
+            'workers': args.workers,
+            'duration_seconds': args.duration,
+            'mix': args.mix,
+            'marketplace_latency_ms': args.marketplace_latency_ms,
+            'cpus': os.cpu_count()
+        },
+        'modes': modes
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Throughput da geração de campanhas virais (campanhas/s)
+# Compara o ciclo antigo (uma campanha de cada vez com random.choice + str.format)
+# com o CampaignRenderer em lote, só em dicts e em NDJSON, e confirma que a mesma
+# seed produz exatamente o mesmo NDJSON.
+#
+# Uso:
+#   python benchmarks/bench_campaigns.py --campaigns 20000
+#   python benchmarks/bench_campaigns.py --campaigns 100000 --brand "Acme Arbitrage" --output campanhas.json
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from viral_marketing import CampaignRenderer, ViralMarketingEngine  # noqa: E402
+
+
+def legacy_campaign(engine):
+    """O ciclo de run_viral_campaign antes do renderer em lote"""
+    campaign = {
+        'social_media': [],
+        'seo_content': [engine.create_seo_content() for _ in range(5)],
+        'email_campaigns': [],
+        'referral_program': engine.create_referral_program(),
+        'pr_content': [],
+        'estimated_reach': 0
+    }
+    for platform_name in ['twitter', 'linkedin', 'reddit']:
+        for _ in range(3):
+            content = engine.generate_viral_content(platform_name)
+            content['viral_score'] = engine.calculate_viral_potential('success_story')
+            campaign['social_media'].append(content)
+            campaign['estimated_reach'] += content['estimated_reach']
+    campaign['email_campaigns'] = [engine.generate_email_campaign() for _ in range(7)]
+    campaign['pr_content'] = [engine.generate_pr_content() for _ in range(3)]
+    campaign['estimated_leads'] = int(campaign['estimated_reach'] * 0.02)
+    campaign['estimated_revenue'] = campaign['estimated_leads'] * 49
+    return campaign
+
+
+def measure(func, count, repeat):
+    """Melhor de `repeat` execuções; `func` devolve os bytes produzidos (ou None)"""
+    best, size = None, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'seconds': round(best, 4),
+        'campaigns_per_second': round(count / best, 1),
+        'bytes_per_campaign': round(size / count, 1) if size else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput da geração de campanhas em lote')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--campaigns', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--brand', default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    renderer = CampaignRenderer()
+    count = args.campaigns
+    # Compila os templates e importa o numpy fora das medições
+    sum(1 for _ in renderer.render_ndjson(1, args.seed, args.brand))
+
+    engine = ViralMarketingEngine()
+
+    def batch_render():
+        for _ in renderer.render(count, args.seed, args.brand):
+            pass
+
+    def batch_ndjson():
+        return sum(len(chunk) for chunk in renderer.render_ndjson(count, args.seed, args.brand, 'bench'))
+
+    def legacy_render():
+        for _ in range(count):
+            legacy_campaign(engine)
+
+    def legacy_ndjson():
+        return sum(len(json.dumps(legacy_campaign(engine), ensure_ascii=False).encode('utf-8')) + 1
+                   for _ in range(count))
+
+    cases = {
+        'batch_render': measure(batch_render, count, args.repeat),
+        'batch_ndjson': measure(batch_ndjson, count, args.repeat)
+    }
+    if not args.skip_legacy:
+        cases['legacy_render'] = measure(legacy_render, count, args.repeat)
+        cases['legacy_ndjson'] = measure(legacy_ndjson, count, args.repeat)
+
+    digests = {
+        hashlib.sha256(b''.join(renderer.render_ndjson(min(count, 2000), args.seed, args.brand, 'bench'))).hexdigest()
+        for _ in range(2)
+    }
+
+    report = {
+        'label': args.label,
+        'config': {'campaigns': count, 'seed': args.seed, 'brand': args.brand, 'repeat': args.repeat},
+        'python': platform.python_version(),
+        'cases': cases,
+        'speedup': {
+            'render': round(cases['legacy_render']['seconds'] / cases['batch_render']['seconds'], 2),
+            'ndjson': round(cases['legacy_ndjson']['seconds'] / cases['batch_ndjson']['seconds'], 2)
+        } if not args.skip_legacy else None,
+        'reproducible': len(digests) == 1
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Mensagens/s do EmailPipeline contra o SMTP sink local
+# Enche um subscription_store temporário com destinatários (uma fração rejeitada
+# pelo sink com 550/451) e compara o envio ingénuo (uma ligação SMTP nova por
+# mensagem, em série) com o pipeline a vários números de workers.
+#
+# Uso:
+#   python benchmarks/bench_email.py --recipients 20000 --workers 1,4,16 --latency-ms 5 --connect-latency-ms 100
+#   python benchmarks/bench_email.py --max-messages-per-connection 100 --output email.json
+
+import argparse
+import json
+import os
+import smtplib
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-bench-email-'))
+
+from email_pipeline import BounceTracker, CampaignTemplate, EmailPipeline, SMTPPool  # noqa: E402
+from standins.smtp_sink import SMTPSink  # noqa: E402
+from subscriptions import SubscriptionStore  # noqa: E402
+
+SENDER = 'GPAS 2.0 <noreply@gpas2.com>'
+SUBJECT = '🚀 Como gerei €12000 este mês com IA'
+PREVIEW = 'A estratégia que mudou tudo...'
+
+
+def fill(store, count, bounce_every):
+    """Subscrições ativas; cada `bounce_every` uma é rejeitada pelo sink (alternando 550 e 451)"""
+    now = time.time()
+    rows = []
+    for i in range(count):
+        prefix = 'user'
+        if bounce_every and i % bounce_every == 0:
+            prefix = 'bounce' if (i // bounce_every) % 2 else 'defer'
+        rows.append((f'{prefix}{i:07d}@example.com', f'cus_{i}', None,
+                     'starter' if i % 3 else 'professional', 'monthly', 'active', now))
+    store._db().executemany(
+        'INSERT INTO subscriptions (email, customer_id, subscription_id, plan, billing, status, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+    )
+
+
+def naive(sink, store, limit):
+    """Uma ligação por mensagem, em série (o envio sem pipeline)"""
+    template = CampaignTemplate(SENDER, SUBJECT, PREVIEW)
+    sent = 0
+    started = time.perf_counter()
+    for recipient in store.iter_subscribers(['active']):
+        if sent >= limit:
+            break
+        email, message = template.render([recipient])[0]
+        try:
+            with smtplib.SMTP('127.0.0.1', sink.port) as conn:
+                conn.sendmail('noreply@gpas2.com', [email], message)
+        except smtplib.SMTPRecipientsRefused:
+            pass
+        sent += 1
+    elapsed = time.perf_counter() - started
+    return {'messages': sent, 'seconds': round(elapsed, 3), 'messages_per_second': round(sent / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mensagens/s do pipeline de email')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--recipients', type=int, default=20000)
+    parser.add_argument('--workers', default='1,4,16')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=5, help='latência do sink por mensagem')
+    parser.add_argument('--connect-latency-ms', type=float, default=100,
+                        help='custo de abrir uma ligação (TLS + AUTH)')
+    parser.add_argument('--bounce-every', type=int, default=50)
+    parser.add_argument('--max-messages-per-connection', type=int, default=None)
+    parser.add_argument('--naive-messages', type=int, default=500, help='0 desliga a comparação')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    store = SubscriptionStore()
+    fill(store, args.recipients, args.bounce_every)
+    sink = SMTPSink(latency_ms=args.latency_ms, max_messages_per_connection=args.max_messages_per_connection,
+                    connect_latency_ms=args.connect_latency_ms).start()
+
+    try:
+        baseline = naive(sink, store, args.naive_messages) if args.naive_messages else None
+        levels = []
+        for workers in (int(w) for w in args.workers.split(',')):
+            connections = sink.connections
+            # Bounces novos a cada nível, para que todos enviem o mesmo número de mensagens
+            pipeline = EmailPipeline(SMTPPool('127.0.0.1', sink.port, starttls=False, size=workers), SENDER,
+                                     store=store, bounces=BounceTracker(f'bench-email-{workers}'),
+                                     workers=workers, batch_size=args.batch_size)
+            report = pipeline.run('nurture', SUBJECT, PREVIEW)
+            level = {
+                'workers': workers,
+                **{key: report[key] for key in ('seconds', 'messages_per_second', 'sent', 'bounced',
+                                                'failed', 'retried')},
+                'smtp_connections': sink.connections - connections
+            }
+            levels.append(level)
+            print(f"workers={workers:<3} {level['messages_per_second']:>8.1f} msg/s  enviadas {level['sent']}  "
+                  f"bounces {level['bounced']}  ligações {level['smtp_connections']}", file=sys.stderr)
+    finally:
+        sink.stop()
+
+    report = {
+        'label': args.label,
+        'config': {
+            'recipients': args.recipients,
+            'batch_size': args.batch_size,
+            'latency_ms': args.latency_ms,
+            'connect_latency_ms': args.connect_latency_ms,
+            'bounce_every': args.bounce_every,
+            'max_messages_per_connection': args.max_messages_per_connection
+        },
+        'naive': baseline,
+        'levels': levels,
+        'speedup': round(max(l['messages_per_second'] for l in levels) / baseline['messages_per_second'], 1)
+        if baseline else None
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
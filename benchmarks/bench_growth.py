@@ -0,0 +1,108 @@
+# Projeção de crescimento viral: ciclo Python original vs Monte Carlo vetorizado
+# O ciclo original (mês a mês, com a receita acumulada recalculada somando a
+# lista inteira em cada mês) corre uma vez por cenário; o ViralGrowthEngine
+# projeta todos os cenários de uma vez com numpy e devolve bandas de percentis.
+#
+# Uso:
+#   python benchmarks/bench_growth.py --scenarios 1000,5000,20000 --months 12,60,120
+#   python benchmarks/bench_growth.py --legacy-scenarios 500 --output growth.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-bench-growth-'))
+
+from autonomous_features import ViralGrowthEngine  # noqa: E402
+
+
+def legacy_growth(current_users, months, referral_rate, viral_coefficient):
+    """Cópia do calculate_viral_growth original, com horizonte configurável"""
+    projections = []
+    users = current_users
+    for month in range(1, months + 1):
+        new_referrals = int(users * referral_rate * viral_coefficient)
+        organic_growth = int(users * 0.05)
+        users += new_referrals + organic_growth
+        projections.append({
+            'month': month,
+            'total_users': users,
+            'new_referrals': new_referrals,
+            'organic_growth': organic_growth,
+            'monthly_revenue': users * random.uniform(15, 45),
+            'cumulative_revenue': sum([p.get('monthly_revenue', 0) for p in projections]) + users * random.uniform(15, 45)
+        })
+    return projections
+
+
+def legacy(scenarios, months):
+    """Um cenário por chamada ao ciclo original, com os mesmos parâmetros sorteados"""
+    started = time.perf_counter()
+    for _ in range(scenarios):
+        legacy_growth(100, months, random.betavariate(12, 88), random.lognormvariate(0.588, 0.25))
+    return time.perf_counter() - started
+
+
+def vectorized(engine, scenarios, months, repeat):
+    best = float('inf')
+    for i in range(repeat):
+        started = time.perf_counter()
+        engine.simulate_growth(100, months, scenarios, seed=i)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Projeção de crescimento: ciclo Python vs numpy')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--scenarios', default='1000,5000,20000')
+    parser.add_argument('--months', default='12,60,120')
+    parser.add_argument('--legacy-scenarios', type=int, default=1000,
+                        help='cenários medidos no ciclo original (extrapolado linearmente); 0 desliga')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    engine = ViralGrowthEngine()
+    levels = []
+    for months in (int(m) for m in args.months.split(',')):
+        legacy_per_scenario = legacy(args.legacy_scenarios, months) / args.legacy_scenarios \
+            if args.legacy_scenarios else None
+        for scenarios in (int(s) for s in args.scenarios.split(',')):
+            seconds = vectorized(engine, scenarios, months, args.repeat)
+            level = {
+                'months': months,
+                'scenarios': scenarios,
+                'seconds': round(seconds, 4),
+                'scenario_months_per_second': round(scenarios * months / seconds),
+                'legacy_seconds': round(legacy_per_scenario * scenarios, 4) if legacy_per_scenario else None,
+                'speedup': round(legacy_per_scenario * scenarios / seconds, 1) if legacy_per_scenario else None
+            }
+            levels.append(level)
+            print(f"meses={months:<4} cenários={scenarios:<6} {level['seconds']:>8.4f}s  "
+                  f"ciclo original {level['legacy_seconds']}s  speedup {level['speedup']}", file=sys.stderr)
+
+    report = {
+        'label': args.label,
+        'config': {
+            'legacy_scenarios': args.legacy_scenarios,
+            'repeat': args.repeat,
+            'percentiles': list(ViralGrowthEngine.PERCENTILES)
+        },
+        'levels': levels
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
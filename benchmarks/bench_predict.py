@@ -0,0 +1,184 @@
+# Microbenchmark do caminho de predição, com baselines em JSON
+# Casos: predict_price de uma linha, predição em lote, /api/arbitrage/opportunities
+# de ponta a ponta (cliente de teste do Flask) e serialização JSON da resposta.
+#
+# Uso (por exemplo antes e depois de atualizar o sklearn):
+#   python benchmarks/bench_predict.py --save-baseline
+#   python benchmarks/bench_predict.py --compare        # termina com código 1 se regredir
+#   python benchmarks/bench_predict.py --compare --max-p50-regression 0.1 --case predict_single
+#
+# A baseline depende da máquina: gravá-la e compará-la no mesmo sítio.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'predict.json')
+
+
+def percentile(sorted_samples, fraction):
+    index = min(int(round(fraction * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+def time_case(func, min_iterations, min_seconds, warmup):
+    """Latência por chamada (µs) até atingir iterações e tempo mínimos"""
+    for _ in range(warmup):
+        func()
+    gc.collect()
+
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < min_iterations or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        func()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+
+    samples.sort()
+    return {
+        'iterations': len(samples),
+        'min_us': round(samples[0], 2),
+        'p50_us': round(percentile(samples, 0.50), 2),
+        'p90_us': round(percentile(samples, 0.90), 2),
+        'p99_us': round(percentile(samples, 0.99), 2),
+        'mean_us': round(sum(samples) / len(samples), 2),
+        'ops_per_second': round(len(samples) / (sum(samples) / 1e6), 1)
+    }
+
+
+def build_cases(batch_sizes):
+    """Prepara a app (modelo treinado, utilizador autenticado) e devolve os casos"""
+    import numpy as np
+
+    import app as gpas
+
+    model = gpas.get_ai_model()
+    rng = np.random.default_rng(42)
+
+    def batch(size):
+        X = np.column_stack([
+            rng.random(size) * 1000, rng.integers(0, 10, size), rng.integers(0, 5, size),
+            np.sin(rng.random(size) * 2 * np.pi), rng.exponential(2, size)
+        ])
+        return lambda: model.forest.predict(X)
+
+    client = gpas.app.test_client()
+    login = client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': 'password'})
+    headers = {'Authorization': f"Bearer {login.get_json()['access_token']}"}
+
+    def arbitrage():
+        # Mesma semente em cada chamada: o número de oportunidades não varia entre execuções
+        random.seed(42)
+        response = client.get('/api/arbitrage/opportunities', headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/arbitrage/opportunities devolveu {response.status_code}')
+        return response
+
+    payload = arbitrage().get_json()
+
+    cases = {'predict_single': lambda: model.predict_price(249.9, 3, 2, 0.1, 2.0)}
+    for size in batch_sizes:
+        cases[f'predict_batch_{size}'] = batch(size)
+    cases['arbitrage_endpoint'] = arbitrage
+    cases['arbitrage_json'] = lambda: gpas.app.json.dumps(payload)
+    return cases
+
+
+def environment():
+    import numpy
+    import sklearn
+
+    return {
+        'python': sys.version.split()[0],
+        'numpy': numpy.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results, baseline, max_p50, max_p99):
+    """Lista de regressões face à baseline (casos novos ou removidos são ignorados)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        for metric, limit in (('p50_us', max_p50), ('p99_us', max_p99)):
+            ratio = current[metric] / previous[metric] if previous[metric] else 1.0
+            current[f'{metric[:3]}_ratio'] = round(ratio, 3)
+            if ratio > 1 + limit:
+                regressions.append(f'{name}: {metric} {previous[metric]} -> {current[metric]} (+{(ratio - 1) * 100:.0f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência do caminho de predição com baselines')
+    parser.add_argument('--case', action='append', help='correr só estes casos (repetível)')
+    parser.add_argument('--batch-sizes', default='64,1024')
+    parser.add_argument('--min-iterations', type=int, default=200)
+    parser.add_argument('--min-seconds', type=float, default=2.0)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--max-p50-regression', type=float, default=0.15)
+    parser.add_argument('--max-p99-regression', type=float, default=0.30)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    # Ambiente isolado: modelo treinado de raiz, sem agendador nem limites de pedidos
+    os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-bench-'))
+    os.environ.update(GPAS_ENABLE_SCHEDULER='0', GPAS_START_BACKGROUND='0', GPAS_RATE_LIMIT='0')
+
+    cases = build_cases([int(size) for size in args.batch_sizes.split(',') if size])
+    selected = args.case or list(cases)
+    unknown = set(selected) - set(cases)
+    if unknown:
+        parser.error(f"casos desconhecidos: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in selected:
+        results[name] = time_case(cases[name], args.min_iterations, args.min_seconds, args.warmup)
+        print(f"{name}: p50 {results[name]['p50_us']}µs p99 {results[name]['p99_us']}µs", file=sys.stderr)
+
+    report = {'environment': environment(), 'results': results}
+    status = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            parser.error(f'baseline inexistente: {args.baseline} (gravar com --save-baseline)')
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_p50_regression, args.max_p99_regression)
+        report['baseline_environment'] = baseline['environment']
+        report['regressions'] = regressions
+        for line in regressions:
+            print(f'REGRESSÃO {line}', file=sys.stderr)
+        status = 1 if regressions else 0
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': report['environment'], 'results': results}, f, indent=2)
+            f.write('\n')
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Custo das experiências de preço no caminho do checkout
+# Mede assign + record_start (tabela em memória, inícios gravados em lote) contra
+# gravar cada início na base de dados, e simula visitas com taxas de conversão
+# conhecidas para ver quantos inícios são precisos até a recomendação estabilizar.
+#
+# Uso:
+#   python benchmarks/bench_pricing.py --calls 50000
+#   python benchmarks/bench_pricing.py --visits 30000 --rates 0.05,0.07,0.02 --output pricing.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-bench-pricing-'))
+
+from pricing_experiments import PricingExperiments  # noqa: E402
+
+PLANS = {'professional': {'price_monthly': 49, 'price_annual': 34,
+                          'stripe_price_id_monthly': 'price_pro_monthly',
+                          'stripe_price_id_annual': 'price_pro_annual'}}
+
+
+def experiments(name, prices, **kw):
+    variants = {f'p{price}': {'price': price, 'stripe_price_id': f'price_pro_{price}'} for price in prices[1:]}
+    return PricingExperiments(PLANS, {'professional': {'monthly': variants}}, name=name, **kw)
+
+
+def per_call(func, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def checkout_path(prices, calls):
+    batched = experiments('bench-pricing-batched', prices)
+
+    def with_batching(i):
+        variant = batched.assign(f'user{i}', 'professional', 'monthly')
+        batched.record_start('professional', 'monthly', variant['id'])
+
+    direct = experiments('bench-pricing-direct', prices)
+
+    def with_write(i):
+        variant = direct.assign(f'user{i}', 'professional', 'monthly')
+        direct.record_start('professional', 'monthly', variant['id'])
+        direct.flush()
+
+    return {'batched_us': round(per_call(with_batching, calls), 2),
+            'write_per_start_us': round(per_call(with_write, calls), 2)}
+
+
+def convergence(prices, rates, visits, checkpoint):
+    """Visitas simuladas; a cada `checkpoint` inícios, os pesos e a recomendação atuais"""
+    engine = experiments(f'bench-pricing-sim-{int(time.time() * 1000)}', prices, refresh_interval=float('inf'))
+    truth = dict(zip(['control'] + [f'p{price}' for price in prices[1:]], rates))
+    rng = random.Random(1)
+    points = []
+    for i in range(1, visits + 1):
+        variant = engine.assign(f'user{i}', 'professional', 'monthly')
+        engine.record_start('professional', 'monthly', variant['id'])
+        if rng.random() < truth[variant['id']]:
+            engine.flush()
+            engine.record_conversion({'id': f'cs_{i}', 'amount_total': variant['price'] * 100,
+                                      'metadata': {'plan': 'professional', 'billing': 'monthly',
+                                                   'price_variant': variant['id']}})
+        if i % checkpoint == 0:
+            engine.flush()
+            engine._refresh_table()
+            report = next(e for e in engine.report() if e['plan'] == 'professional' and e['billing'] == 'monthly')
+            points.append({'starts': i, 'leader': report['leader'],
+                           'prob_best': report['variants'][report['leader']]['prob_best'],
+                           'recommended_action': report['recommended_action']})
+            print(f"inícios={i:<7} líder {report['leader']:<8} P(melhor) "
+                  f"{points[-1]['prob_best']:.3f}  {report['recommended_action']}", file=sys.stderr)
+    best = max(truth, key=lambda name: truth[name] * dict(zip(truth, prices))[name])
+    return {'true_best': best, 'checkpoints': points}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Experiências de preço: custo no checkout e convergência')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--calls', type=int, default=50000)
+    parser.add_argument('--prices', default='49,39,59', help='controlo primeiro')
+    parser.add_argument('--rates', default='0.05,0.07,0.02', help='conversão real de cada preço')
+    parser.add_argument('--visits', type=int, default=30000)
+    parser.add_argument('--checkpoint', type=int, default=5000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    prices = [int(p) for p in args.prices.split(',')]
+    rates = [float(r) for r in args.rates.split(',')]
+    path = checkout_path(prices, args.calls)
+    print(f"checkout: {path['batched_us']}µs por pedido (em lote) vs "
+          f"{path['write_per_start_us']}µs a gravar cada início", file=sys.stderr)
+
+    report = {
+        'label': args.label,
+        'config': {'calls': args.calls, 'prices': prices, 'rates': rates, 'visits': args.visits},
+        'checkout_path': path,
+        'convergence': convergence(prices, rates, args.visits, args.checkpoint) if args.visits else None
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# Throughput do SocialDispatcher contra o stand-in das APIs de publicação
+# Enche um content_store temporário com posts já vencidos nas três plataformas
+# e, para cada nível de concorrência, publica-os todos (com erros e 429 do
+# stand-in); confirma que nenhum post é publicado duas vezes.
+#
+# Uso:
+#   python benchmarks/bench_social.py --posts 2000 --concurrency 1,8,32 --latency-ms 100
+#   python benchmarks/bench_social.py --error-rate 0.1 --quota-per-second 40 --output social.json
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-bench-social-'))
+
+from content_store import ContentStore  # noqa: E402
+from rate_limit import MemoryBackend  # noqa: E402
+from social_dispatch import PLATFORMS, SocialDispatcher  # noqa: E402
+from standins.social_standin import SocialStandin  # noqa: E402
+
+
+def fill(store, posts, now):
+    platforms = list(PLATFORMS)
+    store.add_many([
+        {'kind': 'social', 'platform': platforms[i % len(platforms)], 'content': f'Post de teste {i}',
+         'scheduled_at': now, 'payload': {'index': i}}
+        for i in range(posts)
+    ], now)
+
+
+def run_level(args, concurrency):
+    standin = SocialStandin(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4,
+                            error_rate=args.error_rate, quota_per_second=args.quota_per_second).start()
+    try:
+        store = ContentStore(name=f'bench-social-{concurrency}-{int(time.time() * 1000)}')
+        fill(store, args.posts, time.time())
+        # Quotas reais fariam o benchmark durar um dia: buckets com a quota do stand-in
+        quota = args.quota_per_second or args.posts
+        platforms = {name: {**limits, 'capacity': quota, 'window': 1} for name, limits in PLATFORMS.items()}
+        dispatcher = SocialDispatcher(platforms, store=store, limiter=MemoryBackend(),
+                                      tokens=dict.fromkeys(PLATFORMS, 'standin'),
+                                      base_url=standin.url, concurrency=concurrency,
+                                      retry_base=args.retry_base, batch_size=args.posts)
+        report = dispatcher.run(duration=args.timeout)
+    finally:
+        standin.stop()
+
+    totals = {key: sum(p[key] for p in report['platforms'].values())
+              for key in ('sent', 'failed', 'retried', 'skipped', 'throttled')}
+    level = {
+        'concurrency': concurrency,
+        'seconds': report['last_run']['seconds'],
+        'posts_per_second': report['last_run']['posts_per_second'],
+        **totals,
+        'remaining': len(store.scheduled(limit=args.posts)),
+        'standin': {'calls': standin.calls, 'throttled': standin.throttled,
+                    'posts': standin.posts, 'duplicates': standin.duplicates}
+    }
+    print(f"c={concurrency:<4} {level['posts_per_second']:>8.1f} posts/s  enviados {totals['sent']}  "
+          f"tentativas {totals['retried']}  duplicados {standin.duplicates}", file=sys.stderr)
+    return level
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput do dispatcher de redes sociais')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--quota-per-second', type=int, default=None)
+    parser.add_argument('--retry-base', type=float, default=0.2, help='backoff base das novas tentativas (s)')
+    parser.add_argument('--timeout', type=float, default=300, help='limite por nível (s)')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    levels = [run_level(args, int(c)) for c in args.concurrency.split(',')]
+    report = {
+        'label': args.label,
+        'config': {
+            'posts': args.posts,
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'quota_per_second': args.quota_per_second
+        },
+        'levels': levels
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Mede tempo de treino e pico de memória do modelo de preços
+# por tamanho do dataset e número de cores (para dimensionar as máquinas de treino)
+#
+# Uso:
+#   python benchmarks/bench_training.py --sizes 10000,100000,1000000 --jobs 1,2,4
+#   python benchmarks/bench_training.py --sizes 10000000 --jobs 8 --trees 50 --output treino.json
+#
+# Cada combinação corre num processo novo, para que o pico de RSS seja só dela.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_dataset(rows, dtype, chunk_rows=1_000_000, seed=42):
+    """Mesma distribuição que o treino inicial de app.py, gerada em blocos"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    X = np.empty((rows, 5), dtype=dtype)
+    y = np.empty(rows, dtype=np.float64)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        price = rng.random(n) * 1000
+        seasonality = np.sin(rng.random(n) * 2 * np.pi)
+        demand = rng.exponential(2, n)
+        X[start:start + n, 0] = price
+        X[start:start + n, 1] = rng.integers(0, 10, n)
+        X[start:start + n, 2] = rng.integers(0, 5, n)
+        X[start:start + n, 3] = seasonality
+        X[start:start + n, 4] = demand
+        y[start:start + n] = price * (1 + 0.1 * seasonality + 0.05 * demand + rng.normal(0, 0.02, n))
+    return X, y
+
+
+def run_child(rows, n_jobs, trees, dtype):
+    """Uma medição: gerar dados, treinar e reportar tempo e memória"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+
+    start = time.perf_counter()
+    X, y = synthetic_dataset(rows, np.dtype(dtype))
+    data_seconds = time.perf_counter() - start
+    data_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    model = RandomForestRegressor(n_estimators=trees, n_jobs=n_jobs, random_state=42)
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+
+    return {
+        'rows': rows,
+        'n_jobs': n_jobs,
+        'trees': trees,
+        'dtype': dtype,
+        'data_seconds': round(data_seconds, 3),
+        'fit_seconds': round(fit_seconds, 3),
+        'rows_per_second': round(rows / fit_seconds),
+        'data_mb': round((X.nbytes + y.nbytes) / 2 ** 20, 1),
+        'data_peak_rss_mb': round(data_rss_kb / 1024, 1),
+        # Com n_jobs > 1 o joblib usa threads: o pico inclui todas
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'nodes': int(sum(estimator.tree_.node_count for estimator in model.estimators_))
+    }
+
+
+def measure(rows, n_jobs, trees, dtype, timeout):
+    command = [sys.executable, __file__, '--child', str(rows), str(n_jobs), str(trees), dtype]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'rows': rows, 'n_jobs': n_jobs, 'trees': trees, 'dtype': dtype, 'error': 'timeout'}
+    if result.returncode != 0:
+        return {'rows': rows, 'n_jobs': n_jobs, 'trees': trees, 'dtype': dtype,
+                'error': result.stderr.strip()[-300:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == '--child':
+        rows, n_jobs, trees, dtype = int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), sys.argv[5]
+        print(json.dumps(run_child(rows, n_jobs, trees, dtype)))
+        return
+
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='Tempo de treino e memória por tamanho e cores')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--sizes', type=int_list, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--jobs', type=int_list,
+                        default=sorted({1, min(2, cores), min(4, cores), cores}))
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--dtype', choices=['float32', 'float64'], action='append',
+                        help='repetir para comparar (por omissão float32)')
+    parser.add_argument('--timeout', type=float, default=3600)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = []
+    for dtype in args.dtype or ['float32']:
+        for rows in args.sizes:
+            for n_jobs in args.jobs:
+                result = measure(rows, n_jobs, args.trees, dtype, args.timeout)
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+
+    report = {
+        'label': args.label,
+        'python': sys.version.split()[0],
+        'cpu_count': cores,
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# Mede tempo de arranque e memória por worker do GPAS 2.0
+#
+# Uso (correr antes e depois de uma alteração e comparar os JSON):
+#   python benchmarks/boot.py --label antes --output boot-antes.json
+#   python benchmarks/boot.py --workers 4 --warm --label depois
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from memory_report import child_pids, smaps_rollup  # noqa: E402
+
+IMPORT_SNIPPET = (
+    "import time, resource; t = time.perf_counter(); import app; "
+    "print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+
+def measure_import(runs):
+    """Tempo de `import app` e RSS máximo num interpretador novo"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, check=True,
+            capture_output=True, text=True
+        ).stdout.split()
+        samples.append({
+            'import_seconds': float(output[-2]),
+            'process_seconds': time.perf_counter() - start,
+            'max_rss_kb': int(output[-1])
+        })
+
+    samples.sort(key=lambda s: s['import_seconds'])
+    return {'runs': runs, 'median': samples[len(samples) // 2], 'samples': samples}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def warm_up(base_url, requests_per_worker, workers):
+    """Faz login com o utilizador demo e chama rotas que carregam o modelo"""
+    body = json.dumps({'email': 'user1@example.com', 'password': 'password'}).encode()
+    req = urllib.request.Request(base_url + '/api/auth/login', data=body,
+                                 headers={'Content-Type': 'application/json'})
+    token = json.load(urllib.request.urlopen(req, timeout=30))['access_token']
+
+    for _ in range(requests_per_worker * workers):
+        req = urllib.request.Request(base_url + '/api/arbitrage/opportunities',
+                                     headers={'Authorization': f'Bearer {token}'})
+        urllib.request.urlopen(req, timeout=60).read()
+
+
+def measure_gunicorn(workers, preload, warm, timeout):
+    """Arranca gunicorn e mede tempo até responder e memória de cada worker"""
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GPAS_PRELOAD='1' if preload else '0')
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app',
+         '--bind', f'127.0.0.1:{port}'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(base_url + '/api/health', timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None or time.perf_counter() - start > timeout:
+                    raise RuntimeError('gunicorn não arrancou')
+                time.sleep(0.05)
+        ready_seconds = time.perf_counter() - start
+
+        if warm:
+            warm_up(base_url, 3, workers)
+
+        per_worker = [dict(pid=pid, **smaps_rollup(pid)) for pid in child_pids(proc.pid)]
+        return {
+            'workers': workers,
+            'preload': preload,
+            'warm': warm,
+            'ready_seconds': round(ready_seconds, 3),
+            'master': smaps_rollup(proc.pid),
+            'per_worker': per_worker,
+            'total_private_kb': sum(w['private_kb'] for w in per_worker),
+            'total_pss_kb': sum(w['pss_kb'] for w in per_worker)
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de arranque e memória por worker')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--no-preload', action='store_true')
+    parser.add_argument('--warm', action='store_true', help='carregar o modelo antes de medir')
+    parser.add_argument('--skip-gunicorn', action='store_true')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    report = {
+        'label': args.label,
+        'python': sys.version.split()[0],
+        'import': measure_import(args.runs),
+        'children_max_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    }
+    if not args.skip_gunicorn:
+        report['gunicorn'] = measure_gunicorn(args.workers, not args.no_preload, args.warm, args.timeout)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
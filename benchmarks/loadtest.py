@@ -0,0 +1,330 @@
+# Teste de carga HTTP de ponta a ponta com stand-ins locais
+# Arranca os stand-ins do Stripe e dos marketplaces, o gunicorn apontado para eles,
+# e corre uma mistura de tráfego: pesquisas, polling de arbitragem, dashboard,
+# checkout, rajadas de login e tempestades de webhooks (com reentregas duplicadas).
+#
+# Uso:
+#   python benchmarks/loadtest.py --duration 60 --concurrency 16 --workers 4
+#   python benchmarks/loadtest.py --mix search=5,arbitrage=3,dashboard=2 --marketplace-latency-ms 120
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8000 --webhook-secret whsec_...   # app já a correr
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from standins.marketplace_standin import MarketplaceStandin  # noqa: E402
+from standins.stripe_standin import StripeAPIStandin, make_event, signed_request  # noqa: E402
+
+HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+DEMO_LOGIN = {'email': 'user1@example.com', 'password': 'password'}
+QUERIES = ('iphone case', 'bluetooth speaker', 'smartwatch', 'headphones', 'power bank', 'laptop stand')
+
+
+class Stats:
+    """Latências e códigos de resposta por endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, endpoint, status, latency_ms):
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {'latencies': [], 'status': {}})
+            entry['latencies'].append(latency_ms)
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for name, entry in sorted(self.endpoints.items()):
+            latencies = sorted(entry['latencies'])
+            count = len(latencies)
+            # Erros: exceções de rede e 5xx (429 é contado à parte em status)
+            errors = sum(n for status, n in entry['status'].items() if status == 'error' or str(status)[0] == '5')
+            histogram, previous = [], 0
+            for bound in HISTOGRAM_MS:
+                below = sum(1 for latency in latencies if latency <= bound)
+                histogram.append({'le_ms': bound, 'count': below - previous})
+                previous = below
+            histogram.append({'le_ms': None, 'count': count - previous})
+            endpoints[name] = {
+                'requests': count,
+                'throughput_rps': round(count / elapsed, 2),
+                'errors': errors,
+                'error_rate': round(errors / count, 4) if count else 0,
+                'status': {str(status): n for status, n in entry['status'].items()},
+                'latency_ms': {
+                    'mean': round(sum(latencies) / count, 2),
+                    'p50': round(latencies[count // 2], 2),
+                    'p90': round(latencies[min(int(count * 0.9), count - 1)], 2),
+                    'p99': round(latencies[min(int(count * 0.99), count - 1)], 2),
+                    'max': round(latencies[-1], 2)
+                },
+                'histogram': histogram
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        errors = sum(e['errors'] for e in endpoints.values())
+        return {
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'error_rate': round(errors / total, 4) if total else 0,
+            'endpoints': endpoints
+        }
+
+
+class Client:
+    """Ligação HTTP persistente por thread (reabre quando o servidor a fecha)"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        url = urllib.parse.urlparse(base_url)
+        self.conn = http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+        self.stats = stats
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            status, data = 'error', b''
+        self.stats.add(endpoint, status, (time.perf_counter() - start) * 1000)
+        return status, data
+
+
+def login(client):
+    status, data = client.request('POST /api/auth/login', 'POST', '/api/auth/login', DEMO_LOGIN)
+    return json.loads(data)['access_token'] if status == 200 else None
+
+
+def run_mix(base_url, stats, token, weights, deadline, think_ms):
+    """Utilizador virtual: escolhe ações pela mistura até ao fim do teste"""
+    client = Client(base_url, stats)
+    auth = {'Authorization': f'Bearer {token}'}
+    actions = list(weights)
+    while time.monotonic() < deadline:
+        action = random.choices(actions, weights=[weights[a] for a in actions])[0]
+        if action == 'search':
+            client.request('POST /api/search', 'POST', '/api/search',
+                           {'query': random.choice(QUERIES), 'category': random.randint(0, 9)}, auth)
+        elif action == 'arbitrage':
+            client.request('GET /api/arbitrage/opportunities', 'GET', '/api/arbitrage/opportunities', headers=auth)
+        elif action == 'dashboard':
+            client.request('GET /api/stats/dashboard', 'GET', '/api/stats/dashboard', headers=auth)
+        elif action == 'checkout':
+            client.request('POST /api/payments/create-checkout-session', 'POST',
+                           '/api/payments/create-checkout-session',
+                           {'plan': random.choice(['starter', 'professional', 'enterprise']),
+                            'billing': random.choice(['monthly', 'annual'])}, auth)
+        elif action == 'predict':
+            client.request('POST /api/predict/price', 'POST', '/api/predict/price',
+                           {'current_price': round(random.uniform(10, 500), 2)}, auth)
+        if think_ms:
+            time.sleep(random.expovariate(1000 / think_ms))
+
+
+def run_bursts(every, deadline, burst):
+    """Chama `burst()` a cada `every` segundos até ao fim do teste"""
+    next_at = time.monotonic() + every
+    while True:
+        wait = next_at - time.monotonic()
+        if next_at >= deadline:
+            return
+        if wait > 0:
+            time.sleep(wait)
+        burst()
+        next_at += every
+
+
+def login_burst(base_url, stats, size):
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        list(pool.map(lambda _: login(Client(base_url, stats)), range(size)))
+
+
+def webhook_storm(base_url, stats, secret, size, duplicates):
+    """Eventos checkout.session.completed novos, cada um entregue `duplicates` vezes"""
+    deliveries = []
+    for _ in range(size):
+        n = random.getrandbits(32)
+        event = make_event('checkout.session.completed', {
+            'id': f'cs_test_load_{n:08x}',
+            'object': 'checkout.session',
+            'customer': f'cus_load_{n:08x}',
+            'customer_details': {'email': f'load{n:08x}@example.com'},
+            'amount_total': 4900,
+            'currency': 'eur',
+            'payment_status': 'paid',
+            'status': 'complete',
+            'metadata': {'plan': 'starter', 'billing': 'monthly'}
+        })
+        deliveries.extend([event] * duplicates)
+    random.shuffle(deliveries)
+
+    def deliver(event):
+        payload, headers = signed_request(event, secret)
+        Client(base_url, stats).request('POST /api/payments/webhook', 'POST', '/api/payments/webhook',
+                                        payload, headers)
+
+    with ThreadPoolExecutor(max_workers=min(len(deliveries), 32) or 1) as pool:
+        list(pool.map(deliver, deliveries))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(args, env):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    start = time.monotonic()
+    while True:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            return proc, base_url
+        except OSError:
+            if proc.poll() is not None or time.monotonic() - start > args.boot_timeout:
+                proc.kill()
+                raise RuntimeError('gunicorn não arrancou')
+            time.sleep(0.1)
+
+
+def parse_mix(value):
+    weights = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {'search', 'arbitrage', 'dashboard', 'predict', 'checkout'}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"ações desconhecidas: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga com stand-ins do Stripe e dos marketplaces')
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--url', help='usar uma app já a correr em vez de arrancar o gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--asgi', action='store_true', help='uvicorn workers (GPAS_ASGI=1)')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('search=4,arbitrage=3,dashboard=2,predict=1,checkout=1'))
+    parser.add_argument('--think-ms', type=float, default=0, help='pausa média entre pedidos')
+    parser.add_argument('--login-burst', type=int, default=10)
+    parser.add_argument('--login-every', type=float, default=10)
+    parser.add_argument('--webhook-storm', type=int, default=50, help='eventos distintos por tempestade')
+    parser.add_argument('--webhook-duplicates', type=int, default=3)
+    parser.add_argument('--webhook-every', type=float, default=15)
+    parser.add_argument('--webhook-secret', default='whsec_loadtest')
+    parser.add_argument('--marketplace-latency-ms', type=float, default=50)
+    parser.add_argument('--marketplace-error-rate', type=float, default=0.0)
+    parser.add_argument('--stripe-latency-ms', type=float, default=100)
+    parser.add_argument('--rate-limit', action='store_true', help='manter a limitação de pedidos ativa')
+    parser.add_argument('--boot-timeout', type=float, default=180)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    stripe = StripeAPIStandin(latency_ms=args.stripe_latency_ms).start()
+    marketplaces = MarketplaceStandin(latency_ms=args.marketplace_latency_ms, jitter_ms=args.marketplace_latency_ms / 4,
+                                      error_rate=args.marketplace_error_rate).start()
+    proc = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            env = dict(
+                os.environ,
+                WEB_CONCURRENCY=str(args.workers),
+                GPAS_ASGI='1' if args.asgi else '0',
+                GPAS_DATA_DIR=tempfile.mkdtemp(prefix='gpas-loadtest-'),
+                GPAS_MARKETPLACE_API_URL=marketplaces.url,
+                GPAS_RATE_LIMIT='1' if args.rate_limit else '0',
+                STRIPE_API_BASE=stripe.url,
+                STRIPE_SECRET_KEY='sk_test_standin',
+                STRIPE_WEBHOOK_SECRET=args.webhook_secret
+            )
+            proc, base_url = start_gunicorn(args, env)
+
+        stats = Stats()
+        token = login(Client(base_url, Stats()))
+        if token is None:
+            raise RuntimeError('login do utilizador demo falhou')
+
+        started = time.monotonic()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=run_mix, args=(base_url, stats, token, args.mix, deadline, args.think_ms))
+            for _ in range(args.concurrency)
+        ]
+        if args.login_burst:
+            threads.append(threading.Thread(target=run_bursts, args=(
+                args.login_every, deadline, lambda: login_burst(base_url, stats, args.login_burst))))
+        if args.webhook_storm:
+            threads.append(threading.Thread(target=run_bursts, args=(
+                args.webhook_every, deadline,
+                lambda: webhook_storm(base_url, stats, args.webhook_secret, args.webhook_storm,
+                                      args.webhook_duplicates))))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = {
+            'label': args.label,
+            'config': {
+                'workers': None if args.url else args.workers,
+                'asgi': None if args.url else args.asgi,
+                'duration_seconds': args.duration,
+                'concurrency': args.concurrency,
+                'mix': args.mix,
+                'marketplace_latency_ms': args.marketplace_latency_ms,
+                'stripe_latency_ms': args.stripe_latency_ms,
+                'rate_limit': args.rate_limit
+            },
+            'elapsed_seconds': round(elapsed, 2),
+            **stats.report(elapsed),
+            'standins': {'stripe_calls': stripe.calls, 'marketplace_calls': sum(marketplaces.calls.values())}
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        stripe.stop()
+        marketplaces.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
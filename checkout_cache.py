@@ -0,0 +1,133 @@
+# Cache de sessões de Checkout do Stripe
+# Preenchida pelo webhook checkout.session.completed e lida primeiro pela página
+# /success, que só chama a API do Stripe quando a sessão não está em cache.
+# Também guarda sessões recém-criadas para reutilizar em cliques repetidos.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from storage import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkout_sessions (
+    session_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkout_reuse (
+    reuse_key TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Campos usados pelas páginas e pelo tracking de conversão
+SESSION_FIELDS = ('id', 'amount_total', 'currency', 'customer', 'customer_email',
+                  'payment_status', 'status', 'subscription', 'metadata')
+
+
+def session_snapshot(session):
+    """Cópia mínima e serializável de uma sessão (dict ou StripeObject)"""
+    snapshot = {field: session.get(field) for field in SESSION_FIELDS}
+    details = session.get('customer_details') or {}
+    snapshot['customer_email'] = snapshot['customer_email'] or details.get('email')
+    snapshot['metadata'] = dict(snapshot['metadata'] or {})
+    return snapshot
+
+
+class CheckoutSessionCache:
+    """LRU no processo à frente de uma tabela SQLite partilhada pelos workers"""
+
+    def __init__(self, ttl=86400, max_local=1024):
+        self.ttl = ttl
+        self.max_local = max_local
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _db(self):
+        return connect('checkout', SCHEMA)
+
+    def put(self, session):
+        snapshot = session_snapshot(session)
+        expires_at = time.time() + self.ttl
+        self._db().execute(
+            'INSERT OR REPLACE INTO checkout_sessions (session_id, payload, expires_at) VALUES (?, ?, ?)',
+            (snapshot['id'], json.dumps(snapshot), expires_at)
+        )
+        self._remember(snapshot['id'], snapshot, expires_at)
+        return snapshot
+
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            cached = self.local.get(session_id)
+            if cached is not None and cached[1] > now:
+                self.local.move_to_end(session_id)
+                return cached[0]
+
+        row = self._db().execute(
+            'SELECT payload, expires_at FROM checkout_sessions WHERE session_id = ? AND expires_at > ?',
+            (session_id, now)
+        ).fetchone()
+        if row is None:
+            return None
+
+        snapshot = json.loads(row['payload'])
+        self._remember(session_id, snapshot, row['expires_at'])
+        return snapshot
+
+    def _remember(self, session_id, snapshot, expires_at):
+        with self.lock:
+            self.local[session_id] = (snapshot, expires_at)
+            self.local.move_to_end(session_id)
+            while len(self.local) > self.max_local:
+                self.local.popitem(last=False)
+
+    def purge(self):
+        now = time.time()
+        self._db().execute('DELETE FROM checkout_sessions WHERE expires_at <= ?', (now,))
+        self._db().execute('DELETE FROM checkout_reuse WHERE expires_at <= ?', (now,))
+
+
+class CheckoutReuse:
+    """Reutiliza a sessão criada há pouco para o mesmo (utilizador, plano, faturação)
+
+    A chave de idempotência enviada ao Stripe é a mesma dentro de cada janela,
+    pelo que até pedidos simultâneos em workers diferentes recebem a mesma sessão.
+    """
+
+    def __init__(self, window_seconds=600):
+        self.window_seconds = window_seconds
+
+    def _db(self):
+        return connect('checkout', SCHEMA)
+
+    @staticmethod
+    def _key(owner, plan, billing):
+        return hashlib.sha256(f'{owner}|{plan}|{billing}'.encode('utf-8')).hexdigest()
+
+    def idempotency_key(self, owner, plan, billing, now=None):
+        window = int((now if now is not None else time.time()) // self.window_seconds)
+        return f'checkout-{self._key(owner, plan, billing)[:32]}-{window}'
+
+    def get(self, owner, plan, billing):
+        row = self._db().execute(
+            'SELECT session_id, url FROM checkout_reuse WHERE reuse_key = ? AND expires_at > ?',
+            (self._key(owner, plan, billing), time.time())
+        ).fetchone()
+        return dict(row) if row else None
+
+    def put(self, owner, plan, billing, session_id, url):
+        self._db().execute(
+            'INSERT OR REPLACE INTO checkout_reuse (reuse_key, session_id, url, expires_at) VALUES (?, ?, ?, ?)',
+            (self._key(owner, plan, billing), session_id, url, time.time() + self.window_seconds)
+        )
+
+
+checkout_cache = CheckoutSessionCache()
+checkout_reuse = CheckoutReuse(int(os.environ.get('GPAS_CHECKOUT_REUSE_SECONDS', 600)))
@@ -0,0 +1,189 @@
+# Conteúdo de marketing gerado (posts, emails, artigos, PR)
+# Cada peça é guardada pelo hash do texto normalizado: um post repetido é
+# detetado com uma leitura pela chave primária antes de ser agendado. Índices
+# por plataforma/estado/hora de publicação servem o agendamento e a retenção.
+
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_items (
+    content_hash BLOB PRIMARY KEY,
+    kind TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    content TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    scheduled_at REAL NOT NULL,
+    posted_at REAL,
+    created_at REAL NOT NULL,
+    last_seen_at REAL NOT NULL,
+    duplicates INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS content_items_platform ON content_items (platform, status, scheduled_at);
+CREATE INDEX IF NOT EXISTS content_items_status ON content_items (status, scheduled_at);
+CREATE INDEX IF NOT EXISTS content_items_created ON content_items (created_at);
+"""
+
+# Antes do modo WAL (ver storage.connect): permite ao compact() devolver ao
+# disco as páginas libertadas sem um VACUUM completo
+PRAGMAS = ('auto_vacuum = INCREMENTAL',)
+
+# scheduled: à espera de publicação; posted/skipped: concluídos;
+# draft: só registado para deteção de duplicados, nunca publicado
+STATUSES = ('scheduled', 'posted', 'skipped', 'draft')
+
+_HASHTAG = re.compile(r'(?<!\w)#\w+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Texto comparável: NFKC, sem maiúsculas, sem hashtags e com espaços colapsados
+
+    As hashtags são sorteadas a cada geração; o mesmo corpo com outras hashtags é duplicado.
+    """
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return _SPACES.sub(' ', _HASHTAG.sub(' ', text)).strip()
+
+
+def content_hash(platform, text):
+    """Chave de 16 bytes; o mesmo texto noutra plataforma não é duplicado"""
+    return hashlib.blake2b(f'{platform}\x00{normalize(text)}'.encode('utf-8'), digest_size=16).digest()
+
+
+class ContentStore:
+    """Conteúdo gerado em SQLite, partilhado pelos workers e pelo agendador"""
+
+    def __init__(self, name='content', retention_days=90):
+        self.name = name
+        self.retention_days = retention_days
+
+    def _db(self):
+        return connect(self.name, SCHEMA, PRAGMAS)
+
+    def contains(self, platform, text):
+        return self._db().execute(
+            'SELECT 1 FROM content_items WHERE content_hash = ?', (content_hash(platform, text),)
+        ).fetchone() is not None
+
+    def add_many(self, items, now=None):
+        """Guarda as peças novas; devolve só essas (com `content_hash` em hex)
+
+        Cada item: {'kind', 'platform', 'content', 'scheduled_at', 'payload', 'status'?}.
+        Um duplicado não é reagendado, só conta mais uma ocorrência.
+        """
+        now = now if now is not None else time.time()
+        added = []
+        db = self._db()
+        with transaction(db):
+            for item in items:
+                key = content_hash(item['platform'], item['content'])
+                duplicates = db.execute(
+                    'INSERT INTO content_items (content_hash, kind, platform, content, payload, status, '
+                    'scheduled_at, created_at, last_seen_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (content_hash) DO UPDATE SET duplicates = duplicates + 1, '
+                    'last_seen_at = excluded.last_seen_at RETURNING duplicates',
+                    (key, item['kind'], item['platform'], item['content'],
+                     json.dumps(item.get('payload') or {}, ensure_ascii=False),
+                     item.get('status', 'scheduled'), item.get('scheduled_at', now), now, now)
+                ).fetchone()[0]
+                if duplicates == 0:
+                    added.append({**item, 'content_hash': key.hex()})
+        return added
+
+    def add(self, item, now=None):
+        """Como add_many para uma peça; devolve-a ou None se já existia"""
+        added = self.add_many([item], now)
+        return added[0] if added else None
+
+    def scheduled(self, platform=None, start=None, end=None, status='scheduled', limit=100):
+        """Peças por hora de publicação (índices por plataforma e por estado)"""
+        query = 'SELECT * FROM content_items WHERE status = ? AND scheduled_at >= ? AND scheduled_at < ?'
+        params = [status, start if start is not None else 0, end if end is not None else float('inf')]
+        if platform is not None:
+            query += ' AND platform = ?'
+            params.append(platform)
+        query += ' ORDER BY scheduled_at LIMIT ?'
+        params.append(limit)
+        return [self._row(row) for row in self._db().execute(query, params)]
+
+    def due(self, platform=None, now=None, limit=100):
+        """Peças agendadas cuja hora já passou"""
+        return self.scheduled(platform, end=now if now is not None else time.time(), limit=limit)
+
+    def created_since(self, since):
+        """Peças criadas desde `since`, por plataforma"""
+        return {row['platform']: row['n'] for row in self._db().execute(
+            'SELECT platform, COUNT(*) AS n FROM content_items WHERE created_at >= ? GROUP BY platform',
+            (since,)
+        )}
+
+    def mark(self, hashes, status, now=None):
+        """Muda o estado (posted/skipped) das peças com os hashes (hex) dados"""
+        if status not in STATUSES:
+            raise ValueError(f'Estado desconhecido: {status}')
+        now = now if now is not None else time.time()
+        db = self._db()
+        with transaction(db):
+            db.executemany(
+                'UPDATE content_items SET status = ?, posted_at = ? WHERE content_hash = ?',
+                [(status, now if status == 'posted' else None, bytes.fromhex(h)) for h in hashes]
+            )
+
+    def reschedule(self, hashes, scheduled_at):
+        """Adia peças ainda agendadas (nova tentativa de publicação)"""
+        db = self._db()
+        with transaction(db):
+            db.executemany(
+                "UPDATE content_items SET scheduled_at = ? WHERE content_hash = ? AND status = 'scheduled'",
+                [(scheduled_at, bytes.fromhex(h)) for h in hashes]
+            )
+
+    def compact(self, retention_days=None, now=None):
+        """Remove peças antigas (as agendadas só depois da hora passar) e liberta espaço"""
+        retention_days = retention_days if retention_days is not None else self.retention_days
+        cutoff = (now if now is not None else time.time()) - retention_days * 86400
+        db = self._db()
+        deleted = db.execute(
+            "DELETE FROM content_items WHERE created_at < ? AND (status != 'scheduled' OR scheduled_at < ?)",
+            (cutoff, cutoff)
+        ).rowcount
+        if db.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            # executescript corre o PRAGMA até ao fim: cada passo liberta uma só página
+            db.executescript('PRAGMA incremental_vacuum')
+        else:
+            # Base criada sem auto_vacuum: um VACUUM completo converte-a (só desta vez)
+            db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            db.execute('VACUUM')
+        db.execute('PRAGMA optimize')
+        return deleted
+
+    def stats(self):
+        rows = self._db().execute(
+            'SELECT platform, status, COUNT(*) AS n, SUM(duplicates) AS duplicates '
+            'FROM content_items GROUP BY platform, status'
+        ).fetchall()
+        platforms = {}
+        for row in rows:
+            platforms.setdefault(row['platform'], {})[row['status']] = row['n']
+        return {
+            'items': sum(row['n'] for row in rows),
+            'duplicates_skipped': sum(row['duplicates'] for row in rows),
+            'platforms': platforms
+        }
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        item['content_hash'] = item['content_hash'].hex()
+        item['payload'] = json.loads(item['payload'])
+        return item
+
+
+content_store = ContentStore(retention_days=int(os.environ.get('GPAS_CONTENT_RETENTION_DAYS', 90)))
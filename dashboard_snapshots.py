@@ -0,0 +1,143 @@
+# Snapshots pré-calculados de painéis
+# Cada secção é recalculada em background (no líder do agendador) com a sua
+# própria cadência; o documento composto fica serializado no SQLite e os
+# workers servem-no tal como está, sem chamar os motores por pedido.
+
+import json
+import threading
+import time
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot_sections (
+    snapshot TEXT NOT NULL,
+    section TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    error TEXT,
+    PRIMARY KEY (snapshot, section)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    generated_at REAL NOT NULL
+);
+"""
+
+
+class SnapshotService:
+    """Secções com cadência própria e um documento composto servido pelos workers"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sections = {}
+        self.composer = None
+        self._local = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        return connect('snapshots', SCHEMA)
+
+    def section(self, name, every):
+        """Regista função sem argumentos cujo resultado é recalculado a cada `every` segundos"""
+        def decorator(func):
+            self.sections[name] = (func, every)
+            return func
+        return decorator
+
+    def compose(self, func):
+        """Regista a função que monta o documento a partir de {secção: dados}"""
+        self.composer = func
+        return func
+
+    def refresh(self, force=False, now=None):
+        """Recalcula as secções vencidas e, se alguma mudou, o documento composto"""
+        now = time.time() if now is None else now
+        conn = self._db()
+        stored = {
+            row['section']: row for row in conn.execute(
+                'SELECT section, payload, computed_at FROM snapshot_sections WHERE snapshot = ?', (self.name,)
+            )
+        }
+
+        refreshed = []
+        for name, (func, every) in self.sections.items():
+            row = stored.get(name)
+            if not force and row is not None and row['computed_at'] + every > now:
+                continue
+            started = time.perf_counter()
+            try:
+                payload = json.dumps(func(), default=str)
+            except Exception as e:
+                # Mantém os últimos dados bons e o seu computed_at (idade verdadeira, a secção
+                # continua vencida e volta a ser tentada); regista só o erro
+                print(f"Erro ao calcular secção {self.name}.{name}: {e}")
+                conn.execute(
+                    'UPDATE snapshot_sections SET error = ?, duration_ms = ? WHERE snapshot = ? AND section = ?',
+                    (str(e), (time.perf_counter() - started) * 1000, self.name, name)
+                )
+                continue
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshot_sections (snapshot, section, payload, computed_at, duration_ms, error) '
+                'VALUES (?, ?, ?, ?, ?, NULL)',
+                (self.name, name, payload, now, (time.perf_counter() - started) * 1000)
+            )
+            refreshed.append(name)
+
+        if refreshed or force:
+            self._publish(conn, now)
+        return refreshed
+
+    def _publish(self, conn, now):
+        with transaction(conn):
+            rows = conn.execute(
+                'SELECT section, payload, computed_at FROM snapshot_sections WHERE snapshot = ?', (self.name,)
+            ).fetchall()
+            data = {row['section']: json.loads(row['payload']) for row in rows}
+            if set(data) != set(self.sections):
+                return
+            document = self.composer(data) if self.composer else data
+            document['snapshot'] = {
+                'generated_at': now,
+                'sections': {row['section']: row['computed_at'] for row in rows}
+            }
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (snapshot, body, generated_at) VALUES (?, ?, ?)',
+                (self.name, json.dumps(document, default=str), now)
+            )
+
+    def latest(self):
+        """(corpo serializado, gerado_em) do último documento; calcula-o se ainda não existir"""
+        conn = self._db()
+        row = conn.execute('SELECT generated_at FROM snapshots WHERE snapshot = ?', (self.name,)).fetchone()
+        if row is None:
+            # Arranque a frio: o agendador ainda não correu
+            self.refresh(force=True)
+            row = conn.execute('SELECT generated_at FROM snapshots WHERE snapshot = ?', (self.name,)).fetchone()
+            if row is None:
+                return None, None
+
+        with self._lock:
+            # Só relê e codifica o corpo quando há um documento novo
+            if self._local is None or self._local[1] != row['generated_at']:
+                body = conn.execute('SELECT body, generated_at FROM snapshots WHERE snapshot = ?',
+                                    (self.name,)).fetchone()
+                self._local = (body['body'].encode('utf-8'), body['generated_at'])
+            return self._local
+
+    def status(self):
+        now = time.time()
+        return {
+            row['section']: {
+                'age_seconds': round(now - row['computed_at'], 1),
+                'every_seconds': self.sections.get(row['section'], (None, None))[1],
+                'duration_ms': round(row['duration_ms'], 1),
+                'error': row['error']
+            }
+            for row in self._db().execute(
+                'SELECT section, computed_at, duration_ms, error FROM snapshot_sections WHERE snapshot = ?',
+                (self.name,)
+            )
+        }
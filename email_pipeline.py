@@ -0,0 +1,406 @@
+# Envio de campanhas de email em massa (sequências welcome, nurture, upsell, win-back)
+# Os destinatários são lidos do subscription_store em páginas, personalizados em
+# lotes a partir de um template compilado uma vez por campanha e enviados por um
+# pool de ligações SMTP reutilizadas. A fila de lotes entre a leitura e os
+# workers é limitada (backpressure) e as rejeições SMTP ficam registadas: hard
+# bounces e soft bounces repetidos deixam de receber emails.
+
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from email.header import Header
+from email.utils import formatdate, parseaddr
+
+from content_store import content_store
+from scheduler import scheduler
+from storage import connect, transaction
+from subscriptions import subscription_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_bounces (
+    email TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    code INTEGER,
+    reason TEXT,
+    count INTEGER NOT NULL DEFAULT 1,
+    last_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS email_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sequence TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    seconds REAL NOT NULL,
+    sent INTEGER NOT NULL,
+    bounced INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    suppressed INTEGER NOT NULL
+);
+"""
+
+# Segmento de cada sequência no subscription_store
+SEQUENCES = {
+    'welcome': {'statuses': ('active',), 'since_days': 7},
+    'nurture': {'statuses': ('active',)},
+    'upsell': {'statuses': ('active',), 'plans': ('starter', 'professional')},
+    'win_back': {'statuses': ('cancelled',)}
+}
+
+# Soft bounces (4xx) seguidos a partir dos quais o endereço é suprimido
+SOFT_BOUNCE_LIMIT = 3
+
+BODY = """Olá %(name)s,
+
+%(preview)s
+
+%(body)s
+
+O teu plano atual: %(plan)s
+Abrir o GPAS 2.0: https://gpas2.com/dashboard
+
+--
+Recebeste este email por teres uma conta GPAS 2.0.
+Para deixar de receber: responde com "unsubscribe".
+"""
+
+
+class BounceTracker:
+    """Rejeições SMTP por endereço e a lista de supressão que daí resulta"""
+
+    def __init__(self, name='email'):
+        self.name = name
+
+    def _db(self):
+        return connect(self.name, SCHEMA)
+
+    def record(self, bounces, now=None):
+        """Regista [(email, código SMTP, motivo)]: 5xx é hard, o resto soft"""
+        if not bounces:
+            return
+        now = now if now is not None else time.time()
+        db = self._db()
+        with transaction(db):
+            db.executemany(
+                'INSERT INTO email_bounces (email, kind, code, reason, last_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(email) DO UPDATE SET count = count + 1, code = excluded.code, '
+                "reason = excluded.reason, last_at = excluded.last_at, "
+                "kind = CASE WHEN kind = 'hard' THEN 'hard' ELSE excluded.kind END",
+                [(email, 'hard' if code and code >= 500 else 'soft', code, reason, now)
+                 for email, code, reason in bounces]
+            )
+
+    def suppressed(self, emails):
+        """Endereços do lote que não devem receber mais emails"""
+        if not emails:
+            return set()
+        rows = self._db().execute(
+            f"SELECT email FROM email_bounces WHERE email IN ({','.join('?' * len(emails))}) "
+            "AND (kind = 'hard' OR count >= ?)",
+            [*emails, SOFT_BOUNCE_LIMIT]
+        )
+        return {row['email'] for row in rows}
+
+    def record_run(self, report):
+        self._db().execute(
+            'INSERT INTO email_runs (sequence, subject, started_at, seconds, sent, bounced, failed, suppressed) '
+            'VALUES (:sequence, :subject, :started_at, :seconds, :sent, :bounced, :failed, :suppressed)',
+            report
+        )
+
+    def stats(self, runs=10):
+        db = self._db()
+        bounces = {row['kind']: row['n'] for row in db.execute(
+            'SELECT kind, COUNT(*) AS n FROM email_bounces GROUP BY kind'
+        )}
+        recent = [dict(row) for row in db.execute('SELECT * FROM email_runs ORDER BY id DESC LIMIT ?', (runs,))]
+        return {'bounces': bounces, 'runs': recent}
+
+    def purge(self, retention_seconds=30 * 86400):
+        """Esquece soft bounces antigos (hard bounces ficam para sempre)"""
+        self._db().execute(
+            "DELETE FROM email_bounces WHERE kind = 'soft' AND last_at < ?", (time.time() - retention_seconds,)
+        )
+
+
+class CampaignTemplate:
+    """Cabeçalhos e corpo de uma campanha, preparados uma vez; por destinatário só se formata o dict"""
+
+    def __init__(self, sender, subject, preview, body=''):
+        self.sender = sender
+        domain = parseaddr(sender)[1].rpartition('@')[2] or 'localhost'
+        self.domain = domain
+        # Assunto com emojis: codificado (RFC 2047) uma vez por campanha
+        self.head = (
+            f'From: {sender}\r\n'
+            f'Subject: {Header(subject, "utf-8").encode()}\r\n'
+            'MIME-Version: 1.0\r\n'
+            'Content-Type: text/plain; charset=utf-8\r\n'
+            'Content-Transfer-Encoding: 8bit\r\n'
+            f'List-Unsubscribe: <mailto:unsubscribe@{domain}?subject=unsubscribe>\r\n'
+        )
+        self.body = BODY.replace('%(preview)s', preview.replace('%', '%%')) \
+                        .replace('%(body)s', body.replace('%', '%%')).replace('\n', '\r\n')
+
+    def render(self, recipients):
+        """[(email, bytes)] de um lote de destinatários"""
+        date = formatdate(localtime=False)
+        messages = []
+        for recipient in recipients:
+            email = recipient['email']
+            fields = {'name': recipient.get('name') or email.split('@')[0], 'plan': recipient.get('plan') or ''}
+            message = (
+                f'{self.head}To: {email}\r\nDate: {date}\r\n'
+                f'Message-ID: <{uuid.uuid4().hex}@{self.domain}>\r\n\r\n'
+                + self.body % fields
+            )
+            messages.append((email, message.encode('utf-8')))
+        return messages
+
+
+class SMTPPool:
+    """Ligações SMTP autenticadas reutilizadas entre lotes (no máximo `size` abertas)"""
+
+    def __init__(self, host, port=587, username=None, password=None, starttls=True,
+                 size=4, timeout=30, max_messages=500):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        # Muitos servidores fecham a ligação ao fim de N mensagens
+        self.max_messages = max_messages
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+
+    def _open(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        conn.ehlo()
+        if self.starttls and conn.has_extn('starttls'):
+            conn.starttls()
+            conn.ehlo()
+        if self.username:
+            conn.login(self.username, self.password)
+        conn.messages_sent = 0
+        self.opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Ligação exclusiva durante o bloco; descartada se o servidor a fechar"""
+        self.slots.acquire()
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            except (smtplib.SMTPServerDisconnected, OSError):
+                conn.close()
+                raise
+            if conn.messages_sent >= self.max_messages:
+                self._quit(conn)
+            else:
+                self.idle.put(conn)
+        finally:
+            self.slots.release()
+
+    @staticmethod
+    def _quit(conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class EmailPipeline:
+    """Leitura dos destinatários → lotes personalizados → workers SMTP
+
+    A fila entre a leitura e os workers tem `queue_batches` lugares: se o
+    servidor SMTP abrandar, a leitura pára em vez de acumular mensagens.
+    """
+
+    def __init__(self, pool, sender, store=subscription_store, bounces=None,
+                 workers=4, batch_size=100, queue_batches=8, max_attempts=3):
+        self.pool = pool
+        self.sender = sender
+        self.envelope_sender = parseaddr(sender)[1]
+        self.store = store
+        self.bounces = bounces or BounceTracker()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.max_attempts = max_attempts
+
+    @property
+    def enabled(self):
+        return self.pool is not None
+
+    def recipients(self, sequence, now=None):
+        segment = SEQUENCES[sequence]
+        since = None
+        if 'since_days' in segment:
+            since = (now if now is not None else time.time()) - segment['since_days'] * 86400
+        return self.store.iter_subscribers(segment.get('statuses'), segment.get('plans'), since,
+                                           page_size=self.batch_size * 10)
+
+    def _batches(self, recipients):
+        batch = []
+        for recipient in recipients:
+            batch.append(recipient)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, sequence, subject, preview, body='', recipients=None):
+        """Envia a campanha ao segmento da sequência; devolve contadores e mensagens/s"""
+        if sequence not in SEQUENCES:
+            raise ValueError(f'Sequência desconhecida: {sequence}')
+        template = CampaignTemplate(self.sender, subject, preview, body)
+        batches = queue.Queue(maxsize=self.queue_batches)
+        totals = {'sent': 0, 'bounced': 0, 'failed': 0, 'suppressed': 0, 'retried': 0}
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                messages = batches.get()
+                if messages is None:
+                    return
+                try:
+                    result = self._send_batch(messages)
+                except Exception as e:
+                    print(f"Erro no envio de um lote de {len(messages)} emails: {e}")
+                    result = {'failed': len(messages)}
+                with lock:
+                    for key, value in result.items():
+                        totals[key] += value
+
+        threads = [threading.Thread(target=worker, name=f'email-{i}', daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        started = time.time()
+        try:
+            for batch in self._batches(recipients if recipients is not None else self.recipients(sequence)):
+                suppressed = self.bounces.suppressed([r['email'] for r in batch])
+                if suppressed:
+                    totals['suppressed'] += len(suppressed)
+                    batch = [r for r in batch if r['email'] not in suppressed]
+                batches.put(template.render(batch))  # bloqueia com a fila cheia
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+            self.pool.close()
+
+        elapsed = time.time() - started
+        report = {
+            'sequence': sequence,
+            'subject': subject,
+            'started_at': started,
+            'seconds': round(elapsed, 3),
+            **{key: totals[key] for key in ('sent', 'bounced', 'failed', 'suppressed')}
+        }
+        self.bounces.record_run(report)
+        return dict(report, retried=totals['retried'],
+                    messages_per_second=round(totals['sent'] / elapsed, 1) if elapsed else None)
+
+    def _send_batch(self, messages):
+        """Envia um lote por uma ligação do pool; se a ligação cair, o resto vai noutra"""
+        result = {'sent': 0, 'bounced': 0, 'failed': 0, 'retried': 0}
+        bounces = []
+        pending = list(messages)
+        failures = 0
+        while pending and failures < self.max_attempts:
+            remaining, reused = len(pending), False
+            try:
+                with self.pool.connection() as conn:
+                    reused = conn.messages_sent > 0
+                    options = ['BODY=8BITMIME'] if conn.has_extn('8bitmime') else []
+                    while pending:
+                        email, message = pending[0]
+                        try:
+                            conn.sendmail(self.envelope_sender, [email], message, options)
+                            result['sent'] += 1
+                        except smtplib.SMTPRecipientsRefused as e:
+                            code, reason = e.recipients.get(email, (None, b''))
+                            bounces.append((email, code, reason.decode('utf-8', 'replace')))
+                            result['bounced'] += 1
+                        except smtplib.SMTPResponseException as e:
+                            if e.smtp_code == 421:  # o servidor vai fechar a ligação
+                                raise smtplib.SMTPServerDisconnected(e.smtp_error) from e
+                            if isinstance(e, smtplib.SMTPSenderRefused):
+                                raise
+                            bounces.append((email, e.smtp_code, e.smtp_error.decode('utf-8', 'replace')))
+                            result['bounced'] += 1
+                        conn.messages_sent += 1
+                        pending.pop(0)
+            except smtplib.SMTPSenderRefused as e:
+                # Problema do remetente, não dos destinatários: não conta como bounce
+                print(f"Remetente recusado pelo servidor SMTP: {e}")
+                break
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                # Ligação fechada pelo servidor depois de já ter enviado (limite de
+                # mensagens por ligação ou inatividade): segue logo noutra
+                if len(pending) < remaining or reused:
+                    continue
+                failures += 1
+                result['retried'] += len(pending)
+                print(f"Ligação SMTP perdida ({len(pending)} mensagens por enviar): {e}")
+                if failures < self.max_attempts:
+                    time.sleep(min(2 ** failures, 10))
+        result['failed'] += len(pending)
+        self.bounces.record(bounces)
+        return result
+
+
+def build_pipeline():
+    """Pipeline configurado por ambiente (GPAS_SMTP_HOST, ...); sem host o envio fica desligado"""
+    host = os.environ.get('GPAS_SMTP_HOST')
+    workers = int(os.environ.get('GPAS_EMAIL_WORKERS', 4))
+    pool = SMTPPool(
+        host,
+        port=int(os.environ.get('GPAS_SMTP_PORT', 587)),
+        username=os.environ.get('GPAS_SMTP_USER'),
+        password=os.environ.get('GPAS_SMTP_PASSWORD'),
+        starttls=os.environ.get('GPAS_SMTP_STARTTLS', '1') == '1',
+        size=workers
+    ) if host else None
+    return EmailPipeline(pool, os.environ.get('GPAS_EMAIL_FROM', 'GPAS 2.0 <noreply@gpas2.com>'),
+                         workers=workers, batch_size=int(os.environ.get('GPAS_EMAIL_BATCH', 100)))
+
+
+email_pipeline = build_pipeline()
+
+# Emails agendados pela automação diária (content_store) enviados à sequência nurture
+@scheduler.job('email_campaigns', '*/5 * * * *', jitter=30)
+def send_email_campaigns():
+    if not email_pipeline.enabled:
+        return
+    for item in content_store.due('email', limit=10):
+        campaign = item['payload']
+        report = email_pipeline.run('nurture', campaign['subject'], campaign['preview'])
+        # Marcada mesmo com falhas parciais: repetir reenviaria a quem já recebeu
+        content_store.mark([item['content_hash']], 'posted')
+        print(f"📧 {campaign['subject']}: {report['sent']} enviados, {report['bounced']} bounces, "
+              f"{report['failed']} falhas ({report['messages_per_second']} msg/s)")
+
+@scheduler.job('email_bounce_purge', '55 4 * * *', jitter=300)
+def purge_email_bounces():
+    email_pipeline.bounces.purge()
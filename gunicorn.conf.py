@@ -0,0 +1,37 @@
+# Configuração do gunicorn para o GPAS 2.0
+# Com preload a app (e opcionalmente o modelo de IA) é carregada uma vez no master
+# e os workers partilham essas páginas em copy-on-write.
+
+import gc
+import os
+
+preload_app = os.environ.get('GPAS_PRELOAD', '1') == '1'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Modo ASGI: uvicorn workers, com os endpoints de I/O assíncronos (ver asgi.py)
+asgi_mode = os.environ.get('GPAS_ASGI', '0') == '1'
+wsgi_app = 'asgi:app' if asgi_mode else 'app:app'
+if asgi_mode:
+    worker_class = 'uvicorn.workers.UvicornWorker'
+
+# gc.freeze(): objetos criados antes do fork passam para a geração permanente,
+# para que o GC dos workers não escreva nos seus cabeçalhos e não copie as páginas
+gc_freeze = preload_app and os.environ.get('GPAS_GC_FREEZE', '1') == '1'
+if gc_freeze:
+    gc.disable()
+
+# Threads não sobrevivem ao fork: os serviços em background arrancam em cada worker
+os.environ.setdefault('GPAS_PRELOAD_MODEL', '1' if preload_app else '0')
+
+
+def pre_fork(server, worker):
+    if gc_freeze:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if gc_freeze:
+        gc.enable()
+
+    from app import start_background_services
+    start_background_services()
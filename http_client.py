@@ -0,0 +1,330 @@
+# Cliente HTTP partilhado para todas as chamadas externas
+# Um pool de ligações keep-alive por host (requests no modo síncrono, httpx no
+# modo ASGI), concorrência limitada por host, timeouts, novas tentativas com
+# backoff aleatório e um circuit breaker; guarda latências por host.
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Métodos que podem ser repetidos sem efeitos duplicados
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """O host falhou repetidamente; pedidos recusados até ao fim do intervalo"""
+
+
+class HostBusyError(requests.exceptions.RequestException):
+    """Nenhuma vaga de concorrência livre para o host dentro do timeout"""
+
+
+class CircuitBreaker:
+    """closed → open após `failure_threshold` falhas seguidas; half-open após `reset_timeout`
+
+    Em half-open passa um único pedido de teste: sucesso fecha, falha volta a abrir.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def cancel(self):
+        """Pedido terminou sem resultado (erro do chamador): liberta o teste em half-open"""
+        with self.lock:
+            self.probing = False
+
+
+class HostStats:
+    """Contadores e latências recentes (ms) de um host"""
+
+    def __init__(self, window=2048):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms, error):
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+            self.latencies.append(latency_ms)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            counters = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight
+            }
+        count = len(latencies)
+        counters['latency_ms'] = {
+            'p50': round(latencies[count // 2], 2),
+            'p90': round(latencies[min(int(count * 0.9), count - 1)], 2),
+            'p99': round(latencies[min(int(count * 0.99), count - 1)], 2),
+            'max': round(latencies[-1], 2)
+        } if count else None
+        return counters
+
+
+class Host:
+    """Estado por host: pools, vagas de concorrência, circuit breaker e métricas"""
+
+    def __init__(self, origin, max_concurrency, breaker):
+        self.origin = origin
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = breaker
+        self.stats = HostStats()
+        # Modo ASGI: criados no primeiro pedido, dentro do event loop do worker
+        self.async_client = None
+        self.async_slots = None
+
+
+class HTTPClient:
+    """Pedidos HTTP de saída com pool por host, novas tentativas e circuit breaker
+
+    `request()` devolve a resposta final (mesmo 4xx/5xx, como o requests);
+    só erros de rede esgotadas as tentativas, circuito aberto ou host saturado
+    levantam exceção.
+    """
+
+    def __init__(self, timeout=(3.05, 10.0), max_concurrency=32, retries=2,
+                 backoff_base=0.1, backoff_max=2.0, acquire_timeout=5.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hosts = {}
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def host(self, url):
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        with self.lock:
+            # Sockets não atravessam um fork: cada worker abre os seus pools
+            if self.pid != os.getpid():
+                self.hosts = {}
+                self.pid = os.getpid()
+            host = self.hosts.get(origin)
+            if host is None:
+                host = self.hosts[origin] = Host(
+                    origin, self.max_concurrency, CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+        return host
+
+    def _attempts(self, method, retries):
+        if retries is None:
+            retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        return retries + 1
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full jitter: uniforme entre 0 e base·2^tentativa (limitado), ou o Retry-After"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _busy(self, host):
+        with host.stats.lock:
+            host.stats.rejected += 1
+        return HostBusyError(f'{host.origin}: {host.max_concurrency} pedidos em curso')
+
+    def _admit(self, host):
+        if not host.breaker.allow():
+            with host.stats.lock:
+                host.stats.rejected += 1
+            raise CircuitOpenError(f'Circuito aberto para {host.origin}')
+        with host.stats.lock:
+            host.stats.in_flight += 1
+
+    def _abandon(self, host):
+        with host.stats.lock:
+            host.stats.in_flight -= 1
+        host.breaker.cancel()
+
+    def _finish(self, host, started, response, error, attempt, attempts):
+        """Regista a tentativa; devolve o tempo de espera antes de repetir ou None"""
+        failed = error is not None or response.status_code >= 500
+        with host.stats.lock:
+            host.stats.in_flight -= 1
+        host.stats.record((time.perf_counter() - started) * 1000, failed)
+        if failed:
+            host.breaker.record_failure()
+        else:
+            host.breaker.record_success()
+
+        retryable = error is not None or response.status_code in RETRY_STATUSES
+        if not retryable or attempt == attempts - 1:
+            return None
+        with host.stats.lock:
+            host.stats.retries += 1
+        return self._backoff(attempt, response.headers.get('Retry-After') if response is not None else None)
+
+    def request(self, method, url, retries=None, **kwargs):
+        host = self.host(url)
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = self._attempts(method, retries)
+
+        for attempt in range(attempts):
+            if not host.slots.acquire(timeout=self.acquire_timeout):
+                raise self._busy(host)
+            response = error = None
+            try:
+                self._admit(host)
+                started = time.perf_counter()
+                try:
+                    response = host.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                except Exception:
+                    self._abandon(host)
+                    raise
+            finally:
+                host.slots.release()
+
+            delay = self._finish(host, started, response, error, attempt, attempts)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _async_host(self, url):
+        host = self.host(url)
+        if host.async_client is None:
+            import httpx
+
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            host.async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=host.max_concurrency,
+                                    max_keepalive_connections=host.max_concurrency),
+                timeout=httpx.Timeout(read, connect=connect)
+            )
+            # Fila no semáforo e não no pool do httpcore, que percorre todas as
+            # ligações por cada pedido pendente
+            host.async_slots = asyncio.Semaphore(host.max_concurrency)
+        return host
+
+    async def request_async(self, method, url, retries=None, **kwargs):
+        """Como `request()`, sobre httpx.AsyncClient (modo ASGI)"""
+        import httpx
+
+        host = self._async_host(url)
+        attempts = self._attempts(method, retries)
+
+        for attempt in range(attempts):
+            try:
+                await asyncio.wait_for(host.async_slots.acquire(), self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise self._busy(host) from None
+            response = error = None
+            try:
+                self._admit(host)
+                started = time.perf_counter()
+                try:
+                    response = await host.async_client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    error = e
+                except BaseException:
+                    self._abandon(host)
+                    raise
+            finally:
+                host.async_slots.release()
+
+            delay = self._finish(host, started, response, error, attempt, attempts)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        """Fecha os clientes httpx do worker (shutdown do modo ASGI)"""
+        if self.pid != os.getpid():
+            return
+        for host in list(self.hosts.values()):
+            if host.async_client is not None:
+                await host.async_client.aclose()
+                host.async_client = None
+
+    def stats(self):
+        return {
+            origin: {'circuit': host.breaker.state, **host.stats.snapshot()}
+            for origin, host in sorted(self.hosts.items())
+        } if self.pid == os.getpid() else {}
+
+
+http_client = HTTPClient(
+    timeout=(float(os.environ.get('GPAS_HTTP_CONNECT_TIMEOUT', 3.05)), float(os.environ.get('GPAS_HTTP_TIMEOUT', 10))),
+    max_concurrency=int(os.environ.get('GPAS_HTTP_MAX_CONCURRENCY', 32)),
+    retries=int(os.environ.get('GPAS_HTTP_RETRIES', 2)),
+    failure_threshold=int(os.environ.get('GPAS_HTTP_BREAKER_FAILURES', 5)),
+    reset_timeout=float(os.environ.get('GPAS_HTTP_BREAKER_RESET', 30))
+)
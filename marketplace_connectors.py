@@ -0,0 +1,102 @@
+# Conectores de pesquisa nos marketplaces
+# Por omissão os resultados são simulados; com GPAS_MARKETPLACE_API_URL cada
+# marketplace é consultado por HTTP (API real, agregador ou o stand-in local).
+
+import os
+import random
+
+from http_client import http_client
+
+
+def product_title(query, index):
+    """Título do resultado `index` de uma pesquisa (também a chave da série em price_history)"""
+    return f"{query} - Variante {index+1}"
+
+
+class MarketplaceConnector:
+    """Pesquisa de produtos num marketplace"""
+
+    def __init__(self, marketplace_id, marketplace):
+        self.marketplace_id = marketplace_id
+        self.marketplace = marketplace
+
+    def product(self, query, index, price, **fields):
+        """Produto no formato devolvido por /api/search"""
+        product = {
+            "id": f"{self.marketplace_id}_{index}_{random.randint(1000, 9999)}",
+            "title": product_title(query, index),
+            "marketplace": self.marketplace['name'],
+            "marketplace_id": self.marketplace_id,
+            "price": round(price, 2),
+            "currency": "EUR",
+            "image_url": f"https://via.placeholder.com/300x300?text={query.replace(' ', '+')}"
+        }
+        product.update(fields)
+        return product
+
+    def search(self, query):
+        raise NotImplementedError
+
+    async def search_async(self, query):
+        """Versão assíncrona (modo ASGI)"""
+        return self.search(query)
+
+
+class SimulatedConnector(MarketplaceConnector):
+    """Resultados aleatórios (desenvolvimento e demonstrações)"""
+
+    def search(self, query):
+        products = []
+        for i in range(random.randint(3, 8)):
+            products.append(self.product(
+                query, i, random.uniform(10, 500),
+                availability=random.choice(["in_stock", "limited", "out_of_stock"]),
+                rating=round(random.uniform(3.5, 5.0), 1),
+                reviews=random.randint(10, 1000),
+                shipping_cost=round(random.uniform(0, 15), 2),
+                estimated_delivery=f"{random.randint(1, 14)} dias",
+                seller_rating=round(random.uniform(4.0, 5.0), 1)
+            ))
+        return products
+
+
+class HTTPConnector(MarketplaceConnector):
+    """Consulta GET {base_url}/marketplaces/{id}/search?q=..."""
+
+    FIELDS = ('availability', 'rating', 'reviews', 'shipping_cost', 'estimated_delivery', 'seller_rating')
+
+    def __init__(self, marketplace_id, marketplace, base_url, timeout=5.0, client=http_client):
+        super().__init__(marketplace_id, marketplace)
+        self.url = f"{base_url.rstrip('/')}/marketplaces/{marketplace_id}/search"
+        self.timeout = timeout
+        self.client = client
+
+    def search(self, query):
+        response = self.client.get(self.url, params={'q': query}, timeout=self.timeout)
+        response.raise_for_status()
+        return self.products(query, response.json())
+
+    async def search_async(self, query):
+        response = await self.client.request_async('GET', self.url, params={'q': query}, timeout=self.timeout)
+        response.raise_for_status()
+        return self.products(query, response.json())
+
+    def products(self, query, payload):
+        return [
+            self.product(query, i, item['price'], **{field: item[field] for field in self.FIELDS if field in item})
+            for i, item in enumerate(payload.get('results', []))
+        ]
+
+
+def build_connectors(marketplaces):
+    """Um conector por marketplace ativo, conforme a configuração do ambiente"""
+    base_url = os.environ.get('GPAS_MARKETPLACE_API_URL')
+    if not base_url:
+        return {mid: SimulatedConnector(mid, m) for mid, m in marketplaces.items() if m['active']}
+
+    # Pools, novas tentativas e circuit breaker por host vêm do http_client partilhado
+    timeout = float(os.environ.get('GPAS_MARKETPLACE_TIMEOUT', 5.0))
+    return {
+        mid: HTTPConnector(mid, m, base_url, timeout)
+        for mid, m in marketplaces.items() if m['active']
+    }
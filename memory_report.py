@@ -0,0 +1,64 @@
+# Relatório de memória dos workers (Linux /proc)
+# Distingue páginas partilhadas (copy-on-write, mmap) das privadas de cada processo
+
+import os
+
+
+def smaps_rollup(pid):
+    """Memória do processo em kB (Rss, Pss, partilhada e privada)"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss_kb': values.get('Rss', 0),
+        'pss_kb': values.get('Pss', 0),
+        'shared_kb': values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0),
+        'private_kb': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _is_gunicorn(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            args = f.read().split(b'\0')
+    except OSError:
+        return False
+    # "gunicorn ...", "python -m gunicorn ..." ou o título "gunicorn: master [...]"
+    return any(os.path.basename(arg).startswith(b'gunicorn') for arg in args[:3])
+
+
+def collect():
+    """Memória deste processo e, sob gunicorn, do master e de todos os workers"""
+    pid = os.getpid()
+    master = os.getppid()
+
+    if _is_gunicorn(master):
+        workers = child_pids(master) or [pid]
+    else:
+        master, workers = None, [pid]
+
+    report = {
+        'pid': pid,
+        'master': dict(pid=master, **smaps_rollup(master)) if master else None,
+        'workers': []
+    }
+    for worker in workers:
+        try:
+            report['workers'].append(dict(pid=worker, current=worker == pid, **smaps_rollup(worker)))
+        except OSError:
+            continue  # worker terminou entretanto
+
+    report['total_private_kb'] = sum(w['private_kb'] for w in report['workers'])
+    report['total_shared_kb'] = sum(w['shared_kb'] for w in report['workers'])
+    return report
@@ -0,0 +1,199 @@
+# Armazenamento partilhado do modelo de IA
+# As árvores do RandomForest são exportadas para ficheiros .npy mapeados em memória
+# (só de leitura), pelo que todos os workers partilham as mesmas páginas.
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from storage import data_path
+
+ARRAYS = ('roots', 'children_left', 'children_right', 'feature', 'threshold', 'value')
+
+
+def forest_arrays(model):
+    """Arrays planos das árvores de um RandomForestRegressor"""
+    import numpy as np
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    if any(tree.n_outputs != 1 for tree in trees):
+        raise ValueError("Só são suportados modelos de regressão com uma saída")
+
+    counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    def children(tree, offset, attr):
+        nodes = getattr(tree, attr).astype(np.int64)
+        return np.where(nodes == -1, -1, nodes + offset)
+
+    return {
+        'roots': roots,
+        'children_left': np.concatenate([children(t, o, 'children_left') for t, o in zip(trees, roots)]),
+        'children_right': np.concatenate([children(t, o, 'children_right') for t, o in zip(trees, roots)]),
+        'feature': np.concatenate([np.maximum(t.feature, 0) for t in trees]).astype(np.int32),
+        'threshold': np.concatenate([t.threshold for t in trees]).astype(np.float64),
+        'value': np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64)
+    }, int(max(tree.max_depth for tree in trees))
+
+
+def merge_arrays(base, arrays, keep_trees):
+    """Junta as últimas `keep_trees` árvores de uma floresta publicada às novas"""
+    import numpy as np
+
+    keep_trees = min(keep_trees, len(base.roots))
+    if keep_trees <= 0:
+        return arrays
+
+    first = int(base.roots[len(base.roots) - keep_trees])
+    offset = len(base.value) - first
+
+    def shift(nodes, delta):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return np.where(nodes == -1, -1, nodes + delta)
+
+    return {
+        'roots': np.concatenate([base.roots[-keep_trees:] - first, arrays['roots'] + offset]),
+        'children_left': np.concatenate([shift(base.children_left[first:], -first),
+                                         shift(arrays['children_left'], offset)]),
+        'children_right': np.concatenate([shift(base.children_right[first:], -first),
+                                          shift(arrays['children_right'], offset)]),
+        'feature': np.concatenate([base.feature[first:], arrays['feature']]),
+        'threshold': np.concatenate([base.threshold[first:], arrays['threshold']]),
+        'value': np.concatenate([base.value[first:], arrays['value']])
+    }
+
+
+def export_forest(model, path, base=None, keep_trees=0):
+    """Escreve as árvores de um RandomForestRegressor como arrays contíguos
+
+    Com `base`, as últimas `keep_trees` árvores dessa floresta são mantidas
+    (warm start: só as árvores novas são treinadas).
+    """
+    import numpy as np
+
+    arrays, max_depth = forest_arrays(model)
+    if base is not None and keep_trees > 0:
+        if base.meta['n_features'] != model.n_features_in_:
+            raise ValueError("A floresta base tem um número de features diferente")
+        arrays = merge_arrays(base, arrays, keep_trees)
+        max_depth = max(max_depth, base.meta['max_depth'])
+
+    os.makedirs(path)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+
+    meta = {
+        'n_trees': len(arrays['roots']),
+        'n_nodes': len(arrays['value']),
+        'n_features': int(model.n_features_in_),
+        'max_depth': max_depth
+    }
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return meta
+
+
+class SharedForest:
+    """Floresta só de leitura sobre arrays mapeados em memória
+
+    Reproduz RandomForestRegressor.predict: as features são comparadas em
+    float32, como no sklearn, e o resultado é a média das folhas.
+    """
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def predict(self, X):
+        import numpy as np
+
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.meta['n_features']:
+            raise ValueError(f"Esperadas {self.meta['n_features']} features por linha")
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+
+        for _ in range(self.meta['max_depth']):
+            left = self.children_left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.children_right[nodes]), nodes)
+
+        return self.value[nodes].mean(axis=1)
+
+
+class ModelStore:
+    """Versões publicadas do modelo; o ficheiro CURRENT aponta para a ativa"""
+
+    def __init__(self, root=None):
+        self.root = root or data_path('model')
+        os.makedirs(self.root, exist_ok=True)
+
+    @contextmanager
+    def training_lock(self):
+        """Lock entre processos para que só um worker treine de cada vez"""
+        with open(os.path.join(self.root, 'train.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def stage(self, model, base=None, keep_trees=0):
+        """Exporta o modelo para uma nova versão sem a ativar"""
+        version = f"v{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{time.monotonic_ns() % 1000000}"
+        tmp_path = os.path.join(self.root, f'.{version}')
+        export_forest(model, tmp_path, base, keep_trees)
+        os.rename(tmp_path, os.path.join(self.root, version))
+        return version
+
+    def activate(self, version):
+        """Aponta CURRENT para `version` de forma atómica"""
+        pointer = os.path.join(self.root, f'.CURRENT-{os.getpid()}')
+        with open(pointer, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(self.root, 'CURRENT'))
+        return version
+
+    def publish(self, model, base=None, keep_trees=0):
+        """Exporta o modelo para uma nova versão e ativa-a de forma atómica"""
+        return self.activate(self.stage(model, base, keep_trees))
+
+    def load(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return None
+        forest = SharedForest(os.path.join(self.root, version))
+        forest.version = version
+        return forest
+
+    def cleanup(self, keep=3):
+        """Remove versões antigas (os workers que ainda as mapeiam não são afetados)"""
+        current = self.current_version()
+        versions = sorted(v for v in os.listdir(self.root) if v.startswith('v') and v != current)
+        for version in versions[:max(len(versions) - keep + 1, 0)]:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
@@ -1,76 +1,105 @@
 # Sistema de Pagamentos Stripe Integration
 # Para monetização real do GPAS 2.0
 
-from flask import Blueprint, request, jsonify, redirect
-import stripe
+from flask import Blueprint, current_app, request, jsonify, redirect
+import hashlib
 import os
+import re
+import secrets
+import threading
 from datetime import datetime, timedelta
 import json
 
+from auth_cache import TOKEN_ERRORS, authenticate
+from plans import PRICING_PLANS
+from checkout_cache import checkout_cache, checkout_reuse
+from pricing_experiments import pricing_experiments
+from revenue_ledger import revenue_ledger
+from scheduler import scheduler
+from subscriptions import subscription_store
+from webhook_queue import WebhookQueue
+
 # Configuração do Stripe
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_...')  # Usar chave real em produção
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_...')
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_...')  # Usar chave real em produção
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
+
+_stripe = None
+_stripe_lock = threading.Lock()
+
+def _stripe_http_client(stripe):
+    """Cliente HTTP do SDK do Stripe sobre o http_client partilhado (pool, circuit breaker, métricas)"""
+    from http_client import http_client
+    
+    class StripeHTTPClient(stripe.http_client.RequestsClient):
+        name = 'gpas'
+        
+        def _request_internal(self, method, url, headers, post_data, is_streaming):
+            # O SDK repete os pedidos com Idempotency-Key: sem novas tentativas aqui
+            try:
+                result = http_client.request(
+                    method, url, retries=0, headers=headers, data=post_data,
+                    timeout=self._timeout, stream=is_streaming
+                )
+            except Exception as e:
+                self._handle_request_error(e)
+            content = result.raw if is_streaming else result.content
+            return content, result.status_code, result.headers
+    
+    return StripeHTTPClient
+
+def get_stripe():
+    """Importa e configura o SDK do Stripe no primeiro uso"""
+    global _stripe
+    if _stripe is None:
+        with _stripe_lock:
+            if _stripe is None:
+                import stripe
+                
+                stripe.api_key = STRIPE_SECRET_KEY
+                stripe.api_base = STRIPE_API_BASE
+                stripe.max_network_retries = 2
+                stripe.default_http_client = _stripe_http_client(stripe)(
+                    timeout=float(os.environ.get('STRIPE_TIMEOUT', 10))
+                )
+                _stripe = stripe
+    return _stripe
+
+# Nonce gerado pelo cliente para agrupar cliques repetidos de um comprador anónimo
+CHECKOUT_NONCE = re.compile(r'[A-Za-z0-9_-]{16,64}')
 
 # Blueprint para pagamentos
 payments_bp = Blueprint('payments', __name__)
 
-# Planos de preços
-PRICING_PLANS = {
-    'starter': {
-        'name': 'Starter',
-        'price_monthly': 19,
-        'price_annual': 13,
-        'stripe_price_id_monthly': 'price_starter_monthly',
-        'stripe_price_id_annual': 'price_starter_annual',
-        'features': [
-            '100 pesquisas/dia',
-            '3 marketplaces',
-            'IA básica',
-            'Suporte email'
-        ]
-    },
-    'professional': {
-        'name': 'Professional',
-        'price_monthly': 49,
-        'price_annual': 34,
-        'stripe_price_id_monthly': 'price_professional_monthly',
-        'stripe_price_id_annual': 'price_professional_annual',
-        'features': [
-            'Pesquisas ilimitadas',
-            '15+ marketplaces',
-            'IA avançada completa',
-            'Automação total',
-            'Comandos por voz',
-            'Suporte prioritário'
-        ]
-    },
-    'enterprise': {
-        'name': 'Enterprise',
-        'price_monthly': 99,
-        'price_annual': 69,
-        'stripe_price_id_monthly': 'price_enterprise_monthly',
-        'stripe_price_id_annual': 'price_enterprise_annual',
-        'features': [
-            'Tudo do Professional',
-            'API access',
-            'White-label',
-            'Utilizadores ilimitados',
-            'Suporte dedicado'
-        ]
-    }
-}
+# Configuração pública serializada uma vez no registo do blueprint
+_config_body = None
+_config_etag = None
+
+def build_public_config(app):
+    """Pré-serializa a configuração pública e calcula o seu ETag"""
+    global _config_body, _config_etag
+    _config_body = app.json.dumps({
+        'publishable_key': STRIPE_PUBLISHABLE_KEY,
+        'plans': PRICING_PLANS
+    }).encode('utf-8') + b'\n'
+    _config_etag = hashlib.sha256(_config_body).hexdigest()[:32]
 
 @payments_bp.route('/api/payments/config', methods=['GET'])
 def get_stripe_config():
     """Retorna configuração pública do Stripe"""
-    return jsonify({
-        'publishable_key': STRIPE_PUBLISHABLE_KEY,
-        'plans': PRICING_PLANS
-    })
+    if _config_body is None:
+        build_public_config(current_app)
+    
+    response = current_app.response_class(_config_body, mimetype='application/json')
+    response.set_etag(_config_etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 @payments_bp.route('/api/payments/create-checkout-session', methods=['POST'])
 def create_checkout_session():
     """Cria sessão de checkout do Stripe"""
+    stripe = get_stripe()
     try:
         data = request.get_json()
         plan = data.get('plan')
@@ -79,11 +108,38 @@ def create_checkout_session():
         if plan not in PRICING_PLANS:
             return jsonify({'error': 'Plano inválido'}), 400
         
-        plan_data = PRICING_PLANS[plan]
-        price_id = plan_data[f'stripe_price_id_{billing}']
+        # Duplo clique ou refresh: devolver a sessão criada há pouco. Só para identidades
+        # estáveis (utilizador autenticado ou nonce do cliente); nunca por IP, que o router
+        # do Heroku e os NATs partilham entre compradores diferentes
+        try:
+            auth = authenticate(optional=True)
+        except TOKEN_ERRORS:
+            # Token inválido ou expirado: o checkout continua como anónimo
+            auth = None
+        nonce = data.get('checkout_nonce')
+        if nonce is not None and not (isinstance(nonce, str) and CHECKOUT_NONCE.fullmatch(nonce)):
+            return jsonify({'error': 'checkout_nonce inválido (16 a 64 caracteres [A-Za-z0-9_-])'}), 400
+        owner = auth['identity'] if auth else (f'nonce:{nonce}' if nonce else None)
+        
+        reused = checkout_reuse.get(owner, plan, billing) if owner else None
+        if reused:
+            return jsonify({
+                'checkout_session_id': reused['session_id'],
+                'checkout_url': reused['url']
+            })
+        
+        # Variante de preço da experiência em curso (tabela em memória)
+        variant = pricing_experiments.assign(owner or secrets.token_hex(16), plan, billing)
+        price_id = variant['stripe_price_id']
+        
+        options = {}
+        if owner:
+            # A variante entra na chave: o Stripe recusa a mesma chave com outro preço
+            options['idempotency_key'] = checkout_reuse.idempotency_key(owner, f"{plan}:{variant['id']}", billing)
         
         # Criar sessão de checkout
         checkout_session = stripe.checkout.Session.create(
+            **options,
             payment_method_types=['card'],
             line_items=[{
                 'price': price_id,
@@ -94,10 +150,16 @@ def create_checkout_session():
             cancel_url=request.host_url + 'cancel',
             metadata={
                 'plan': plan,
-                'billing': billing
+                'billing': billing,
+                'price_variant': variant['id']
             }
         )
         
+        # Só conta o início quando a sessão existe (um erro do Stripe não é um início)
+        pricing_experiments.record_start(plan, billing, variant['id'])
+        if owner:
+            checkout_reuse.put(owner, plan, billing, checkout_session.id, checkout_session.url)
+        
         return jsonify({
             'checkout_session_id': checkout_session.id,
             'checkout_url': checkout_session.url
@@ -109,6 +171,7 @@ def create_checkout_session():
 @payments_bp.route('/api/payments/webhook', methods=['POST'])
 def stripe_webhook():
     """Webhook para eventos do Stripe"""
+    stripe = get_stripe()
     payload = request.get_data()
     sig_header = request.headers.get('Stripe-Signature')
     endpoint_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
@@ -122,18 +185,10 @@ def stripe_webhook():
     except stripe.error.SignatureVerificationError:
         return jsonify({'error': 'Invalid signature'}), 400
     
-    # Processar eventos
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        handle_successful_payment(session)
-    elif event['type'] == 'invoice.payment_succeeded':
-        invoice = event['data']['object']
-        handle_subscription_renewal(invoice)
-    elif event['type'] == 'customer.subscription.deleted':
-        subscription = event['data']['object']
-        handle_subscription_cancelled(subscription)
+    # Persistir e confirmar já; o processamento corre no pool de workers
+    queued = webhook_queue.enqueue(event, payload.decode('utf-8'))
     
-    return jsonify({'status': 'success'})
+    return jsonify({'status': 'success', 'duplicate': not queued})
 
 def handle_successful_payment(session):
     """Processa pagamento bem-sucedido"""
@@ -141,8 +196,16 @@ def handle_successful_payment(session):
     plan = session.get('metadata', {}).get('plan')
     billing = session.get('metadata', {}).get('billing')
     
-    # Atualizar utilizador na base de dados
-    # (implementar lógica de atualização do plano do utilizador)
+    # Guardar para a página /success não precisar de chamar a API do Stripe
+    checkout_cache.put(session)
+    revenue_ledger.record_checkout(session)
+    pricing_experiments.record_conversion(session)
+    
+    # Atualizar plano do utilizador (em lote com outros eventos; propaga aos workers)
+    if customer_email and plan in PRICING_PLANS:
+        subscription_store.activate(
+            customer_email, session.get('customer'), plan, billing, session.get('subscription')
+        )
     
     print(f"Pagamento bem-sucedido: {customer_email} - Plano: {plan} ({billing})")
 
@@ -151,64 +214,95 @@ def handle_subscription_renewal(invoice):
     customer_id = invoice.get('customer')
     amount_paid = invoice.get('amount_paid') / 100  # Converter de centavos
     
+    revenue_ledger.record_invoice(invoice)
+    subscription_store.renew(customer_id, invoice.get('customer_email'))
+    
     print(f"Subscrição renovada: Cliente {customer_id} - €{amount_paid}")
 
 def handle_subscription_cancelled(subscription):
     """Processa cancelamento de subscrição"""
     customer_id = subscription.get('customer')
     
-    # Downgrade utilizador para plano gratuito
+    # Downgrade utilizador para plano de entrada
+    revenue_ledger.record_cancellation(subscription)
+    subscription_store.cancel(customer_id)
     print(f"Subscrição cancelada: Cliente {customer_id}")
 
+# Handlers por tipo de evento, executados pelos workers da fila
+WEBHOOK_HANDLERS = {
+    'checkout.session.completed': handle_successful_payment,
+    'invoice.payment_succeeded': handle_subscription_renewal,
+    'customer.subscription.deleted': handle_subscription_cancelled
+}
+
+webhook_queue = WebhookQueue(WEBHOOK_HANDLERS)
+
+@scheduler.job('webhook_queue_purge', '40 4 * * *', jitter=300)
+def purge_webhook_events():
+    webhook_queue.purge()
+    checkout_cache.purge()
+    subscription_store.purge()
+
+def get_checkout_session(session_id):
+    """Sessão de checkout da cache; só em falta chama a API do Stripe"""
+    session = checkout_cache.get(session_id)
+    if session is None:
+        session = checkout_cache.put(get_stripe().checkout.Session.retrieve(session_id))
+    return session
+
 # Páginas de sucesso e cancelamento
+def render_success_page(session_id, session):
+    """HTML da página de sucesso (também usado pelo modo ASGI)"""
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Pagamento Realizado com Sucesso!</title>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; background: #f0f9ff; }}
+            .success-container {{ max-width: 600px; margin: 0 auto; background: white; padding: 40px; border-radius: 12px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+            .success-icon {{ font-size: 4rem; color: #10b981; margin-bottom: 20px; }}
+            h1 {{ color: #1f2937; margin-bottom: 20px; }}
+            p {{ color: #6b7280; font-size: 18px; line-height: 1.6; }}
+            .btn {{ background: #6366f1; color: white; padding: 12px 24px; border: none; border-radius: 8px; font-size: 16px; cursor: pointer; text-decoration: none; display: inline-block; margin-top: 20px; }}
+            .btn:hover {{ background: #4f46e5; }}
+        </style>
+    </head>
+    <body>
+        <div class="success-container">
+            <div class="success-icon">🎉</div>
+            <h1>Pagamento Realizado com Sucesso!</h1>
+            <p>Obrigado por te juntares ao GPAS 2.0! A tua subscrição está ativa e podes começar a gerar receita imediatamente.</p>
+            <p><strong>Próximos passos:</strong></p>
+            <p>1. Acede ao teu dashboard<br>
+            2. Configura os teus marketplaces preferidos<br>
+            3. Deixa a IA encontrar oportunidades para ti</p>
+            <a href="/dashboard.html" class="btn">Ir para Dashboard</a>
+        </div>
+        <script>
+            // Tracking de conversão
+            if (typeof gtag !== 'undefined') {{
+                gtag('event', 'purchase', {{
+                    'transaction_id': '{session_id}',
+                    'value': {session['amount_total'] / 100},
+                    'currency': 'EUR'
+                }});
+            }}
+        </script>
+    </body>
+    </html>
+    """
+
 @payments_bp.route('/success')
 def payment_success():
     """Página de sucesso após pagamento"""
     session_id = request.args.get('session_id')
     
-    if session_id:
+    if session_id and session_id.startswith('cs_'):
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Pagamento Realizado com Sucesso!</title>
-                <meta charset="UTF-8">
-                <style>
-                    body {{ font-family: Arial, sans-serif; text-align: center; padding: 50px; background: #f0f9ff; }}
-                    .success-container {{ max-width: 600px; margin: 0 auto; background: white; padding: 40px; border-radius: 12px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
-                    .success-icon {{ font-size: 4rem; color: #10b981; margin-bottom: 20px; }}
-                    h1 {{ color: #1f2937; margin-bottom: 20px; }}
-                    p {{ color: #6b7280; font-size: 18px; line-height: 1.6; }}
-                    .btn {{ background: #6366f1; color: white; padding: 12px 24px; border: none; border-radius: 8px; font-size: 16px; cursor: pointer; text-decoration: none; display: inline-block; margin-top: 20px; }}
-                    .btn:hover {{ background: #4f46e5; }}
-                </style>
-            </head>
-            <body>
-                <div class="success-container">
-                    <div class="success-icon">🎉</div>
-                    <h1>Pagamento Realizado com Sucesso!</h1>
-                    <p>Obrigado por te juntares ao GPAS 2.0! A tua subscrição está ativa e podes começar a gerar receita imediatamente.</p>
-                    <p><strong>Próximos passos:</strong></p>
-                    <p>1. Acede ao teu dashboard<br>
-                    2. Configura os teus marketplaces preferidos<br>
-                    3. Deixa a IA encontrar oportunidades para ti</p>
-                    <a href="/dashboard.html" class="btn">Ir para Dashboard</a>
-                </div>
-                <script>
-                    // Tracking de conversão
-                    if (typeof gtag !== 'undefined') {{
-                        gtag('event', 'purchase', {{
-                            'transaction_id': '{session_id}',
-                            'value': {session.amount_total / 100},
-                            'currency': 'EUR'
-                        }});
-                    }}
-                </script>
-            </body>
-            </html>
-            """
+            session = get_checkout_session(session_id)
+            return render_success_page(session_id, session)
         except Exception as e:
             return f"Erro ao verificar pagamento: {e}", 500
     
@@ -249,5 +343,6 @@ def payment_cancel():
 def register_payments(app):
     """Regista funcionalidades de pagamento na app"""
     app.register_blueprint(payments_bp)
+    build_public_config(app)
     return app
 
@@ -0,0 +1,71 @@
+# Planos de preços do GPAS 2.0
+# Módulo sem dependências: o rate limiting, o livro de receitas e as experiências
+# de preço leem os planos sem importar a cadeia de pagamentos (Stripe, webhooks).
+
+PRICING_PLANS = {
+    'starter': {
+        'name': 'Starter',
+        'price_monthly': 19,
+        'price_annual': 13,
+        'stripe_price_id_monthly': 'price_starter_monthly',
+        'stripe_price_id_annual': 'price_starter_annual',
+        'features': [
+            '100 pesquisas/dia',
+            '3 marketplaces',
+            'IA básica',
+            'Suporte email'
+        ]
+    },
+    'professional': {
+        'name': 'Professional',
+        'price_monthly': 49,
+        'price_annual': 34,
+        'stripe_price_id_monthly': 'price_professional_monthly',
+        'stripe_price_id_annual': 'price_professional_annual',
+        'features': [
+            'Pesquisas ilimitadas',
+            '15+ marketplaces',
+            'IA avançada completa',
+            'Automação total',
+            'Comandos por voz',
+            'Suporte prioritário'
+        ]
+    },
+    'enterprise': {
+        'name': 'Enterprise',
+        'price_monthly': 99,
+        'price_annual': 69,
+        'stripe_price_id_monthly': 'price_enterprise_monthly',
+        'stripe_price_id_annual': 'price_enterprise_annual',
+        'features': [
+            'Tudo do Professional',
+            'API access',
+            'White-label',
+            'Utilizadores ilimitados',
+            'Suporte dedicado'
+        ]
+    }
+}
+
+# Token buckets: por utilizador e partilhado por todos os utilizadores do plano.
+# Fora de PRICING_PLANS, que é servido publicamente em /api/payments/config.
+PLAN_RATE_LIMITS = {
+    'starter': {
+        'capacity': 60,
+        'refill_per_second': 1,
+        'plan_capacity': 3000,
+        'plan_refill_per_second': 50
+    },
+    'professional': {
+        'capacity': 300,
+        'refill_per_second': 5,
+        'plan_capacity': 6000,
+        'plan_refill_per_second': 100
+    },
+    'enterprise': {
+        'capacity': 1000,
+        'refill_per_second': 20,
+        'plan_capacity': 10000,
+        'plan_refill_per_second': 200
+    }
+}
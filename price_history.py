@@ -0,0 +1,404 @@
+# Histórico de preços por produto/marketplace em colunas NumPy
+# As observações ficam num buffer por processo e são gravadas em segmentos
+# imutáveis (um .npy por coluna, ordenados por série e tempo) mapeados em memória.
+# Um manifest protegido por flock lista os segmentos ativos; a compactação junta
+# os segmentos pequenos sem bloquear os leitores.
+
+import fcntl
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from scheduler import scheduler
+from storage import data_path
+
+COLUMNS = {
+    'series': 'int64',
+    'ts': 'float64',
+    'price': 'float32',
+    'category': 'int16',
+    'marketplace': 'int16'
+}
+
+DAY = 86400
+
+
+def series_id(product, marketplace):
+    """Identificador estável (64 bits) da série de um produto num marketplace"""
+    key = f'{product.strip().lower()}|{marketplace}'.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little', signed=True)
+
+
+class PriceHistory:
+    """Store append-only com segmentos colunares e compactação"""
+
+    def __init__(self, root=None, flush_rows=5000, flush_interval=5.0, compact_rows=1_000_000):
+        self.root = root or data_path('price_history')
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compact_rows = compact_rows
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._manifest = None
+        self._manifest_key = None
+        self._segments = {}
+
+    # Manifest e segmentos
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    @contextmanager
+    def _manifest_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path('manifest.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path('manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': []}
+
+    def _write_manifest(self, manifest):
+        tmp = self._path(f'.manifest-{os.getpid()}.json')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path('manifest.json'))
+
+    def manifest(self):
+        """Manifest atual, relido só quando o ficheiro muda"""
+        try:
+            stat = os.stat(self._path('manifest.json'))
+        except FileNotFoundError:
+            return {'segments': []}
+        # Só o mtime não chega (duas escritas no mesmo tick do sistema de ficheiros);
+        # cada escrita é um os.replace e traz um inode novo
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._manifest_key:
+            self._manifest = self._read_manifest()
+            self._manifest_key = key
+            active = {segment['name'] for segment in self._manifest['segments']}
+            self._segments = {name: columns for name, columns in self._segments.items() if name in active}
+        return self._manifest
+
+    def _segment(self, name):
+        columns = self._segments.get(name)
+        if columns is None:
+            import numpy as np
+
+            columns = {
+                column: np.load(self._path(name, f'{column}.npy'), mmap_mode='r') for column in COLUMNS
+            }
+            self._segments[name] = columns
+        return columns
+
+    def _write_segment(self, columns):
+        """Ordena por (série, tempo) e grava um segmento novo; devolve a entrada do manifest"""
+        import numpy as np
+
+        order = np.lexsort((columns['ts'], columns['series']))
+        name = f'seg-{time.strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        tmp_path = self._path(f'.{name}')
+        os.makedirs(tmp_path)
+        for column, dtype in COLUMNS.items():
+            np.save(os.path.join(tmp_path, f'{column}.npy'), np.ascontiguousarray(columns[column][order], dtype=dtype))
+        os.rename(tmp_path, self._path(name))
+        return {
+            'name': name,
+            'rows': int(len(order)),
+            'min_ts': float(columns['ts'].min()),
+            'max_ts': float(columns['ts'].max())
+        }
+
+    # Escrita
+
+    def record(self, product, marketplace, price, category=-1, marketplace_index=-1, ts=None):
+        """Acrescenta uma observação (gravada em segmento em menos de flush_interval)"""
+        row = (series_id(product, marketplace), ts if ts is not None else time.time(),
+               price, category, marketplace_index)
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                self._buffer = []
+                threading.Thread(target=self._flush_loop, name='price-history-flush', daemon=True).start()
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Grava o buffer deste processo como um segmento novo"""
+        import numpy as np
+
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        series, ts, price, category, marketplace = zip(*rows)
+        columns = {
+            'series': np.array(series, dtype=np.int64),
+            'ts': np.array(ts, dtype=np.float64),
+            'price': np.array(price, dtype=np.float32),
+            'category': np.array(category, dtype=np.int16),
+            'marketplace': np.array(marketplace, dtype=np.int16)
+        }
+        with self._manifest_lock():
+            entry = self._write_segment(columns)
+            manifest = self._read_manifest()
+            manifest['segments'].append(entry)
+            self._write_manifest(manifest)
+        return len(rows)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar histórico de preços: {e}")
+
+    def compact(self):
+        """Junta segmentos pequenos num só (os leitores mantêm os mapeamentos antigos)"""
+        import numpy as np
+
+        with self._manifest_lock():
+            manifest = self._read_manifest()
+            small = [s for s in manifest['segments'] if s['rows'] < self.compact_rows]
+            if len(small) < 2:
+                return 0
+
+            merged = {}
+            for column in COLUMNS:
+                merged[column] = np.concatenate([
+                    np.load(self._path(s['name'], f'{column}.npy'), mmap_mode='r') for s in small
+                ])
+            entry = self._write_segment(merged)
+
+            names = {s['name'] for s in small}
+            manifest['segments'] = [s for s in manifest['segments'] if s['name'] not in names] + [entry]
+            self._write_manifest(manifest)
+
+        for name in names:
+            for column in COLUMNS:
+                try:
+                    os.remove(self._path(name, f'{column}.npy'))
+                except FileNotFoundError:
+                    pass
+            try:
+                os.rmdir(self._path(name))
+            except OSError:
+                pass
+        return len(small)
+
+    # Leitura
+
+    def _scan_segments(self, series, start, end, columns):
+        import numpy as np
+
+        parts = {column: [] for column in columns}
+        for segment in self.manifest()['segments']:
+            if segment['max_ts'] < start or segment['min_ts'] > end:
+                continue
+            arrays = self._segment(segment['name'])
+            lo = np.searchsorted(arrays['series'], series, side='left')
+            hi = np.searchsorted(arrays['series'], series, side='right')
+            if lo == hi:
+                continue
+            ts = arrays['ts'][lo:hi]
+            first = lo + np.searchsorted(ts, start, side='left')
+            last = lo + np.searchsorted(ts, end, side='right')
+            for column in columns:
+                parts[column].append(arrays[column][first:last])
+        return parts
+
+    def read(self, series, start=None, end=None, columns=('ts', 'price')):
+        """Colunas de uma série entre start e end (inclusive), ordenadas por tempo"""
+        import numpy as np
+
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        columns = tuple(columns)
+        try:
+            parts = self._scan_segments(series, start, end, columns)
+        except FileNotFoundError:
+            # Segmento removido por uma compactação concorrente: reler o manifest
+            self._manifest_key = None
+            parts = self._scan_segments(series, start, end, columns)
+
+        # Observações deste processo ainda por gravar
+        positions = list(COLUMNS)
+        with self._lock:
+            pending = [row for row in self._buffer if row[0] == series and start <= row[1] <= end]
+        if pending:
+            for column in columns:
+                index = positions.index(column)
+                parts[column].append(np.array([row[index] for row in pending], dtype=COLUMNS[column]))
+
+        result = {
+            column: np.concatenate(parts[column]) if parts[column] else np.empty(0, dtype=COLUMNS[column])
+            for column in columns
+        }
+        if len(parts[columns[0]]) > 1:
+            order = np.argsort(result['ts'], kind='stable')
+            result = {column: values[order] for column, values in result.items()}
+        return result
+
+    def range(self, series, start=None, end=None):
+        """Tempos e preços de uma série entre start e end (inclusive)"""
+        columns = self.read(series, start, end)
+        return columns['ts'], columns['price']
+
+    def series_ids(self):
+        """Todas as séries com observações gravadas"""
+        import numpy as np
+
+        ids = [np.unique(self._segment(segment['name'])['series']) for segment in self.manifest()['segments']]
+        return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+    def downsample(self, series, bucket_seconds, start=None, end=None):
+        """Agrega a série em intervalos fixos: início, média, mínimo, máximo, último, contagem"""
+        import numpy as np
+
+        ts, price = self.range(series, start, end)
+        if len(ts) == 0:
+            return {key: [] for key in ('ts', 'mean', 'min', 'max', 'last', 'count')}
+
+        buckets = np.floor(ts / bucket_seconds).astype(np.int64)
+        keys, first, counts = np.unique(buckets, return_index=True, return_counts=True)
+        sums = np.add.reduceat(price.astype(np.float64), first)
+        return {
+            'ts': (keys * bucket_seconds).astype(np.float64).tolist(),
+            'mean': (sums / counts).tolist(),
+            'min': np.minimum.reduceat(price, first).astype(np.float64).tolist(),
+            'max': np.maximum.reduceat(price, first).astype(np.float64).tolist(),
+            'last': price[first + counts - 1].astype(np.float64).tolist(),
+            'count': counts.tolist()
+        }
+
+    def features(self, series, now=None):
+        """Features do modelo a partir do histórico (None se a série não existe)
+
+        - médias móveis de 7 e 30 dias e volatilidade dos retornos diários
+        - sazonalidade: desvio da média de 30 dias face à do último ano, em [-1, 1]
+        - procura: observações por dia nos últimos 7 dias
+        """
+        import numpy as np
+
+        now = now if now is not None else time.time()
+        ts, price = self.range(series, now - 365 * DAY, now)
+        if len(ts) == 0:
+            return None
+
+        price = price.astype(np.float64)
+        recent_30 = price[ts >= now - 30 * DAY]
+        recent_7 = price[ts >= now - 7 * DAY]
+
+        days = np.floor(ts / DAY)
+        _, first, counts = np.unique(days, return_index=True, return_counts=True)
+        daily = np.add.reduceat(price, first) / counts
+        returns = np.diff(np.log(daily[-31:])) if len(daily) > 1 else np.empty(0)
+
+        history_days = (ts[-1] - ts[0]) / DAY
+        seasonality = 0.0
+        if history_days >= 60 and len(recent_30):
+            seasonality = float(np.clip((recent_30.mean() / price.mean() - 1) * 10, -1, 1))
+
+        return {
+            'last_price': float(price[-1]),
+            'mean_7d': float(recent_7.mean()) if len(recent_7) else None,
+            'mean_30d': float(recent_30.mean()) if len(recent_30) else None,
+            'volatility_30d': float(returns.std()) if len(returns) > 1 else 0.0,
+            'seasonality': seasonality,
+            'demand': len(recent_7) / 7,
+            'observations': int(len(ts))
+        }
+
+    def training_samples(self, start=None, end=None, horizon=7 * DAY, chunk_rows=100_000):
+        """Exemplos (X, y, ts) para o modelo, em blocos de ~chunk_rows linhas
+
+        Cada observação em [start, end - horizon] gera as features do modelo
+        (preço, categoria, marketplace, sazonalidade, procura), calculadas só com
+        dados até esse instante, e tem como alvo o preço observado `horizon` depois.
+        """
+        import numpy as np
+
+        start = -math.inf if start is None else start
+        end = time.time() if end is None else end
+        chunk = []
+        rows = 0
+
+        for series in self.series_ids():
+            data = self.read(series, start - 365 * DAY, end, columns=tuple(COLUMNS))
+            ts = data['ts']
+            if len(ts) < 2:
+                continue
+            price = data['price'].astype(np.float64)
+
+            # Alvo: primeira observação pelo menos `horizon` depois
+            target = np.searchsorted(ts, ts + horizon, side='left')
+            sample = (ts >= start) & (target < len(ts))
+            if not sample.any():
+                continue
+            index = np.nonzero(sample)[0]
+
+            cumulative = np.concatenate([[0.0], np.cumsum(price)])
+            end_index = index + 1
+            start_7 = np.searchsorted(ts, ts[index] - 7 * DAY, side='left')
+            start_30 = np.searchsorted(ts, ts[index] - 30 * DAY, side='left')
+            start_365 = np.searchsorted(ts, ts[index] - 365 * DAY, side='left')
+            mean_30 = (cumulative[end_index] - cumulative[start_30]) / (end_index - start_30)
+            mean_365 = (cumulative[end_index] - cumulative[start_365]) / (end_index - start_365)
+            seasonality = np.where(
+                ts[index] - ts[start_365] >= 60 * DAY,
+                np.clip((mean_30 / mean_365 - 1) * 10, -1, 1),
+                0.0
+            )
+
+            # float32: o sklearn converte X para float32 de qualquer forma
+            X = np.empty((len(index), 5), dtype=np.float32)
+            X[:, 0] = price[index]
+            X[:, 1] = data['category'][index]
+            X[:, 2] = data['marketplace'][index]
+            X[:, 3] = seasonality
+            X[:, 4] = (end_index - start_7) / 7
+            chunk.append((X, price[target[index]], ts[index]))
+            rows += len(index)
+            if rows >= chunk_rows:
+                yield tuple(np.concatenate(part) for part in zip(*chunk))
+                chunk, rows = [], 0
+
+        if chunk:
+            yield tuple(np.concatenate(part) for part in zip(*chunk))
+
+    def stats(self):
+        segments = self.manifest()['segments']
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'segments': len(segments),
+            'rows': sum(s['rows'] for s in segments),
+            'buffered': buffered
+        }
+
+
+price_history = PriceHistory(flush_interval=float(os.environ.get('GPAS_PRICE_FLUSH_SECONDS', 5.0)))
+
+
+@scheduler.job('price_history_compact', '25 * * * *', jitter=120)
+def compact_price_history():
+    price_history.compact()
@@ -0,0 +1,287 @@
+# Experiências de preço por plano e faturação
+# O checkout pede uma variante a uma tabela em memória (hash do utilizador nos
+# pesos atuais) e conta o início num contador local, gravado em lote por uma
+# thread; as conclusões chegam pelo webhook. Cada variante tem uma posterior
+# Beta(1 + conversões, 1 + inícios - conversões), atualizada em O(1) por evento,
+# e os pesos seguem a probabilidade de cada variante ter a melhor receita por visita.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from bisect import bisect
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pricing_variants (
+    plan TEXT NOT NULL,
+    billing TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    conversions INTEGER NOT NULL DEFAULT 0,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (plan, billing, variant)
+);
+CREATE TABLE IF NOT EXISTS pricing_conversions (
+    session_id TEXT PRIMARY KEY,
+    plan TEXT NOT NULL,
+    billing TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    converted_at REAL NOT NULL
+);
+"""
+
+CONTROL = 'control'
+
+
+def load_variants():
+    """Variantes além do controlo, de GPAS_PRICE_VARIANTS (JSON)
+
+    {"professional": {"monthly": {"p44": {"price": 44, "stripe_price_id": "price_pro_44"}}}}
+    """
+    raw = os.environ.get('GPAS_PRICE_VARIANTS')
+    return json.loads(raw) if raw else {}
+
+
+class PricingExperiments:
+    """Atribuição de variantes em memória e estimativas Bayesianas de conversão"""
+
+    def __init__(self, plans=None, variants=None, name='pricing', min_share=0.1,
+                 refresh_interval=60, flush_interval=1.0, draws=20000):
+        self._plans = plans
+        self.variants = variants if variants is not None else {}
+        self.name = name
+        self.min_share = min_share
+        self.refresh_interval = refresh_interval
+        self.flush_interval = flush_interval
+        self.draws = draws
+        self._table = None
+        self._table_at = 0
+        self._latest = None
+        self._refreshing = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def _db(self):
+        return connect(self.name, SCHEMA)
+
+    @property
+    def plans(self):
+        if self._plans is None:
+            from plans import PRICING_PLANS
+            self._plans = PRICING_PLANS
+        return self._plans
+
+    def arms(self, plan, billing):
+        """{variante: {preço, price id do Stripe}}; o controlo é o preço de PRICING_PLANS"""
+        plan_data = self.plans[plan]
+        arms = {CONTROL: {'price': plan_data[f'price_{billing}'],
+                          'stripe_price_id': plan_data[f'stripe_price_id_{billing}']}}
+        arms.update(self.variants.get(plan, {}).get(billing, {}))
+        return arms
+
+    # Caminho do checkout: só memória
+
+    def assign(self, owner, plan, billing):
+        """Variante do utilizador: hash estável nos pesos atuais (sem I/O no pedido)"""
+        table = self._current_table()
+        names, cumulative = table.get((plan, billing)) or ([CONTROL], [1.0])
+        digest = hashlib.blake2b(f'{owner}|{plan}|{billing}'.encode('utf-8'), digest_size=8).digest()
+        point = int.from_bytes(digest, 'big') / 2 ** 64 * cumulative[-1]
+        variant = names[min(bisect(cumulative, point), len(names) - 1)]
+        return dict(self.arms(plan, billing)[variant], id=variant)
+
+    def record_start(self, plan, billing, variant):
+        """Conta um início de checkout; gravado em lote pela thread de flush"""
+        with self._lock:
+            self._ensure_flusher()
+            key = (plan, billing, variant)
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+    def _current_table(self):
+        table = self._table
+        if table is None:
+            # Arranque: pesos iguais, sem ler a base de dados
+            table = self._table = self._build_table({})
+        if time.time() - self._table_at >= self.refresh_interval:
+            with self._lock:
+                refresh, self._refreshing = not self._refreshing, True
+            if refresh:
+                threading.Thread(target=self._refresh_table, name='pricing-refresh', daemon=True).start()
+        return table
+
+    def _build_table(self, weights):
+        table = {}
+        for plan in self.plans:
+            for billing in ('monthly', 'annual'):
+                names = list(self.arms(plan, billing))
+                shares = weights.get((plan, billing)) or dict.fromkeys(names, 1.0)
+                total, cumulative = 0.0, []
+                for name in names:
+                    total += shares.get(name, self.min_share)
+                    cumulative.append(total)
+                table[(plan, billing)] = (names, cumulative)
+        return table
+
+    def _refresh_table(self):
+        try:
+            estimates = self._estimates()
+            weights = {}
+            for (plan, billing), experiment in estimates.items():
+                arms = experiment['variants']
+                # Probabilidade de ser a melhor, com um mínimo de exploração por variante
+                weights[(plan, billing)] = {
+                    name: max(arm['prob_best'], self.min_share) for name, arm in arms.items()
+                }
+            self._table = self._build_table(weights)
+            # O report() serve estas estimativas: a amostragem nunca corre num pedido
+            self._latest = (estimates, time.time())
+        except Exception as e:
+            print(f"Erro ao atualizar pesos das experiências de preço: {e}")
+        finally:
+            self._table_at = time.time()
+            self._refreshing = False
+
+    # Escrita em lote dos inícios e conversões vindas do webhook
+
+    def _ensure_flusher(self):
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            self._pending = {}
+            threading.Thread(target=self._flush_loop, name='pricing-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar inícios de checkout: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        conn = self._db()
+        now = time.time()
+        try:
+            with transaction(conn):
+                for (plan, billing, variant), count in pending.items():
+                    conn.execute(
+                        'INSERT INTO pricing_variants (plan, billing, variant, starts, created_at) '
+                        'VALUES (?, ?, ?, ?, ?) ON CONFLICT(plan, billing, variant) '
+                        'DO UPDATE SET starts = starts + excluded.starts',
+                        (plan, billing, variant, count, now)
+                    )
+        except Exception:
+            # Devolve os contadores para a próxima tentativa
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+            raise
+        return sum(pending.values())
+
+    def record_conversion(self, session):
+        """checkout.session.completed: uma conversão por sessão, mesmo com novas tentativas da fila"""
+        metadata = session.get('metadata') or {}
+        plan, billing = metadata.get('plan'), metadata.get('billing')
+        if plan not in self.plans or billing not in ('monthly', 'annual'):
+            return False
+        variant = metadata.get('price_variant') or CONTROL
+        conn = self._db()
+        with transaction(conn):
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO pricing_conversions (session_id, plan, billing, variant, converted_at) '
+                'VALUES (?, ?, ?, ?, ?)', (session['id'], plan, billing, variant, time.time())
+            ).rowcount
+            if not inserted:
+                return False
+            conn.execute(
+                'INSERT INTO pricing_variants (plan, billing, variant, conversions, revenue_cents, created_at) '
+                'VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT(plan, billing, variant) '
+                'DO UPDATE SET conversions = conversions + 1, revenue_cents = revenue_cents + excluded.revenue_cents',
+                (plan, billing, variant, session.get('amount_total') or 0, time.time())
+            )
+        return True
+
+    # Leitura: posteriores Beta e probabilidade de cada variante ser a melhor
+
+    def _estimates(self, seed=None):
+        import numpy as np
+
+        rows = self._db().execute('SELECT * FROM pricing_variants').fetchall()
+        counts = {(row['plan'], row['billing'], row['variant']): row for row in rows}
+        rng = np.random.default_rng(seed)
+        experiments = {}
+        for plan in self.plans:
+            for billing in ('monthly', 'annual'):
+                arms = self.arms(plan, billing)
+                stats = {}
+                for name, arm in arms.items():
+                    row = counts.get((plan, billing, name))
+                    starts = row['starts'] if row else 0
+                    # Conversões podem chegar antes do flush dos inícios
+                    conversions = min(row['conversions'], starts) if row else 0
+                    alpha, beta = 1 + conversions, 1 + starts - conversions
+                    stats[name] = {
+                        'price': arm['price'],
+                        'starts': starts,
+                        'conversions': conversions,
+                        'conversion_rate': round(alpha / (alpha + beta), 4),
+                        'revenue_per_start': round(arm['price'] * alpha / (alpha + beta), 2),
+                        '_posterior': (alpha, beta)
+                    }
+
+                names = list(stats)
+                samples = np.stack([rng.beta(*stats[name]['_posterior'], self.draws) * stats[name]['price']
+                                    for name in names])
+                best = np.bincount(samples.argmax(axis=0), minlength=len(names)) / self.draws
+                for index, name in enumerate(names):
+                    alpha, beta = stats[name].pop('_posterior')
+                    low, high = np.percentile(samples[index] / stats[name]['price'], [2.5, 97.5])
+                    stats[name]['credible_interval'] = [round(float(low), 4), round(float(high), 4)]
+                    stats[name]['prob_best'] = round(float(best[index]), 4)
+                experiments[(plan, billing)] = {'variants': stats}
+        return experiments
+
+    @property
+    def estimated_at(self):
+        """Hora das estimativas servidas pelo report() (None antes do primeiro cálculo)"""
+        return self._latest[1] if self._latest else None
+
+    def report(self, threshold=0.95):
+        """Estado de cada experiência e recomendação (promover quando P(melhor) >= threshold)
+
+        Usa as últimas estimativas do recálculo em background (vazio até ao primeiro).
+        """
+        # Agenda um recálculo se as estimativas tiverem mais de refresh_interval
+        self._current_table()
+        report = []
+        for (plan, billing), experiment in (self._latest[0] if self._latest else {}).items():
+            arms = experiment['variants']
+            leader = max(arms, key=lambda name: arms[name]['prob_best'])
+            if len(arms) == 1:
+                action = 'Sem variantes em teste'
+            elif arms[leader]['prob_best'] >= threshold and leader != CONTROL:
+                action = f"Promover {leader} (€{arms[leader]['price']})"
+            elif arms[leader]['prob_best'] >= threshold:
+                action = 'Manter o preço atual'
+            else:
+                action = 'Continuar a experiência'
+            report.append({
+                'plan': plan,
+                'billing': billing,
+                'leader': leader,
+                'recommended_action': action,
+                'starts': sum(arm['starts'] for arm in arms.values()),
+                'variants': arms
+            })
+        return report
+
+
+pricing_experiments = PricingExperiments(variants=load_variants())
@@ -0,0 +1,222 @@
+# Limitação de pedidos com token buckets por utilizador e por plano
+# Cada pedido consome tokens do bucket do utilizador e do bucket partilhado do
+# plano; os parâmetros de cada plano vêm de PLAN_RATE_LIMITS.
+
+import asyncio
+import inspect
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+from auth_cache import TOKEN_ERRORS, authenticate
+from plans import PLAN_RATE_LIMITS
+from scheduler import scheduler
+from storage import connect, transaction
+
+# Pedidos sem autenticação são limitados por IP
+ANONYMOUS_LIMITS = {'capacity': 30, 'refill_per_second': 0.5}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def refill(tokens, updated, capacity, rate, now):
+    """Tokens disponíveis em `now` para um bucket visto pela última vez em `updated`"""
+    return min(capacity, tokens + max(now - updated, 0) * rate)
+
+
+class RateLimitResult:
+    def __init__(self, allowed, limit, remaining, reset, retry_after, policy_window):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+        self.policy_window = policy_window
+
+    def headers(self):
+        """Cabeçalhos RateLimit-* (draft IETF) e Retry-After quando bloqueado"""
+        headers = {
+            'RateLimit-Limit': str(self.limit),
+            'RateLimit-Remaining': str(self.remaining),
+            'RateLimit-Reset': str(self.reset),
+            'RateLimit-Policy': f'{self.limit};w={self.policy_window}'
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(self.retry_after)
+        return headers
+
+
+class MemoryBackend:
+    """Buckets no processo atual (desenvolvimento ou um único worker)"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, buckets, cost, now):
+        with self.lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, updated = self.buckets.get(key, (capacity, now))
+                levels.append(refill(tokens, updated, capacity, rate, now))
+
+            allowed = all(level >= cost for level in levels)
+            if allowed:
+                levels = [level - cost for level in levels]
+            for (key, _, _), level in zip(buckets, levels):
+                self.buckets[key] = (level, now)
+            return allowed, levels
+
+
+class SQLiteBackend:
+    """Buckets partilhados entre workers; uma transação curta por pedido"""
+
+    def consume(self, buckets, cost, now):
+        conn = connect('rate_limit', SCHEMA)
+        keys = [key for key, _, _ in buckets]
+
+        with transaction(conn):
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            stored = {row['key']: (row['tokens'], row['updated']) for row in rows}
+
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, updated = stored.get(key, (capacity, now))
+                levels.append(refill(tokens, updated, capacity, rate, now))
+
+            allowed = all(level >= cost for level in levels)
+            if allowed:
+                levels = [level - cost for level in levels]
+            conn.executemany(
+                'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                [(key, level, now) for key, level in zip(keys, levels)]
+            )
+        return allowed, levels
+
+    def purge(self, idle_seconds=86400):
+        """Remove buckets inativos (voltariam a estar cheios de qualquer forma)"""
+        conn = connect('rate_limit', SCHEMA)
+        conn.execute('DELETE FROM buckets WHERE updated < ?', (time.time() - idle_seconds,))
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or (
+            MemoryBackend() if os.environ.get('GPAS_RATE_LIMIT_BACKEND') == 'memory' else SQLiteBackend()
+        )
+        self.enabled = os.environ.get('GPAS_RATE_LIMIT', '1') == '1'
+
+    def limits_for(self, plan):
+        return PLAN_RATE_LIMITS.get(plan)
+
+    def hit(self, identity, plan, cost, now=None):
+        """Consome `cost` tokens e devolve RateLimitResult; O(1) por pedido"""
+        now = now if now is not None else time.time()
+        limits = self.limits_for(plan)
+
+        if limits is None:
+            plan = 'anonymous'
+            limits = ANONYMOUS_LIMITS
+            buckets = [(f'ip:{identity}', limits['capacity'], limits['refill_per_second'])]
+        else:
+            buckets = [
+                (f'user:{identity}', limits['capacity'], limits['refill_per_second']),
+                (f'plan:{plan}', limits['plan_capacity'], limits['plan_refill_per_second'])
+            ]
+
+        allowed, levels = self.backend.consume(buckets, cost, now)
+
+        capacity, rate = buckets[0][1], buckets[0][2]
+        user_level = levels[0]
+        retry_after = max(
+            (cost - level) / bucket_rate for (_, _, bucket_rate), level in zip(buckets, levels) if level < cost
+        ) if not allowed else 0
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=capacity,
+            remaining=max(int(user_level), 0),
+            reset=math.ceil((capacity - user_level) / rate),
+            retry_after=math.ceil(retry_after),
+            policy_window=math.ceil(capacity / rate)
+        )
+
+
+limiter = RateLimiter()
+
+
+def check_rate_limit(cost):
+    """Consome tokens para o pedido atual; None se desligado ou o backend falhar"""
+    if not limiter.enabled:
+        return None
+
+    try:
+        auth = authenticate(optional=True)
+    except TOKEN_ERRORS:
+        # Token inválido ou expirado: conta como anónimo; as rotas protegidas respondem 401/422
+        auth = None
+    user = auth['user'] if auth else None
+    plan = user['plan'] if user else None
+
+    try:
+        return limiter.hit(auth['identity'] if plan else request.remote_addr, plan, cost)
+    except Exception as e:
+        # Falha aberta: um problema no backend não deve derrubar a API
+        print(f"Erro no rate limiting: {e}")
+        return None
+
+
+def _limited_response(result):
+    response = make_response(jsonify({"error": "Limite de pedidos excedido"}), 429)
+    response.headers.update(result.headers())
+    return response
+
+
+def rate_limited(cost=1):
+    """Decorador de rota: consome `cost` tokens do utilizador (ou do IP) e do plano"""
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                # O backend SQLite bloqueia: fora do event loop
+                result = await asyncio.to_thread(check_rate_limit, cost)
+                if result is None:
+                    return await view(*args, **kwargs)
+                if not result.allowed:
+                    return _limited_response(result)
+                response = make_response(await view(*args, **kwargs))
+                response.headers.update(result.headers())
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            result = check_rate_limit(cost)
+            if result is None:
+                return view(*args, **kwargs)
+            if not result.allowed:
+                return _limited_response(result)
+            response = make_response(view(*args, **kwargs))
+            response.headers.update(result.headers())
+            return response
+        return wrapper
+    return decorator
+
+
+@scheduler.job('rate_limit_purge', '17 * * * *', jitter=60)
+def purge_idle_buckets():
+    if isinstance(limiter.backend, SQLiteBackend):
+        limiter.backend.purge()
@@ -0,0 +1,254 @@
+# Livro de receitas alimentado pelos webhooks do Stripe
+# Cada evento atualiza, na mesma transação, o estado do cliente e os agregados
+# (MRR, clientes ativos, receita por fonte e por mês, churn), pelo que as
+# leituras nunca percorrem faturas: são uma mão-cheia de linhas por chave.
+
+import time
+from datetime import datetime
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revenue_events (
+    event_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    customer TEXT,
+    stream TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    mrr_delta_cents INTEGER NOT NULL,
+    occurred_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revenue_customers (
+    customer TEXT PRIMARY KEY,
+    plan TEXT,
+    billing TEXT,
+    mrr_cents INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revenue_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    mrr_cents INTEGER NOT NULL DEFAULT 0,
+    active_customers INTEGER NOT NULL DEFAULT 0,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    churned_customers INTEGER NOT NULL DEFAULT 0,
+    first_event_at REAL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS revenue_streams (
+    stream TEXT PRIMARY KEY,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS revenue_months (
+    month TEXT PRIMARY KEY,
+    starting_mrr_cents INTEGER NOT NULL,
+    starting_customers INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL DEFAULT 0,
+    new_mrr_cents INTEGER NOT NULL DEFAULT 0,
+    churned_mrr_cents INTEGER NOT NULL DEFAULT 0,
+    new_customers INTEGER NOT NULL DEFAULT 0,
+    churned_customers INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO revenue_totals (id) VALUES (1);
+"""
+
+# Fontes de receita (metadata "stream" dos objetos Stripe; por omissão subscrições)
+STREAMS = ('subscriptions', 'transaction_fees', 'api_licensing', 'data_insights', 'affiliate_commissions')
+
+
+def month_of(ts):
+    return datetime.utcfromtimestamp(ts).strftime('%Y-%m')
+
+
+def month_index(month):
+    year, number = month.split('-')
+    return int(year) * 12 + int(number) - 1
+
+
+def stream_of(obj):
+    stream = (obj.get('metadata') or {}).get('stream')
+    return stream if stream in STREAMS else 'subscriptions'
+
+
+class RevenueLedger:
+    """Agregados de receita mantidos de forma incremental, um evento de cada vez"""
+
+    def __init__(self, name='revenue', plans=None):
+        self.name = name
+        self.plans = plans
+
+    def _db(self):
+        return connect(self.name, SCHEMA)
+
+    # Escrita: um evento Stripe -> O(1) linhas atualizadas
+
+    def record_checkout(self, session):
+        """checkout.session.completed: novo MRR (o dinheiro chega pela fatura, exceto pagamentos únicos)"""
+        metadata = session.get('metadata') or {}
+        amount = session.get('amount_total') or 0
+        customer = session.get('customer') or (session.get('customer_details') or {}).get('email')
+        at = session.get('created') or time.time()
+        if session.get('mode', 'subscription') != 'subscription':
+            return self._apply(f"checkout:{session['id']}", 'payment', customer, stream_of(session), amount, at)
+        return self._apply(f"checkout:{session['id']}", 'subscribe', customer, stream_of(session), 0, at,
+                           mrr=self._mrr(metadata.get('plan'), metadata.get('billing'), amount,
+                                         metadata.get('price_variant')),
+                           plan=metadata.get('plan'), billing=metadata.get('billing'))
+
+    def record_invoice(self, invoice):
+        """invoice.payment_succeeded: receita cobrada; reativa um cliente cancelado"""
+        paid_at = (invoice.get('status_transitions') or {}).get('paid_at')
+        return self._apply(f"invoice:{invoice['id']}", 'invoice', invoice.get('customer'), stream_of(invoice),
+                           invoice.get('amount_paid') or 0, paid_at or invoice.get('created') or time.time())
+
+    def record_cancellation(self, subscription):
+        """customer.subscription.deleted: o MRR do cliente sai como churn"""
+        at = subscription.get('ended_at') or subscription.get('canceled_at') or time.time()
+        return self._apply(f"cancel:{subscription['id']}", 'cancel', subscription.get('customer'),
+                           stream_of(subscription), 0, at)
+
+    def _mrr(self, plan, billing, amount, variant=None):
+        """MRR em cêntimos: preço do plano (o anual já é por mês) ou, em variantes de preço, o valor cobrado"""
+        plans = self.plans
+        if plans is None:
+            from plans import PRICING_PLANS as plans
+        plan_data = plans.get(plan)
+        if plan_data and billing in ('monthly', 'annual') and variant in (None, 'control'):
+            return int(plan_data[f'price_{billing}'] * 100)
+        return amount // 12 if billing == 'annual' else amount
+
+    def _apply(self, key, kind, customer, stream, amount, at, mrr=None, plan=None, billing=None):
+        """Aplica o evento uma única vez (as novas tentativas da fila repetem-no); devolve se foi novo"""
+        conn = self._db()
+        month = month_of(at)
+        with transaction(conn):
+            row = conn.execute(
+                'SELECT * FROM revenue_customers WHERE customer = ?', (customer,)
+            ).fetchone() if customer else None
+
+            delta, new_customer, churned = 0, 0, 0
+            # Sem cliente (nem email) não há linha em revenue_customers que um cancelamento
+            # possa desfazer: o evento fica registado, mas não conta para o MRR nem para os clientes
+            if kind == 'subscribe' and customer:
+                was_active = row is not None and row['status'] == 'active'
+                delta = mrr - (row['mrr_cents'] if was_active else 0)
+                new_customer = 0 if was_active else 1
+            elif kind == 'invoice' and row is not None and row['status'] != 'active':
+                delta, new_customer = row['mrr_cents'], 1
+            elif kind == 'cancel' and row is not None and row['status'] == 'active':
+                delta, churned = -row['mrr_cents'], 1
+
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO revenue_events '
+                '(event_key, kind, customer, stream, amount_cents, mrr_delta_cents, occurred_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, kind, customer, stream, amount, delta, at)
+            ).rowcount
+            if not inserted:
+                return False
+
+            # Primeiro evento do mês: fotografa MRR e clientes no início do mês (base do churn)
+            conn.execute(
+                'INSERT OR IGNORE INTO revenue_months (month, starting_mrr_cents, starting_customers) '
+                'SELECT ?, mrr_cents, active_customers FROM revenue_totals WHERE id = 1',
+                (month,)
+            )
+            conn.execute(
+                'UPDATE revenue_months SET revenue_cents = revenue_cents + ?, '
+                'new_mrr_cents = new_mrr_cents + ?, churned_mrr_cents = churned_mrr_cents + ?, '
+                'new_customers = new_customers + ?, churned_customers = churned_customers + ? WHERE month = ?',
+                (amount, max(delta, 0), max(-delta, 0), new_customer, churned, month)
+            )
+            conn.execute(
+                'UPDATE revenue_totals SET mrr_cents = mrr_cents + ?, '
+                'active_customers = active_customers + ?, revenue_cents = revenue_cents + ?, '
+                'churned_customers = churned_customers + ?, '
+                'first_event_at = COALESCE(first_event_at, ?), updated_at = ? WHERE id = 1',
+                (delta, new_customer - churned, amount, churned, at, at)
+            )
+            if amount:
+                conn.execute(
+                    'INSERT INTO revenue_streams (stream, revenue_cents, events) VALUES (?, ?, 1) '
+                    'ON CONFLICT(stream) DO UPDATE SET revenue_cents = revenue_cents + excluded.revenue_cents, '
+                    'events = events + 1',
+                    (stream, amount)
+                )
+
+            if customer and kind == 'subscribe':
+                conn.execute(
+                    'INSERT INTO revenue_customers (customer, plan, billing, mrr_cents, status, started_at, updated_at) '
+                    "VALUES (?, ?, ?, ?, 'active', ?, ?) "
+                    "ON CONFLICT(customer) DO UPDATE SET plan = excluded.plan, billing = excluded.billing, "
+                    "mrr_cents = excluded.mrr_cents, status = 'active', updated_at = excluded.updated_at",
+                    (customer, plan, billing, mrr, at, at)
+                )
+            elif row is not None and (new_customer or churned):
+                conn.execute(
+                    'UPDATE revenue_customers SET status = ?, updated_at = ? WHERE customer = ?',
+                    ('active' if new_customer else 'cancelled', at, customer)
+                )
+        return True
+
+    # Leitura: só agregados
+
+    def summary(self, months=12, now=None):
+        """MRR, ARR, churn e receita por fonte a partir dos agregados (sem percorrer eventos)"""
+        conn = self._db()
+        totals = conn.execute('SELECT * FROM revenue_totals WHERE id = 1').fetchone()
+        streams = {row['stream']: row['revenue_cents'] for row in conn.execute('SELECT * FROM revenue_streams')}
+        history = [dict(row) for row in conn.execute(
+            'SELECT * FROM revenue_months ORDER BY month DESC LIMIT ?', (months,)
+        )][::-1]
+
+        current = month_of(now if now is not None else time.time())
+        month = history[-1] if history and history[-1]['month'] == current else None
+        mrr = totals['mrr_cents'] / 100
+
+        return {
+            'mrr': mrr,
+            'arr': round(mrr * 12, 2),
+            'active_customers': totals['active_customers'],
+            'arpu': round(mrr / totals['active_customers'], 2) if totals['active_customers'] else 0,
+            'total_revenue': totals['revenue_cents'] / 100,
+            'churned_customers': totals['churned_customers'],
+            'streams': {stream: streams.get(stream, 0) / 100 for stream in STREAMS},
+            'current_month': {
+                'month': current,
+                'revenue': month['revenue_cents'] / 100 if month else 0,
+                'new_mrr': month['new_mrr_cents'] / 100 if month else 0,
+                'churned_mrr': month['churned_mrr_cents'] / 100 if month else 0,
+                'customer_churn_rate': self._rate(month, 'churned_customers', 'starting_customers'),
+                'revenue_churn_rate': self._rate(month, 'churned_mrr_cents', 'starting_mrr_cents')
+            },
+            'monthly_growth_rate': self.growth_rate(history, totals['mrr_cents'], current),
+            'history': [
+                {'month': row['month'], 'starting_mrr': row['starting_mrr_cents'] / 100,
+                 'revenue': row['revenue_cents'] / 100, 'new_customers': row['new_customers'],
+                 'churned_customers': row['churned_customers']}
+                for row in history
+            ],
+            'first_event_at': totals['first_event_at'],
+            'updated_at': totals['updated_at']
+        }
+
+    @staticmethod
+    def _rate(month, numerator, denominator):
+        if not month or not month[denominator]:
+            return None
+        return round(month[numerator] / month[denominator], 4)
+
+    @staticmethod
+    def growth_rate(history, mrr_cents, current, window=3):
+        """Crescimento mensal composto do MRR desde o início do mês mais antigo da janela"""
+        for row in history[-window - 1:]:
+            periods = month_index(current) - month_index(row['month'])
+            if row['starting_mrr_cents'] > 0 and periods >= 1:
+                if mrr_cents <= 0:
+                    return -1.0
+                return round((mrr_cents / row['starting_mrr_cents']) ** (1 / periods) - 1, 4)
+        return None
+
+
+revenue_ledger = RevenueLedger()
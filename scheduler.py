@@ -0,0 +1,341 @@
+# Agendador central de tarefas do GPAS 2.0
+# Substitui as threads daemon que cada worker arrancava ao importar os módulos
+
+import fcntl
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from storage import connect, data_path, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_state (
+    job TEXT PRIMARY KEY,
+    last_slot TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    scheduled_for TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    duration_ms REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS job_runs_by_job ON job_runs (job, id);
+"""
+
+
+class CronSchedule:
+    """Expressão cron de 5 campos (minuto hora dia mês dia-da-semana), em UTC"""
+
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expressão cron inválida: {expression!r}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        ]
+        # Como no cron clássico: se dia e dia-da-semana forem restritos, basta um coincidir
+        # (um campo que começa por '*', como '*/2', não conta como restrito)
+        self.days_restricted = not parts[2].startswith('*')
+        self.weekdays_restricted = not parts[4].startswith('*')
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(','):
+            step = 1
+            if '/' in item:
+                item, step = item.split('/')
+                step = int(step)
+
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(v) for v in item.split('-'))
+            else:
+                start = int(item)
+                end = high if step > 1 else start
+
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Campo cron fora dos limites: {field!r}")
+
+            values.update(range(start, end + 1, step))
+
+        # 7 também representa domingo no campo dia-da-semana
+        if high == 7:
+            values = {value % 7 for value in values}
+        return frozenset(values)
+
+    def _day_matches(self, dt):
+        weekday = (dt.weekday() + 1) % 7  # cron: domingo = 0
+        day_ok = dt.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt):
+        """Primeiro instante agendado estritamente depois de `dt`"""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+
+        raise ValueError(f"Expressão cron nunca ocorre: {self.expression!r}")
+
+
+class FileLease:
+    """Eleição de líder entre processos através de flock num ficheiro partilhado
+
+    O lock é libertado pelo kernel quando o processo termina, pelo que outro
+    worker assume a liderança automaticamente. Deve ser adquirido depois do fork.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def try_acquire(self):
+        if self.fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+class Job:
+    """Tarefa registada no agendador"""
+
+    def __init__(self, name, cron, func, jitter=0):
+        self.name = name
+        self.schedule = CronSchedule(cron)
+        self.func = func
+        self.jitter = jitter
+        self.next_slot = None
+        self.due_at = None
+        self.running = False
+
+
+class Scheduler:
+    """Agendador cron partilhado: só o processo líder executa as tarefas
+
+    Cada slot agendado é reclamado na base de dados antes de correr, por isso
+    uma mudança de líder nunca repete um slot (no máximo uma execução por slot).
+    """
+
+    def __init__(self, poll_interval=30, max_workers=4, history_size=1000):
+        self.jobs = {}
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self.lease = None
+        self.executor = None
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def add_job(self, name, cron, func, jitter=0):
+        """Regista tarefa com agenda cron e atraso aleatório até `jitter` segundos"""
+        if name in self.jobs:
+            raise ValueError(f"Tarefa já registada: {name}")
+        self.jobs[name] = Job(name, cron, func, jitter)
+        self._wakeup.set()
+        return func
+
+    def job(self, name, cron, jitter=0):
+        """Decorador equivalente a add_job"""
+        def decorator(func):
+            return self.add_job(name, cron, func, jitter)
+        return decorator
+
+    @property
+    def is_leader(self):
+        return self.lease is not None and self.lease.fd is not None
+
+    def start(self):
+        """Arranca o agendador neste processo (idempotente; chamar depois do fork)"""
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self.lease = FileLease(data_path('scheduler.lock'))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler-job')
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        if self.lease is not None:
+            self.lease.release()
+        self._pid = None
+
+    def _db(self):
+        return connect('scheduler', SCHEMA)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                if not self.lease.try_acquire():
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+
+                timeout = self._tick(datetime.utcnow())
+            except Exception as e:
+                print(f"Erro no agendador: {e}")
+                timeout = self.poll_interval
+
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _tick(self, now):
+        """Lança tarefas vencidas e devolve segundos até à próxima verificação"""
+        last_slots = {row['job']: datetime.fromisoformat(row['last_slot'])
+                      for row in self._db().execute('SELECT job, last_slot FROM job_state')}
+
+        timeout = self.poll_interval
+        for job in list(self.jobs.values()):
+            if job.next_slot is None:
+                last_slot = last_slots.get(job.name)
+                # Slot perdido durante mudança de líder: corre uma vez para recuperar
+                job.next_slot = job.schedule.next_after(last_slot or now)
+                job.due_at = job.next_slot + timedelta(seconds=random.uniform(0, job.jitter))
+
+            if job.due_at <= now:
+                slot = job.next_slot
+                job.next_slot = job.schedule.next_after(max(slot, now))
+                job.due_at = job.next_slot + timedelta(seconds=random.uniform(0, job.jitter))
+                if self._claim(job, slot):
+                    self.executor.submit(self._run, job, slot)
+
+            timeout = min(timeout, max((job.due_at - now).total_seconds(), 0.5))
+        return timeout
+
+    def _claim(self, job, slot):
+        conn = self._db()
+        with transaction(conn):
+            row = conn.execute('SELECT last_slot FROM job_state WHERE job = ?', (job.name,)).fetchone()
+            if row and datetime.fromisoformat(row['last_slot']) >= slot:
+                return False
+            conn.execute(
+                'INSERT INTO job_state (job, last_slot) VALUES (?, ?) '
+                'ON CONFLICT(job) DO UPDATE SET last_slot = excluded.last_slot',
+                (job.name, slot.isoformat())
+            )
+        return True
+
+    def _run(self, job, slot):
+        started_at = datetime.utcnow()
+        if job.running:
+            self._record(job, slot, started_at, None, 'skipped', 'Execução anterior ainda a decorrer')
+            return
+
+        job.running = True
+        start = time.perf_counter()
+        status, error = 'success', None
+        try:
+            job.func()
+        except Exception as e:
+            status, error = 'error', str(e)
+            print(f"Erro na tarefa {job.name}: {e}")
+        finally:
+            job.running = False
+
+        self._record(job, slot, started_at, (time.perf_counter() - start) * 1000, status, error)
+
+    def _record(self, job, slot, started_at, duration_ms, status, error):
+        conn = self._db()
+        with transaction(conn):
+            cursor = conn.execute(
+                'INSERT INTO job_runs (job, scheduled_for, started_at, duration_ms, status, error, pid) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job.name, slot.isoformat(), started_at.isoformat(), duration_ms, status, error, os.getpid())
+            )
+            conn.execute('DELETE FROM job_runs WHERE id <= ?', (cursor.lastrowid - self.history_size,))
+
+    def history(self, job=None, limit=50):
+        """Últimas execuções (de qualquer líder), mais recentes primeiro"""
+        query = 'SELECT job, scheduled_for, started_at, duration_ms, status, error, pid FROM job_runs'
+        params = ()
+        if job:
+            query += ' WHERE job = ?'
+            params = (job,)
+        query += ' ORDER BY id DESC LIMIT ?'
+        return [dict(row) for row in self._db().execute(query, params + (limit,))]
+
+    def status(self):
+        """Estado das tarefas registadas, calculável em qualquer worker"""
+        last_slots = {row['job']: row['last_slot']
+                      for row in self._db().execute('SELECT job, last_slot FROM job_state')}
+        now = datetime.utcnow()
+
+        return {
+            'leader_pid': self._leader_pid(),
+            'is_leader': self.is_leader,
+            'jobs': [
+                {
+                    'name': job.name,
+                    'cron': job.schedule.expression,
+                    'jitter_seconds': job.jitter,
+                    'last_slot': last_slots.get(job.name),
+                    'next_slot': job.schedule.next_after(now).isoformat()
+                }
+                for job in self.jobs.values()
+            ]
+        }
+
+    def _leader_pid(self):
+        try:
+            with open(data_path('scheduler.lock')) as f:
+                return int(f.read() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+
+# Instância partilhada pelos módulos da aplicação
+scheduler = Scheduler()
@@ -0,0 +1,232 @@
+# Publicação dos posts agendados no content_store nas APIs das redes sociais
+# Uma fila com atraso por plataforma (heap pela hora de publicação), um token
+# bucket por plataforma com a quota da API, envio concorrente pelo http_client
+# e novas tentativas com backoff. Corre no job social_dispatch (só no líder).
+
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from content_store import content_store
+from http_client import http_client
+from rate_limit import SQLiteBackend
+from scheduler import scheduler
+
+# Endpoint de publicação e quota por conta: `capacity` posts por `window` segundos
+PLATFORMS = {
+    'twitter': {'url': 'https://api.twitter.com/2/tweets', 'capacity': 100, 'window': 86400},
+    'linkedin': {'url': 'https://api.linkedin.com/v2/ugcPosts', 'capacity': 150, 'window': 86400},
+    'reddit': {'url': 'https://oauth.reddit.com/api/submit', 'capacity': 100, 'window': 60}
+}
+
+LINKEDIN_AUTHOR = os.environ.get('GPAS_LINKEDIN_AUTHOR', 'urn:li:organization:0')
+REDDIT_SUBREDDIT = os.environ.get('GPAS_REDDIT_SUBREDDIT', 'gpas')
+
+
+def post_request(platform, content):
+    """Corpo do pedido de publicação de cada API (kwargs para o http_client)"""
+    if platform == 'twitter':
+        return {'json': {'text': content}}
+    if platform == 'linkedin':
+        return {'json': {
+            'author': LINKEDIN_AUTHOR,
+            'lifecycleState': 'PUBLISHED',
+            'specificContent': {'com.linkedin.ugc.ShareContent': {
+                'shareCommentary': {'text': content},
+                'shareMediaCategory': 'NONE'
+            }},
+            'visibility': {'com.linkedin.ugc.MemberNetworkVisibility': 'PUBLIC'}
+        }}
+    title = content.split('\n', 1)[0][:300]
+    return {'data': {'api_type': 'json', 'kind': 'self', 'sr': REDDIT_SUBREDDIT, 'title': title, 'text': content}}
+
+
+def platform_tokens():
+    """Tokens OAuth por plataforma (GPAS_TWITTER_TOKEN, ...); sem token a plataforma não publica"""
+    return {
+        platform: os.environ[f'GPAS_{platform.upper()}_TOKEN']
+        for platform in PLATFORMS if os.environ.get(f'GPAS_{platform.upper()}_TOKEN')
+    }
+
+
+class SocialDispatcher:
+    """Publica os posts vencidos respeitando a quota de cada plataforma
+
+    O content_store é a fila persistente; as heaps em memória são reconstruídas
+    a cada execução. Falhas temporárias (rede, 429, 5xx) são adiadas com backoff
+    e ao fim de `max_attempts` o post fica `skipped`, tal como erros 4xx.
+    """
+
+    def __init__(self, platforms=PLATFORMS, store=content_store, client=http_client, limiter=None,
+                 tokens=None, base_url=None, concurrency=8, max_attempts=5, retry_base=30.0,
+                 horizon=300, batch_size=1000):
+        self.platforms = platforms
+        self.store = store
+        self.client = client
+        # Buckets em SQLite: a quota gasta sobrevive a reinícios e a mudanças de líder
+        self.limiter = limiter or SQLiteBackend()
+        self.tokens = tokens if tokens is not None else platform_tokens()
+        # Um só endereço para todas as APIs (stand-in local ou gateway)
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.queues = {platform: [] for platform in platforms}
+        # Tentativas falhadas por post (em memória: um novo líder recomeça a contagem)
+        self.attempts = {}
+        self.metrics = {
+            platform: {'sent': 0, 'failed': 0, 'retried': 0, 'skipped': 0, 'throttled': 0}
+            for platform in platforms
+        }
+        self.last_run = None
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def enabled(self, platform):
+        return self.base_url is not None or platform in self.tokens
+
+    def endpoint(self, platform):
+        url = self.platforms[platform]['url']
+        if self.base_url is None:
+            return url
+        return self.base_url.rstrip('/') + urlsplit(url).path
+
+    def load(self, now):
+        """Filas com os posts agendados até now + horizon, por hora de publicação"""
+        for platform, queue in self.queues.items():
+            queue.clear()
+            if not self.enabled(platform):
+                continue
+            for item in self.store.scheduled(platform, end=now + self.horizon, limit=self.batch_size):
+                queue.append((item['scheduled_at'], item['content_hash'], item))
+            heapq.heapify(queue)
+
+    def _acquire(self, platform, now):
+        """Consome um token do bucket; devolve 0 ou os segundos até haver um"""
+        limits = self.platforms[platform]
+        rate = limits['capacity'] / limits['window']
+        allowed, (level,) = self.limiter.consume([(f'social:{platform}', limits['capacity'], rate)], 1, now)
+        return 0 if allowed else (1 - level) / rate
+
+    def run(self, duration=50.0):
+        """Publica o que vencer nos próximos `duration` segundos; devolve as métricas"""
+        started = time.time()
+        deadline = started + duration
+        sent_before = sum(m['sent'] for m in self.metrics.values())
+        self.load(started)
+
+        while True:
+            now = time.time()
+            batch = []
+            wake = deadline
+            for platform, queue in self.queues.items():
+                while queue and queue[0][0] <= now:
+                    wait = self._acquire(platform, now)
+                    if wait:
+                        self.metrics[platform]['throttled'] += 1
+                        wake = min(wake, now + wait)
+                        break
+                    batch.append(heapq.heappop(queue)[2])
+                if queue and queue[0][0] > now:
+                    wake = min(wake, queue[0][0])
+
+            if batch:
+                self._deliver(batch)
+                continue
+            if wake >= deadline:
+                break
+            time.sleep(max(wake - time.time(), 0.01))
+
+        elapsed = time.time() - started
+        sent = sum(m['sent'] for m in self.metrics.values()) - sent_before
+        self.last_run = {
+            'started_at': started,
+            'seconds': round(elapsed, 3),
+            'sent': sent,
+            'posts_per_second': round(sent / elapsed, 2) if elapsed else None
+        }
+        return self.stats()
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='social-dispatch')
+            return self.executor
+
+    def _send(self, item):
+        platform = item['platform']
+        headers = {'Idempotency-Key': item['content_hash']}
+        if platform in self.tokens:
+            headers['Authorization'] = f'Bearer {self.tokens[platform]}'
+        try:
+            response = self.client.post(self.endpoint(platform), headers=headers,
+                                        **post_request(platform, item['content']))
+        except requests.exceptions.RequestException as e:
+            return None, None, e
+        response.close()
+        return response.status_code, response.headers.get('Retry-After'), None
+
+    def _deliver(self, batch):
+        """Envia o lote em paralelo e regista o resultado de cada post no store"""
+        now = time.time()
+        posted, skipped, retries = [], [], []
+        for item, (status, retry_after, error) in zip(batch, self._pool().map(self._send, batch)):
+            key, metrics = item['content_hash'], self.metrics[item['platform']]
+            if status is not None and 200 <= status < 300:
+                metrics['sent'] += 1
+                posted.append(key)
+                self.attempts.pop(key, None)
+                continue
+
+            metrics['failed'] += 1
+            attempts = self.attempts[key] = self.attempts.get(key, 0) + 1
+            temporary = error is not None or status == 429 or status >= 500
+            if not temporary or attempts >= self.max_attempts:
+                metrics['skipped'] += 1
+                skipped.append(key)
+                self.attempts.pop(key, None)
+                print(f"Post {key} ({item['platform']}) descartado: {error or f'HTTP {status}'}")
+                continue
+
+            metrics['retried'] += 1
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(self.retry_base * 2 ** (attempts - 1), 3600) * random.uniform(0.8, 1.2)
+            retries.append((now + delay, key, item))
+
+        if posted:
+            self.store.mark(posted, 'posted', now)
+        if skipped:
+            self.store.mark(skipped, 'skipped', now)
+        for at, key, item in retries:
+            self.store.reschedule([key], at)
+            if at < now + self.horizon:
+                heapq.heappush(self.queues[item['platform']], (at, key, {**item, 'scheduled_at': at}))
+
+    def stats(self):
+        return {
+            'platforms': {
+                platform: {**metrics, 'queued': len(self.queues[platform]), 'enabled': self.enabled(platform)}
+                for platform, metrics in self.metrics.items()
+            },
+            'last_run': self.last_run,
+            'pid': os.getpid()
+        }
+
+
+social_dispatcher = SocialDispatcher(base_url=os.environ.get('GPAS_SOCIAL_API_URL'),
+                                     concurrency=int(os.environ.get('GPAS_SOCIAL_CONCURRENCY', 8)))
+
+# Uma execução por minuto; cada uma cobre o minuto seguinte com precisão de segundos
+@scheduler.job('social_dispatch', '* * * * *')
+def dispatch_social_posts():
+    social_dispatcher.run(duration=50)
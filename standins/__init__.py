@@ -0,0 +1,12 @@
+# Stand-ins locais de serviços externos (Stripe, marketplaces, ...) para testes e carga
+
+from http.server import ThreadingHTTPServer
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Servidor HTTP dos stand-ins: uma thread por ligação"""
+
+    daemon_threads = True
+    # O backlog por omissão (5) descarta ligações em rajadas concorrentes e os
+    # clientes só voltam a tentar ~1 s depois, o que falsearia as latências
+    request_queue_size = 1024
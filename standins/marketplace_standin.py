@@ -0,0 +1,113 @@
+# Stand-in local das APIs de marketplaces (apontar GPAS_MARKETPLACE_API_URL para ele)
+# Serve GET /marketplaces/<id>/search?q=... com resultados determinísticos por
+# (marketplace, pesquisa), latência configurável e uma taxa de erros opcional.
+#
+# Uso:
+#   python -m standins.marketplace_standin --port 12112 --latency-ms 80 --error-rate 0.02
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+from standins import StandinServer
+
+
+def search_results(marketplace_id, query):
+    """Os mesmos produtos para a mesma pesquisa; preços variam ligeiramente por hora"""
+    seed = hashlib.blake2b(f'{marketplace_id}|{query}'.encode('utf-8'), digest_size=8).digest()
+    rng = random.Random(seed)
+    drift = random.Random(seed + int(time.time() // 3600).to_bytes(8, 'little'))
+    return [
+        {
+            'price': round(rng.uniform(10, 500) * drift.uniform(0.97, 1.03), 2),
+            'availability': rng.choice(['in_stock', 'limited', 'out_of_stock']),
+            'rating': round(rng.uniform(3.5, 5.0), 1),
+            'reviews': rng.randint(10, 1000),
+            'shipping_cost': round(rng.uniform(0, 15), 2),
+            'estimated_delivery': f'{rng.randint(1, 14)} dias',
+            'seller_rating': round(rng.uniform(4.0, 5.0), 1)
+        }
+        for _ in range(rng.randint(3, 8))
+    ]
+
+
+class MarketplaceStandin:
+    """API de pesquisa de marketplaces em memória"""
+
+    def __init__(self, port=0, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.server = StandinServer(('127.0.0.1', port), self._handler_class())
+        self.port = self.server.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                time.sleep(max(standin.latency_ms + random.uniform(-1, 1) * standin.jitter_ms, 0) / 1000)
+                url = urllib.parse.urlparse(self.path)
+                parts = url.path.strip('/').split('/')
+                if len(parts) != 3 or parts[0] != 'marketplaces' or parts[2] != 'search':
+                    self._send(404, {'error': 'Unknown path'})
+                    return
+
+                marketplace_id = parts[1]
+                with standin.lock:
+                    standin.calls[marketplace_id] = standin.calls.get(marketplace_id, 0) + 1
+                if random.random() < standin.error_rate:
+                    self._send(503, {'error': 'Marketplace indisponível'})
+                    return
+
+                query = urllib.parse.parse_qs(url.query).get('q', [''])[0]
+                self._send(200, {'results': search_results(marketplace_id, query)})
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in das APIs de pesquisa dos marketplaces')
+    parser.add_argument('--port', type=int, default=12112)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    standin = MarketplaceStandin(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f'Marketplace stand-in em {standin.url}')
+    standin.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
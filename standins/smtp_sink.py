@@ -0,0 +1,126 @@
+# Stand-in local de um servidor SMTP: aceita e descarta as mensagens
+# Endereços começados por "bounce" são rejeitados com 550 (hard bounce) e por
+# "defer" com 451 (soft bounce); latência configurável por mensagem e por ligação
+# nova (handshake TLS e autenticação de um servidor real) e limite opcional de
+# mensagens por ligação (421 no fim, como muitos fornecedores).
+#
+# Uso:
+#   python -m standins.smtp_sink --port 2525 --latency-ms 20 --connect-latency-ms 150
+#   GPAS_SMTP_HOST=127.0.0.1 GPAS_SMTP_PORT=2525 GPAS_SMTP_STARTTLS=0 ...
+
+import argparse
+import socketserver
+import threading
+import time
+
+from standins import StandinServer
+
+
+class SMTPSink:
+    """Servidor SMTP mínimo (EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) com contadores"""
+
+    def __init__(self, port=0, latency_ms=0, max_messages_per_connection=None, connect_latency_ms=0):
+        self.latency_ms = latency_ms
+        self.connect_latency_ms = connect_latency_ms
+        self.max_messages_per_connection = max_messages_per_connection
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.server = StandinServer(('127.0.0.1', port), self._handler_class())
+        self.port = self.server.server_address[1]
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                with sink.lock:
+                    sink.connections += 1
+                time.sleep(sink.connect_latency_ms / 1000)
+                self.reply('220 standin ESMTP')
+                recipients, sent = [], 0
+                for raw in self.rfile:
+                    command = raw.decode('utf-8', 'replace').strip()
+                    verb = command[:4].upper()
+                    if verb == 'EHLO':
+                        self.wfile.write(b'250-standin\r\n250-8BITMIME\r\n250-SMTPUTF8\r\n250 SIZE 10485760\r\n')
+                    elif verb == 'HELO':
+                        self.reply('250 standin')
+                    elif verb == 'MAIL':
+                        if sink.max_messages_per_connection and sent >= sink.max_messages_per_connection:
+                            self.reply('421 4.7.0 Too many messages, closing connection')
+                            return
+                        recipients = []
+                        self.reply('250 2.1.0 OK')
+                    elif verb == 'RCPT':
+                        address = command.partition(':')[2].strip().strip('<>').lower()
+                        if address.startswith('bounce'):
+                            with sink.lock:
+                                sink.rejected += 1
+                            self.reply('550 5.1.1 User unknown')
+                        elif address.startswith('defer'):
+                            with sink.lock:
+                                sink.rejected += 1
+                            self.reply('451 4.2.0 Mailbox busy, try later')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 2.1.5 OK')
+                    elif verb == 'DATA':
+                        if not recipients:
+                            self.reply('503 5.5.1 No valid recipients')
+                            continue
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        size = 0
+                        for line in self.rfile:
+                            if line == b'.\r\n':
+                                break
+                            size += len(line)
+                        time.sleep(sink.latency_ms / 1000)
+                        with sink.lock:
+                            sink.messages += 1
+                            sink.bytes += size
+                        sent += 1
+                        recipients = []
+                        self.reply('250 2.0.0 OK queued')
+                    elif verb in ('RSET', 'NOOP'):
+                        recipients = [] if verb == 'RSET' else recipients
+                        self.reply('250 2.0.0 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 2.0.0 Bye')
+                        return
+                    else:
+                        self.reply('502 5.5.2 Command not recognized')
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in SMTP que descarta as mensagens')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--max-messages-per-connection', type=int, default=None)
+    parser.add_argument('--connect-latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.port, args.latency_ms, args.max_messages_per_connection, args.connect_latency_ms)
+    print(f'SMTP sink em 127.0.0.1:{sink.port}')
+    sink.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
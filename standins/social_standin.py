@@ -0,0 +1,137 @@
+# Stand-in local das APIs de publicação (Twitter/X, LinkedIn, Reddit)
+# Serve POST /2/tweets, /v2/ugcPosts e /api/submit (apontar GPAS_SOCIAL_API_URL
+# para ele), com latência configurável, erros 503 opcionais e uma quota por
+# segundo que responde 429 com Retry-After, como as APIs reais.
+#
+# Uso:
+#   python -m standins.social_standin --port 12113 --latency-ms 120 --error-rate 0.05 --quota-per-second 50
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+from standins import StandinServer
+
+ROUTES = {'/2/tweets': 'twitter', '/v2/ugcPosts': 'linkedin', '/api/submit': 'reddit'}
+
+
+class SocialStandin:
+    """APIs de publicação em memória; guarda os posts recebidos por plataforma"""
+
+    def __init__(self, port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, quota_per_second=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_per_second = quota_per_second
+        self.posts = {platform: 0 for platform in ROUTES.values()}
+        self.calls = 0
+        self.throttled = 0
+        # Idempotency-Key já aceite: um segundo post igual conta como duplicado
+        self.keys = set()
+        self.duplicates = 0
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.server = StandinServer(('127.0.0.1', port), self._handler_class())
+        self.port = self.server.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def _over_quota(self, platform):
+        if not self.quota_per_second:
+            return False
+        second = int(time.time())
+        with self.lock:
+            window, count = self.windows.get(platform, (second, 0))
+            if window != second:
+                window, count = second, 0
+            self.windows[platform] = (window, count + 1)
+            if count < self.quota_per_second:
+                return False
+            self.throttled += 1
+            return True
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                time.sleep(max(standin.latency_ms + random.uniform(-1, 1) * standin.jitter_ms, 0) / 1000)
+                with standin.lock:
+                    standin.calls += 1
+
+                platform = ROUTES.get(urllib.parse.urlparse(self.path).path)
+                if platform is None:
+                    self._send(404, {'error': 'Unknown path'})
+                    return
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    self._send(401, {'error': 'Unauthorized'})
+                    return
+                if standin._over_quota(platform):
+                    self._send(429, {'error': 'Too Many Requests'}, {'Retry-After': '1'})
+                    return
+                if random.random() < standin.error_rate:
+                    self._send(503, {'error': 'Service Unavailable'})
+                    return
+
+                key = self.headers.get('Idempotency-Key') or body.decode('utf-8', 'replace')
+                with standin.lock:
+                    if key in standin.keys:
+                        standin.duplicates += 1
+                    standin.keys.add(key)
+                    standin.posts[platform] += 1
+                    post_id = f'{platform}_{standin.posts[platform]}'
+
+                if platform == 'twitter':
+                    self._send(201, {'data': {'id': post_id}})
+                elif platform == 'linkedin':
+                    self._send(201, {}, {'X-RestLi-Id': f'urn:li:share:{post_id}'})
+                else:
+                    self._send(200, {'json': {'errors': [], 'data': {'id': post_id}}})
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in das APIs de publicação das redes sociais')
+    parser.add_argument('--port', type=int, default=12113)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--quota-per-second', type=int, default=None)
+    args = parser.parse_args()
+
+    standin = SocialStandin(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.quota_per_second)
+    print(f'Social stand-in em {standin.url}')
+    standin.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
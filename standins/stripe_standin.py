@@ -0,0 +1,214 @@
+# Stand-in local do Stripe: assina e reenvia eventos de fixture para o webhook
+# e serve uma API mínima de Checkout Sessions (apontar STRIPE_API_BASE para ela)
+#
+# Uso:
+#   STRIPE_WEBHOOK_SECRET=whsec_test python -m standins.stripe_standin \
+#       --url http://127.0.0.1:5000/api/payments/webhook --repeat 3 --concurrency 8
+#   python -m standins.stripe_standin --serve 12111 --latency-ms 150
+
+import argparse
+import glob
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+from standins import StandinServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'stripe')
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Cabeçalho Stripe-Signature (esquema v1: HMAC-SHA256 de "t.payload")"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    signed = f'{timestamp}.'.encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Eventos de fixture, por ordem de nome de ficheiro"""
+    events = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path) as f:
+            events.append(json.load(f))
+    return events
+
+
+def make_event(event_type, obj, event_id=None, created=None):
+    """Constrói um evento no formato do Stripe (útil para gerar tempestades)"""
+    return {
+        'id': event_id or f'evt_standin_{random.getrandbits(64):016x}',
+        'object': 'event',
+        'api_version': '2023-10-16',
+        'created': int(created or time.time()),
+        'type': event_type,
+        'livemode': False,
+        'data': {'object': obj}
+    }
+
+
+def signed_request(event, secret):
+    """Corpo e cabeçalhos de uma entrega de webhook assinada"""
+    payload = json.dumps(event).encode('utf-8')
+    return payload, {
+        'Content-Type': 'application/json',
+        'Stripe-Signature': sign_payload(payload, secret)
+    }
+
+
+def deliver(url, event, secret, timeout=10):
+    payload, headers = signed_request(event, secret)
+    req = urllib.request.Request(url, data=payload, headers=headers, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status = response.status
+            body = json.loads(response.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        status, body = e.code, {}
+    return {
+        'event_id': event['id'],
+        'status': status,
+        'duplicate': body.get('duplicate'),
+        'latency_ms': (time.perf_counter() - start) * 1000
+    }
+
+
+def replay(url, secret, events, repeat=1, concurrency=1, shuffle=False):
+    """Reenvia cada evento `repeat` vezes, como o Stripe faz em retry storms"""
+    deliveries = [event for event in events for _ in range(repeat)]
+    if shuffle:
+        random.shuffle(deliveries)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda event: deliver(url, event, secret), deliveries))
+
+    latencies = sorted(r['latency_ms'] for r in results)
+    return {
+        'deliveries': len(results),
+        'accepted': sum(1 for r in results if r['status'] == 200 and not r['duplicate']),
+        'duplicates': sum(1 for r in results if r['duplicate']),
+        'errors': sum(1 for r in results if r['status'] != 200),
+        'p50_ms': latencies[len(latencies) // 2] if latencies else None,
+        'max_ms': latencies[-1] if latencies else None
+    }
+
+
+class StripeAPIStandin:
+    """API de Checkout Sessions em memória, com latência configurável"""
+
+    def __init__(self, port=0, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.sessions = {}
+        self.calls = {'create': 0, 'retrieve': 0}
+        self.lock = threading.Lock()
+        self.server = StandinServer(('127.0.0.1', port), self._handler_class())
+        self.port = self.server.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                time.sleep(standin.latency_ms / 1000)
+                prefix = '/v1/checkout/sessions/'
+                session_id = self.path.split('?')[0][len(prefix):] if self.path.startswith(prefix) else None
+                with standin.lock:
+                    standin.calls['retrieve'] += 1
+                    session = standin.sessions.get(session_id)
+                if session is None:
+                    self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'No such session'}})
+                else:
+                    self._send(200, session)
+
+            def do_POST(self):
+                time.sleep(standin.latency_ms / 1000)
+                length = int(self.headers.get('Content-Length') or 0)
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+                if self.path.split('?')[0] != '/v1/checkout/sessions':
+                    self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+                    return
+                with standin.lock:
+                    standin.calls['create'] += 1
+                session = standin.create_session({k: v[0] for k, v in form.items()})
+                self._send(200, session)
+
+        return Handler
+
+    def create_session(self, params):
+        session_id = f'cs_test_standin_{random.getrandbits(64):016x}'
+        metadata = {key[len('metadata['):-1]: value for key, value in params.items() if key.startswith('metadata[')}
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.url}/pay/{session_id}',
+            'amount_total': 4900,
+            'currency': 'eur',
+            'customer': f'cus_standin_{random.getrandbits(32):08x}',
+            'customer_email': params.get('customer_email'),
+            'mode': params.get('mode', 'subscription'),
+            'payment_status': 'paid',
+            'status': 'complete',
+            'metadata': metadata
+        }
+        with self.lock:
+            self.sessions[session_id] = session
+        return session
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reenvia eventos Stripe assinados para o webhook')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='servir a API de Checkout Sessions')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--url', default='http://127.0.0.1:5000/api/payments/webhook')
+    parser.add_argument('--secret', default=os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_standin'))
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--shuffle', action='store_true')
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        standin = StripeAPIStandin(args.serve, args.latency_ms)
+        print(f'Stripe stand-in em {standin.url}')
+        standin.server.serve_forever()
+        return
+
+    events = load_fixtures(args.fixtures)
+    print(json.dumps(replay(args.url, args.secret, events, args.repeat, args.concurrency, args.shuffle), indent=2))
+
+
+if __name__ == '__main__':
+    main()
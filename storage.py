@@ -0,0 +1,59 @@
+# Armazenamento local partilhado entre workers
+# SQLite em modo WAL (em produção usar PostgreSQL)
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DATA_DIR = os.environ.get(
+    'GPAS_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+)
+
+_local = threading.local()
+
+
+def data_path(*parts):
+    """Devolve caminho dentro da pasta de dados, criando-a se necessário"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, *parts)
+
+
+def connect(name, schema=None, pragmas=()):
+    """Devolve ligação SQLite da thread atual para a base de dados `name`
+
+    As ligações nunca atravessam um fork nem são partilhadas entre threads.
+    `pragmas` correm antes do modo WAL, que já escreve o cabeçalho do ficheiro
+    (ex.: auto_vacuum, que depois disso só muda com um VACUUM).
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = (os.getpid(), name)
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(data_path(f'{name}.sqlite3'), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for pragma in pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if schema:
+            conn.executescript(schema)
+        connections[key] = conn
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """Transação com lock de escrita imediato (evita deadlocks de upgrade)"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    else:
+        conn.execute('COMMIT')
@@ -0,0 +1,262 @@
+# Estado das subscrições aplicado a partir dos webhooks do Stripe
+# Mapeia clientes Stripe -> utilizadores, aplica as transições de plano em lotes
+# (group commit) e publica invalidações que cada worker aplica em poucos segundos.
+
+import os
+import sqlite3
+import threading
+import time
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    email TEXT PRIMARY KEY,
+    customer_id TEXT UNIQUE,
+    subscription_id TEXT,
+    plan TEXT NOT NULL,
+    billing TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subscription_invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Sem plano gratuito: cancelamentos voltam ao plano de entrada
+DOWNGRADE_PLAN = 'starter'
+
+
+class SubscriptionStore:
+    """Aplica transições de subscrição em lote e notifica os workers"""
+
+    def __init__(self, max_batch=200, max_delay=0.05, poll_interval=1.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.listeners = []
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flusher_pid = None
+        self._listener_pid = None
+        self._last_seq = 0
+
+    def _db(self):
+        return connect('subscriptions', SCHEMA)
+
+    def on_change(self, func):
+        """Regista callback (email, estado) chamado quando uma subscrição muda"""
+        self.listeners.append(func)
+        return func
+
+    # Escrita: transições em lote
+
+    def activate(self, email, customer_id, plan, billing=None, subscription_id=None):
+        return self._submit({'kind': 'activate', 'email': email, 'customer_id': customer_id,
+                             'plan': plan, 'billing': billing, 'subscription_id': subscription_id})
+
+    def renew(self, customer_id, email=None):
+        return self._submit({'kind': 'renew', 'email': email, 'customer_id': customer_id})
+
+    def cancel(self, customer_id, email=None):
+        return self._submit({'kind': 'cancel', 'email': email, 'customer_id': customer_id})
+
+    def _submit(self, change):
+        """Bloqueia até o lote que contém a transição estar gravado"""
+        item = {'change': change, 'done': threading.Event(), 'error': None, 'email': None}
+        with self._cond:
+            self._ensure_flusher()
+            self._pending.append(item)
+            self._cond.notify()
+
+        item['done'].wait()
+        if item['error'] is not None:
+            raise item['error']
+        return item['email']
+
+    def _ensure_flusher(self):
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            self._pending = []
+            threading.Thread(target=self._flush_loop, name='subscriptions-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Dar tempo a que cheguem mais transições para o mesmo commit
+                deadline = time.monotonic() + self.max_delay
+                while len(self._pending) < self.max_batch and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+
+            try:
+                changed = self._apply_batch(batch)
+            except Exception as e:
+                for item in batch:
+                    item['error'] = e
+                    item['done'].set()
+                continue
+
+            for item in batch:
+                item['done'].set()
+            # Este processo não precisa de esperar pelo polling
+            self._notify(changed)
+
+    def _apply_batch(self, batch):
+        conn = self._db()
+        now = time.time()
+        changed = {}
+
+        with transaction(conn):
+            for item in batch:
+                # Savepoint por transição: um conflito só falha esse evento, não o lote
+                conn.execute('SAVEPOINT item')
+                try:
+                    state = self._apply_change(conn, item['change'], now)
+                except sqlite3.Error as e:
+                    conn.execute('ROLLBACK TO item')
+                    item['error'] = e
+                    state = None
+                conn.execute('RELEASE item')
+                if state is not None:
+                    item['email'] = state['email']
+                    changed[state['email']] = state
+
+            conn.executemany(
+                'INSERT INTO subscription_invalidations (email, created_at) VALUES (?, ?)',
+                [(email, now) for email in changed]
+            )
+        return changed
+
+    def _apply_change(self, conn, change, now):
+        row = None
+        if change['customer_id']:
+            row = conn.execute(
+                'SELECT * FROM subscriptions WHERE customer_id = ?', (change['customer_id'],)
+            ).fetchone()
+        if row is None and change['email']:
+            row = conn.execute('SELECT * FROM subscriptions WHERE email = ?', (change['email'],)).fetchone()
+
+        if change['kind'] == 'activate':
+            state = {
+                'email': change['email'],
+                'customer_id': change['customer_id'],
+                'subscription_id': change['subscription_id'],
+                'plan': change['plan'],
+                'billing': change['billing'],
+                'status': 'active'
+            }
+        elif row is None:
+            print(f"Subscrição sem utilizador conhecido: cliente {change['customer_id']}")
+            return None
+        elif change['kind'] == 'renew':
+            state = dict(row, status='active')
+        else:
+            state = dict(row, plan=DOWNGRADE_PLAN, status='cancelled')
+
+        if not state['email']:
+            return None
+        conn.execute(
+            'INSERT INTO subscriptions (email, customer_id, subscription_id, plan, billing, status, updated_at) '
+            'VALUES (:email, :customer_id, :subscription_id, :plan, :billing, :status, :updated_at) '
+            'ON CONFLICT(email) DO UPDATE SET customer_id = excluded.customer_id, '
+            'subscription_id = excluded.subscription_id, plan = excluded.plan, '
+            'billing = excluded.billing, status = excluded.status, updated_at = excluded.updated_at',
+            dict(state, updated_at=now)
+        )
+        return state
+
+    # Leitura: propagação para os workers
+
+    def get(self, email):
+        row = self._db().execute('SELECT * FROM subscriptions WHERE email = ?', (email,)).fetchone()
+        return dict(row) if row else None
+
+    def email_for_customer(self, customer_id):
+        row = self._db().execute(
+            'SELECT email FROM subscriptions WHERE customer_id = ?', (customer_id,)
+        ).fetchone()
+        return row['email'] if row else None
+
+    def iter_subscribers(self, statuses=None, plans=None, updated_since=None, page_size=1000):
+        """Subscrições por ordem de email, em páginas (keyset): memória constante em listas grandes"""
+        query, params = 'SELECT * FROM subscriptions WHERE email > ?', []
+        if statuses:
+            query += f" AND status IN ({','.join('?' * len(statuses))})"
+            params += list(statuses)
+        if plans:
+            query += f" AND plan IN ({','.join('?' * len(plans))})"
+            params += list(plans)
+        if updated_since is not None:
+            query += ' AND updated_at >= ?'
+            params.append(updated_since)
+        query += ' ORDER BY email LIMIT ?'
+
+        last = ''
+        while True:
+            rows = self._db().execute(query, [last, *params, page_size]).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < page_size:
+                return
+            last = rows[-1]['email']
+
+    def _notify(self, changed):
+        for email, state in changed.items():
+            for listener in self.listeners:
+                try:
+                    listener(email, state)
+                except Exception as e:
+                    print(f"Erro ao propagar subscrição de {email}: {e}")
+
+    def sync_all(self):
+        """Aplica o estado completo (arranque do worker) e posiciona o cursor"""
+        conn = self._db()
+        self._last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM subscription_invalidations').fetchone()[0]
+        self._notify({row['email']: dict(row) for row in conn.execute('SELECT * FROM subscriptions')})
+
+    def poll(self):
+        """Aplica invalidações publicadas por outros processos desde a última leitura"""
+        conn = self._db()
+        rows = conn.execute(
+            'SELECT seq, email FROM subscription_invalidations WHERE seq > ? ORDER BY seq', (self._last_seq,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        self._last_seq = rows[-1]['seq']
+        emails = list({row['email'] for row in rows})
+        placeholders = ','.join('?' * len(emails))
+        states = conn.execute(f'SELECT * FROM subscriptions WHERE email IN ({placeholders})', emails)
+        self._notify({row['email']: dict(row) for row in states})
+        return len(rows)
+
+    def start_listener(self):
+        """Arranca o polling de invalidações neste processo (chamar depois do fork)"""
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        self.sync_all()
+        threading.Thread(target=self._listen_loop, name='subscriptions-listener', daemon=True).start()
+
+    def _listen_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Erro ao ler invalidações de subscrições: {e}")
+
+    def purge(self, retention_seconds=86400):
+        self._db().execute(
+            'DELETE FROM subscription_invalidations WHERE created_at < ?', (time.time() - retention_seconds,)
+        )
+
+
+subscription_store = SubscriptionStore(poll_interval=float(os.environ.get('GPAS_INVALIDATION_POLL', 1.0)))
@@ -0,0 +1,67 @@
+# Configuração partilhada dos testes: cada teste usa uma pasta de dados própria
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Antes de importar os módulos da app: nada escreve em data/
+os.environ.setdefault('GPAS_DATA_DIR', tempfile.mkdtemp(prefix='gpas-tests-'))
+# Sem agendador nem threads de fundo ao importar app.py
+os.environ['GPAS_START_BACKGROUND'] = '0'
+os.environ['GPAS_ENABLE_SCHEDULER'] = '0'
+
+import pytest  # noqa: E402
+
+import storage  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Bases SQLite novas por teste (fecha as ligações em cache desta thread)"""
+    connections = getattr(storage._local, 'connections', None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+    monkeypatch.setattr(storage, 'DATA_DIR', str(tmp_path))
+    yield tmp_path
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    return create_app({'TESTING': True})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Cabeçalhos com um JWT válido para o email dado"""
+    from flask_jwt_extended import create_access_token
+
+    def headers(email='user1@example.com'):
+        with app.app_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=email)}'}
+    return headers
+
+
+@pytest.fixture
+def stripe_api(monkeypatch):
+    """API de Checkout Sessions do stand-in local, usada pelo SDK do Stripe"""
+    import payments
+    from standins.stripe_standin import StripeAPIStandin
+
+    standin = StripeAPIStandin().start()
+    monkeypatch.setattr(payments, 'STRIPE_API_BASE', standin.url)
+    monkeypatch.setattr(payments, '_stripe', None)
+    yield standin
+    standin.stop()
+    payments._stripe = None
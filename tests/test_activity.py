@@ -0,0 +1,106 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import app as app_module
+from activity import ALL, ActivityLog, event_deltas, periods
+
+SCAN = {'candidates': 20, 'profitable': [
+    {'roi': 30, 'profit': 12.5, 'marketplace': 'amazon', 'risk': 'low'},
+    {'roi': 50, 'profit': 20.0, 'marketplace': 'ebay', 'risk': 'high'},
+]}
+
+
+@pytest.fixture
+def log():
+    log = ActivityLog()
+    log._flusher_pid = os.getpid()  # sem thread de flush: os testes chamam flush()
+    return log
+
+
+def ts(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+def test_event_deltas():
+    assert event_deltas('search', {'results': {'amazon': 3}}) == [(ALL, 'searches', 1), ('amazon', 'search_results', 3)]
+    assert event_deltas('prediction', {'change_percent': -7}) == [(ALL, 'predictions', 1), (ALL, 'trends_identified', 1)]
+    assert (ALL, 'revenue', 0) in event_deltas('purchase', {'profit': 10, 'succeeded': False})
+    assert event_deltas('unknown', {}) == []
+
+    scan = {(marketplace, metric): value for marketplace, metric, value in event_deltas('scan', SCAN)}
+    assert scan[(ALL, 'opportunities_found')] == 20
+    assert scan[(ALL, 'risk_alerts')] == 1
+    assert scan[('ebay', 'profit_sum')] == 20.0
+
+
+def test_periods_are_utc_day_month_and_total():
+    assert periods(ts('2026-03-31T23:30:00')) == ('2026-03-31', '2026-03', ALL)
+
+
+def test_records_are_buffered_until_flush(log):
+    log.record('u1', 'search', {'results': {'amazon': 2}})
+    assert log.rollups('u1')['total'] == {}
+    assert log.flush() == 1
+    assert log.flush() == 0
+    assert log.rollups('u1')['total'] == {ALL: {'searches': 1}, 'amazon': {'search_results': 2}}
+
+
+def test_rollups_by_period(log):
+    log._buffer = [
+        ('u1', 'purchase', ts('2026-02-10T10:00:00'), {'profit': 40, 'marketplace': 'amazon'}),
+        ('u1', 'purchase', ts('2026-03-01T10:00:00'), {'profit': 25}),
+        ('u1', 'scan', ts('2026-03-01T11:00:00'), SCAN),
+        ('u1', 'scan', ts('2026-03-01T12:00:00'), {'candidates': 5, 'profitable': [
+            {'roi': 10, 'profit': 1, 'marketplace': 'amazon', 'risk': 'low'}]}),
+        ('u2', 'purchase', ts('2026-03-01T10:00:00'), {'profit': 1000}),
+    ]
+    log.flush()
+
+    rollups = log.rollups('u1', now=ts('2026-03-01T20:00:00'))
+    assert rollups['previous_month'][ALL]['revenue'] == 40
+    assert rollups['month'][ALL]['revenue'] == 25
+    assert rollups['today'][ALL]['scans'] == 2
+    assert rollups['today'][ALL]['best_roi'] == 50
+    assert rollups['today'][ALL]['roi_sum'] == 90
+    assert rollups['total'][ALL]['purchases'] == 2
+    assert rollups['total']['amazon']['opportunities_profitable'] == 2
+
+
+def test_rebuild_matches_incremental_rollups(log):
+    for i in range(30):
+        log.record(f'u{i % 3}', 'scan', SCAN)
+        log.record(f'u{i % 3}', 'purchase', {'profit': i, 'marketplace': 'etsy', 'succeeded': i % 2 == 0})
+    log.flush()
+    before = [log.rollups(f'u{i}') for i in range(3)]
+
+    log.rebuild_rollups(chunk_size=7)
+    assert [log.rollups(f'u{i}') for i in range(3)] == before
+    log._db().execute("UPDATE activity_rollups SET value = 0 WHERE user_id = 'u1'")
+    log.rebuild_rollups('u1')
+    assert [log.rollups(f'u{i}') for i in range(3)] == before
+
+
+def test_buffer_is_bounded(log):
+    log.max_buffer = 3
+    for _ in range(5):
+        log.record('u1', 'prediction', {})
+    assert log.flush() == 3
+
+
+def test_dashboard_reads_the_rollups(client, auth_headers, log, monkeypatch):
+    monkeypatch.setattr(app_module, 'activity_log', log)
+    log.record('user_001', 'scan', SCAN)
+    log.record('user_001', 'purchase', {'profit': 12, 'marketplace': 'amazon'})
+    log.record('user_001', 'purchase', {'profit': 99, 'succeeded': False})
+    log.record('user_002', 'scan', SCAN)
+    log.flush()
+
+    stats = client.get('/api/stats/dashboard', headers=auth_headers()).get_json()
+    assert stats['opportunities'] == {'found_today': 20, 'profitable': 2, 'avg_roi': 40.0, 'best_roi': 50.0}
+    assert stats['automation']['active_scans'] == 1
+    assert stats['automation']['success_rate'] == 50.0
+    assert stats['revenue']['today'] == 12
+    assert stats['marketplaces']['most_profitable'] == 'ebay'
+    assert stats['ai_insights']['risk_alerts'] == 1
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_module
+import payments
+import subscriptions
+from app import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def model_loads(monkeypatch):
+    """Substitui o treino do modelo; devolve quantas vezes foi carregado"""
+    loads = []
+
+    def load():
+        loads.append(1)
+        return SimpleNamespace(is_trained=True, predict_price=lambda *args: {
+            'predicted_price': 110.0, 'confidence': 0.9, 'change_percent': 10.0})
+    monkeypatch.setattr(app_module, '_ai_model', None)
+    monkeypatch.setattr(app_module, 'PricePredictionAI', load)
+    return loads
+
+
+@pytest.mark.parametrize('flag, path', [
+    ('ENABLE_PAYMENTS', '/api/payments/config'),
+    ('ENABLE_AUTONOMOUS', '/api/autonomous/jobs'),
+    ('ENABLE_MARKETING', '/api/marketing/dispatch'),
+])
+def test_disabled_modules_register_no_routes(flag, path):
+    enabled = create_app({'TESTING': True}).test_client()
+    disabled = create_app({'TESTING': True, flag: False}).test_client()
+    assert enabled.get(path).status_code != 404
+    assert disabled.get(path).status_code == 404
+
+
+def test_model_is_loaded_on_first_use(client, auth_headers, model_loads):
+    assert client.get('/api/health').get_json()['ai_status'] == 'standby'
+    assert client.post('/api/predict/price', json={'current_price': 100}, headers=auth_headers()).status_code == 200
+    client.post('/api/predict/price', json={'current_price': 100}, headers=auth_headers())
+    assert client.get('/api/health').get_json()['ai_status'] == 'active'
+    assert model_loads == [1]
+
+
+def test_preload_model_loads_before_the_first_request(model_loads):
+    create_app({'TESTING': True, 'PRELOAD_MODEL': True})
+    assert model_loads == [1]
+
+
+def test_background_services_start_only_when_asked(monkeypatch):
+    started = []
+    monkeypatch.setattr(payments.webhook_queue, 'start_workers', lambda: started.append('webhooks'))
+    monkeypatch.setattr(subscriptions.subscription_store, 'start_listener', lambda: started.append('listener'))
+
+    create_app({'TESTING': True})
+    create_app({'TESTING': True, 'START_BACKGROUND': True, 'ENABLE_PAYMENTS': False})
+    assert started == []
+    create_app({'TESTING': True, 'START_BACKGROUND': True})
+    assert started == ['listener', 'webhooks']
+
+
+def test_importing_the_app_starts_no_threads(tmp_path):
+    env = dict(os.environ, GPAS_DATA_DIR=str(tmp_path))
+    env.pop('GPAS_START_BACKGROUND')
+    threads = subprocess.run(
+        [sys.executable, '-c', "import threading, app; print(threading.active_count())"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert threads.strip() == '1'
+
+
+def test_importing_the_app_does_not_load_the_model_stack(tmp_path):
+    env = dict(os.environ, GPAS_DATA_DIR=str(tmp_path))
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, app; print(' '.join(sorted(sys.modules)))"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout.split()
+    assert 'payments' in loaded and 'viral_marketing' in loaded
+    assert not {'sklearn', 'numpy', 'stripe'} & set(loaded)
@@ -0,0 +1,29 @@
+import app as app_module
+from price_history import series_id
+
+OPPORTUNITIES = '/api/arbitrage/opportunities'
+
+
+def test_requires_authentication(client):
+    assert client.get(OPPORTUNITIES).status_code == 401
+
+
+def test_opportunities_read_the_series_recorded_by_search(client, auth_headers, monkeypatch):
+    requested = []
+    features = app_module.history_features
+
+    def spy(product, marketplace_id):
+        requested.append((product, marketplace_id))
+        return features(product, marketplace_id)
+
+    monkeypatch.setattr(app_module, 'history_features', spy)
+    assert client.get(OPPORTUNITIES, headers=auth_headers()).status_code == 200
+    assert requested
+
+    # Cada produto é um resultado que /api/search grava com o mesmo título (e a mesma série)
+    for product, marketplace_id in requested:
+        query, variant = product.rsplit(' - Variante ', 1)
+        assert query in app_module.ARBITRAGE_PRODUCTS
+        connector = app_module.marketplace_connectors[marketplace_id]
+        searched = connector.product(query, int(variant) - 1, 10.0)
+        assert series_id(searched['title'], searched['marketplace_id']) == series_id(product, marketplace_id)
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+from flask import request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import app as app_module
+import asgi
+from checkout_cache import CheckoutSessionCache
+from http_client import HTTPClient
+from marketplace_connectors import HTTPConnector
+from price_history import PriceHistory
+from standins.marketplace_standin import MarketplaceStandin
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, monkeypatch):
+    """Cliente HTTP, histórico e atividade próprios (sem threads de fundo)"""
+    history = PriceHistory(root=str(tmp_path / 'price_history'))
+    history._flusher_pid = os.getpid()
+    monkeypatch.setattr(app_module, 'price_history', history)
+    monkeypatch.setattr(app_module.activity_log, 'record', lambda *event: None)
+    monkeypatch.setattr(asgi, 'http_client', HTTPClient(retries=0))
+
+
+def call(*requests):
+    """Envia os pedidos à app ASGI num único event loop e fecha o cliente partilhado"""
+    async def run():
+        transport = httpx.ASGITransport(app=asgi.app, client=('10.0.0.1', 1234))
+        async with httpx.AsyncClient(transport=transport, base_url='http://gpas.test') as client:
+            try:
+                return [await client.request(method, url, **kwargs) for method, url, kwargs in requests]
+            finally:
+                await asgi.http_client.aclose()
+    return asyncio.run(run())
+
+
+def test_async_search_queries_every_marketplace(auth_headers, monkeypatch):
+    standin = MarketplaceStandin().start()
+    try:
+        connectors = {mid: HTTPConnector(mid, m, standin.url, client=asgi.http_client)
+                      for mid, m in app_module.marketplaces_data.items() if m['active']}
+        monkeypatch.setattr(app_module, 'marketplace_connectors', connectors)
+        [response] = call(('POST', '/api/search', {'json': {'query': 'smartwatch'}, 'headers': auth_headers()}))
+    finally:
+        standin.stop()
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body['marketplaces_searched'] == len(connectors) and body['marketplaces_failed'] == []
+    assert set(standin.calls) == set(connectors)
+    assert {product['marketplace_id'] for product in body['results']} == set(connectors)
+
+
+def test_async_search_reports_failed_marketplaces(auth_headers, monkeypatch):
+    standin = MarketplaceStandin(error_rate=1.0).start()
+    try:
+        connectors = {'amazon': HTTPConnector('amazon', app_module.marketplaces_data['amazon'], standin.url,
+                                              client=asgi.http_client)}
+        monkeypatch.setattr(app_module, 'marketplace_connectors', connectors)
+        [response] = call(('POST', '/api/search', {'json': {'query': 'x'}, 'headers': auth_headers()}))
+    finally:
+        standin.stop()
+    assert response.status_code == 200 and response.json()['marketplaces_failed'] == ['amazon']
+
+
+def test_async_routes_keep_the_flask_errors(auth_headers):
+    responses = call(
+        ('POST', '/api/search', {'json': {'query': 'x'}}),
+        ('POST', '/api/search', {'json': {}, 'headers': auth_headers()}),
+        ('POST', '/api/search', {'json': {'query': 'x'}, 'headers': auth_headers('ghost@example.com')}),
+        ('GET', '/api/arbitrage/opportunities', {}),
+        ('GET', '/success', {}),
+    )
+    assert [response.status_code for response in responses] == [401, 400, 404, 401, 400]
+
+
+def test_other_routes_fall_back_to_wsgi(auth_headers):
+    health, dashboard = call(('GET', '/api/health', {}),
+                             ('GET', '/api/stats/dashboard', {'headers': auth_headers()}))
+    assert health.json()['status'] == 'healthy'
+    assert dashboard.status_code == 200
+
+
+def test_arbitrage_thread_keeps_the_request_context(monkeypatch):
+    monkeypatch.setattr(app_module, 'get_arbitrage_opportunities', lambda: {'user': request.headers['X-Who']})
+    [response] = call(('GET', '/api/arbitrage/opportunities', {'headers': {'X-Who': 'ana'}}))
+    assert response.json() == {'user': 'ana'}
+
+
+def test_success_page_fetches_from_stripe_asynchronously(stripe_api, monkeypatch):
+    cache = CheckoutSessionCache()
+    monkeypatch.setattr(asgi, 'checkout_cache', cache)
+    monkeypatch.setattr(asgi, 'STRIPE_API_BASE', stripe_api.url)
+    session = stripe_api.create_session({'metadata[plan]': 'starter'})
+
+    first, second, missing = call(('GET', f"/success?session_id={session['id']}", {}),
+                                  ('GET', f"/success?session_id={session['id']}", {}),
+                                  ('GET', '/success?session_id=cs_missing', {}))
+    assert (first.status_code, second.status_code, missing.status_code) == (200, 200, 500)
+    assert stripe_api.calls['retrieve'] == 2
+    assert cache.get(session['id'])['metadata'] == {'plan': 'starter'}
+
+
+def test_success_page_only_fetches_checkout_sessions(monkeypatch):
+    urls = []
+
+    async def request_async(method, url, **kwargs):
+        urls.append(url)
+        return httpx.Response(404, request=httpx.Request(method, url))
+    monkeypatch.setattr(asgi.http_client, 'request_async', request_async)
+    monkeypatch.setattr(asgi, 'checkout_cache', CheckoutSessionCache())
+
+    foreign, traversal = call(('GET', '/success', {'params': {'session_id': '../../customers'}}),
+                              ('GET', '/success', {'params': {'session_id': 'cs_1/../../customers?limit=1'}}))
+    assert (foreign.status_code, traversal.status_code) == (400, 500)
+    assert urls == [f'{asgi.STRIPE_API_BASE}/v1/checkout/sessions/cs_1%2F..%2F..%2Fcustomers%3Flimit%3D1']
+
+
+def test_auth_and_rate_limit_run_off_the_event_loop(auth_headers, monkeypatch):
+    import auth_cache
+    import rate_limit
+
+    threads = {}
+
+    def spy(name, func):
+        def wrapper(*args, **kwargs):
+            threads[name] = threading.current_thread()
+            return func(*args, **kwargs)
+        return wrapper
+    monkeypatch.setattr(auth_cache, 'authenticate', spy('auth', auth_cache.authenticate))
+    monkeypatch.setattr(rate_limit, 'check_rate_limit', spy('rate_limit', rate_limit.check_rate_limit))
+
+    async def handler():
+        threads['view'] = threading.current_thread()
+        return {}
+    view = auth_cache.auth_required(rate_limit.rate_limited(cost=1)(handler))
+    monkeypatch.setitem(asgi.ASYNC_ROUTES, ('GET', '/checked'), view)
+    [response] = call(('GET', '/checked', {'headers': auth_headers()}))
+    assert response.status_code == 200
+    assert threads['auth'] is not threads['view'] and threads['rate_limit'] is not threads['view']
+
+
+async def whoami():
+    return {'remote_addr': request.remote_addr, 'scheme': request.scheme}
+
+
+def test_proxy_fix_applies_to_async_routes(monkeypatch):
+    monkeypatch.setattr(app_module.app, 'wsgi_app', ProxyFix(app_module.app.wsgi_app, x_for=1, x_proto=1))
+    monkeypatch.setitem(asgi.ASYNC_ROUTES, ('GET', '/whoami'), whoami)
+    [response] = call(('GET', '/whoami', {'headers': {'X-Forwarded-For': '203.0.113.9', 'X-Forwarded-Proto': 'https'}}))
+    assert response.json() == {'remote_addr': '203.0.113.9', 'scheme': 'https'}
+
+
+def test_lifespan_closes_the_http_client(monkeypatch):
+    closed = []
+
+    async def aclose():
+        closed.append(True)
+    monkeypatch.setattr(asgi.http_client, 'aclose', aclose)
+
+    async def run():
+        messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+        await asgi.app({'type': 'lifespan'}, receive, send)
+        return sent
+    assert asyncio.run(run()) == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert closed == [True]
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+from auth_cache import AuthCache, auth_cache
+
+DASHBOARD = '/api/stats/dashboard'
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    auth_cache.clear()
+    yield
+    auth_cache.clear()
+
+
+def claims(identity='ana@example.com', exp=1000):
+    return {'sub': identity, 'exp': exp}
+
+
+def test_entries_expire_with_the_token_or_the_ttl():
+    cache = AuthCache(max_ttl=60)
+    cache.put('short', claims(exp=110), {'id': 1}, now=100)
+    cache.put('long', claims(exp=10_000), {'id': 1}, now=100)
+    assert cache.get('short', now=109)['user'] == {'id': 1}
+    assert cache.get('short', now=110) is None
+    assert cache.get('long', now=159) is not None
+    assert cache.get('long', now=160) is None
+    assert cache.stats() == {'entries': 0, 'hits': 2, 'misses': 2}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AuthCache(max_entries=2)
+    cache.put('a', claims('a'), {}, now=0)
+    cache.put('b', claims('b'), {}, now=0)
+    cache.get('a', now=1)
+    cache.put('c', claims('c'), {}, now=1)
+    assert cache.get('b', now=1) is None
+    assert cache.get('a', now=1) and cache.get('c', now=1)
+    assert set(cache.by_identity) == {'a', 'c'}
+
+
+def test_invalidate_drops_every_token_of_the_identity():
+    cache = AuthCache()
+    cache.put('t1', claims('ana'), {}, now=0)
+    cache.put('t2', claims('ana'), {}, now=0)
+    cache.put('t3', claims('rui'), {}, now=0)
+    cache.invalidate('ana')
+    cache.invalidate('nobody')
+    assert cache.get('t1', now=1) is None and cache.get('t2', now=1) is None
+    assert cache.get('t3', now=1) is not None
+    assert set(cache.by_identity) == {'rui'}
+
+
+def test_verified_token_is_served_from_the_cache(client, auth_headers):
+    headers = auth_headers()
+    before = auth_cache.stats()
+    assert client.get(DASHBOARD, headers=headers).status_code == 200
+    assert client.get(DASHBOARD, headers=headers).status_code == 200
+    after = auth_cache.stats()
+    # Os contadores são globais ao processo; só conta o que estes pedidos fizeram
+    assert (after['entries'], after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 1, 1)
+
+
+def test_plan_change_invalidates_cached_user(client, auth_headers, monkeypatch):
+    user = app_module.users_db['user1@example.com']
+    monkeypatch.setitem(user, 'plan', user['plan'])
+    monkeypatch.setitem(user, 'subscription_status', user['subscription_status'])
+    headers = auth_headers()
+    client.get(DASHBOARD, headers=headers)
+
+    app_module._apply_subscription('user1@example.com', {'plan': 'enterprise', 'status': 'active'})
+    assert auth_cache.stats()['entries'] == 0
+    assert client.get(DASHBOARD, headers=headers).get_json()['user']['plan'] == 'enterprise'
+
+
+def test_unknown_users_are_not_cached(client, auth_headers):
+    response = client.get(DASHBOARD, headers=auth_headers('ghost@example.com'))
+    assert response.status_code == 404
+    assert auth_cache.stats()['entries'] == 0
+
+
+def test_token_errors(client, app):
+    assert client.get(DASHBOARD).status_code == 401
+    assert client.get(DASHBOARD, headers={'Authorization': 'Bearer not-a-jwt'}).status_code == 422
+    with app.app_context():
+        expired = create_access_token(identity='user1@example.com', expires_delta=timedelta(seconds=-1))
+    assert client.get(DASHBOARD, headers={'Authorization': f'Bearer {expired}'}).status_code == 401
+
+
+@pytest.mark.parametrize('body, status', [
+    ({'email': 'user1@example.com'}, 400),
+    ({'email': 'ghost@example.com', 'password': 'password'}, 404),
+    ({'email': 'user1@example.com', 'password': 'wrong'}, 401),
+])
+def test_login_errors(client, body, status):
+    assert client.post('/api/auth/login', json=body).status_code == status
+
+
+def test_login_token_authenticates(client):
+    body = client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': 'password'}).get_json()
+    response = client.get(DASHBOARD, headers={'Authorization': f"Bearer {body['access_token']}"})
+    assert response.status_code == 200
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import bench_predict
+
+SCRIPT = bench_predict.__file__
+
+
+def test_time_case_reports_ordered_percentiles():
+    calls = []
+    result = bench_predict.time_case(lambda: calls.append(1), min_iterations=50, min_seconds=0, warmup=5)
+    assert result['iterations'] == 50 and len(calls) == 55
+    assert result['min_us'] <= result['p50_us'] <= result['p90_us'] <= result['p99_us']
+    assert bench_predict.percentile([1, 2, 3, 4], 0.5) == 3
+
+
+def test_compare_flags_only_regressions_beyond_the_limits():
+    baseline = {'results': {'a': {'p50_us': 100, 'p99_us': 200}, 'b': {'p50_us': 100, 'p99_us': 200},
+                            'removed': {'p50_us': 1, 'p99_us': 1}}}
+    results = {'a': {'p50_us': 110, 'p99_us': 250}, 'b': {'p50_us': 120, 'p99_us': 300},
+               'new': {'p50_us': 10, 'p99_us': 20}}
+    regressions = bench_predict.compare(results, baseline, max_p50=0.15, max_p99=0.30)
+    assert regressions == ['b: p50_us 100 -> 120 (+20%)', 'b: p99_us 200 -> 300 (+50%)']
+    assert results['a']['p50_ratio'] == 1.1 and 'p50_ratio' not in results['new']
+
+
+def run(tmp_path, *args):
+    env = dict(os.environ, GPAS_DATA_DIR=str(tmp_path / 'data'))
+    return subprocess.run([sys.executable, SCRIPT, '--case', 'predict_single', '--min-iterations', '5',
+                           '--min-seconds', '0', '--warmup', '0', '--baseline', str(tmp_path / 'baseline.json'),
+                           *args], env=env, capture_output=True, text=True, timeout=300)
+
+
+def test_baseline_round_trip(tmp_path):
+    saved = run(tmp_path, '--save-baseline')
+    assert saved.returncode == 0, saved.stderr
+    assert list(json.loads((tmp_path / 'baseline.json').read_text())['results']) == ['predict_single']
+
+    # Com limite negativo qualquer medição conta como regressão
+    compared = run(tmp_path, '--compare', '--max-p50-regression', '-1')
+    assert compared.returncode == 1
+    assert json.loads(compared.stdout)['regressions'][0].startswith('predict_single: p50_us')
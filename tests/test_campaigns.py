@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from viral_marketing import campaign_renderer, compile_brand, rebrand
+
+CAMPAIGNS = '/api/marketing/campaigns'
+
+
+@pytest.fixture
+def enterprise(monkeypatch):
+    from app import users_db
+
+    monkeypatch.setitem(users_db['user1@example.com'], 'plan', 'enterprise')
+
+
+def strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from strings(item)
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('brand', ['Acme\\1', 'Acme\\', '{user_id} 100%', 'Acme \\g<0>'])
+def test_rebrand_inserts_brand_literally(brand):
+    assert rebrand('Com o GPAS 2.0 e o GPAS', brand) == f'Com o {brand} e o {brand}'
+    assert rebrand({'a': ['GPAS']}, brand) == {'a': [brand]}
+
+
+def test_campaigns_render_with_special_brand():
+    brand = 'Acme {amount} 100%'
+    compile_brand.cache_clear()
+    campaign = next(campaign_renderer.render(1, seed=1, brand=brand))
+    assert any(brand in text for text in strings(campaign))
+    assert not any('GPAS 2.0' in text for text in strings(campaign))
+
+
+def test_requires_enterprise(client, auth_headers):
+    assert client.post(CAMPAIGNS, json={'campaigns': 1}, headers=auth_headers()).status_code == 403
+
+
+@pytest.mark.parametrize('brand', [123, ['Acme'], {'x': 1}, '', 'x' * 65, 'Acme\nInc'])
+def test_invalid_brand_is_rejected_before_streaming(client, auth_headers, enterprise, brand):
+    response = client.post(CAMPAIGNS, headers=auth_headers(),
+                           json={'tenants': [{'id': 'acme', 'brand': brand, 'campaigns': 2}]})
+    assert response.status_code == 400
+    assert 'X-Campaign-Count' not in response.headers
+
+
+@pytest.mark.parametrize('body', [
+    {'tenants': [{'brand': 'Acme', 'campaigns': 2}]},
+    {'tenants': ['acme']},
+    {'tenants': [{'id': 'acme', 'campaigns': 'many'}]},
+    {'tenants': [{'id': 'acme', 'campaigns': 0}]},
+    {'seed': -1, 'campaigns': 1},
+])
+def test_invalid_requests(client, auth_headers, enterprise, body):
+    assert client.post(CAMPAIGNS, json=body, headers=auth_headers()).status_code == 400
+
+
+def test_stream_is_complete_and_reproducible(client, auth_headers, enterprise):
+    body = {'seed': 42, 'tenants': [{'id': 'acme', 'brand': 'Acme\\1', 'campaigns': 3},
+                                    {'id': 'beta', 'campaigns': 2}]}
+    first = client.post(CAMPAIGNS, json=body, headers=auth_headers())
+    assert first.status_code == 200
+    assert first.headers['X-Campaign-Count'] == '5'
+    rows = lines(first)
+    assert [row['tenant'] for row in rows] == ['acme'] * 3 + ['beta'] * 2
+    assert any('Acme\\1' in text for text in strings(rows[:3]))
+    assert not any('GPAS 2.0' in text for text in strings(rows[:3]))
+    assert rows == lines(client.post(CAMPAIGNS, json=body, headers=auth_headers()))
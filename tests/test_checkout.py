@@ -0,0 +1,117 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+CHECKOUT = '/api/payments/create-checkout-session'
+
+
+def test_invalid_plan(client, stripe_api):
+    assert client.post(CHECKOUT, json={'plan': 'gold'}).status_code == 400
+    assert stripe_api.calls['create'] == 0
+
+
+@pytest.mark.parametrize('nonce', ['short', 'x' * 65, 'not a nonce!!!!!!!', 12345678901234567, ['a' * 20]])
+def test_invalid_nonce(client, stripe_api, nonce):
+    response = client.post(CHECKOUT, json={'plan': 'starter', 'checkout_nonce': nonce})
+    assert response.status_code == 400
+
+
+def test_authenticated_clicks_reuse_the_session(client, stripe_api, auth_headers):
+    first = client.post(CHECKOUT, json={'plan': 'starter'}, headers=auth_headers()).get_json()
+    second = client.post(CHECKOUT, json={'plan': 'starter'}, headers=auth_headers()).get_json()
+    assert first['checkout_session_id'] == second['checkout_session_id']
+    assert stripe_api.calls['create'] == 1
+
+    other = client.post(CHECKOUT, json={'plan': 'starter', 'billing': 'annual'}, headers=auth_headers())
+    assert other.get_json()['checkout_session_id'] != first['checkout_session_id']
+
+
+def test_anonymous_buyers_behind_one_ip_get_their_own_sessions(client, stripe_api):
+    # Mesmo remote_addr (router do Heroku, NAT): nunca partilhar a sessão
+    first = client.post(CHECKOUT, json={'plan': 'professional'}).get_json()
+    second = client.post(CHECKOUT, json={'plan': 'professional'}).get_json()
+    assert first['checkout_session_id'] != second['checkout_session_id']
+    assert stripe_api.calls['create'] == 2
+
+
+def test_anonymous_nonce_groups_repeated_clicks(client, stripe_api):
+    body = {'plan': 'professional', 'checkout_nonce': 'a' * 24}
+    first = client.post(CHECKOUT, json=body).get_json()
+    again = client.post(CHECKOUT, json=body).get_json()
+    other = client.post(CHECKOUT, json=dict(body, checkout_nonce='b' * 24)).get_json()
+    assert first['checkout_session_id'] == again['checkout_session_id']
+    assert other['checkout_session_id'] != first['checkout_session_id']
+    assert stripe_api.calls['create'] == 2
+
+
+def test_invalid_tokens_check_out_anonymously(client, app, stripe_api):
+    with app.app_context():
+        expired = create_access_token(identity='user1@example.com', expires_delta=timedelta(seconds=-1))
+    body = {'plan': 'starter', 'checkout_nonce': 'b' * 24}
+    for token in (expired, 'not-a-jwt'):
+        response = client.post(CHECKOUT, json=body, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+    # O segundo pedido reutiliza a sessão do nonce, como qualquer anónimo
+    assert stripe_api.calls['create'] == 1
+
+
+def test_session_metadata_carries_plan_and_variant(client, stripe_api, auth_headers):
+    session_id = client.post(CHECKOUT, json={'plan': 'enterprise', 'billing': 'annual'},
+                             headers=auth_headers()).get_json()['checkout_session_id']
+    metadata = stripe_api.sessions[session_id]['metadata']
+    assert metadata == {'plan': 'enterprise', 'billing': 'annual', 'price_variant': 'control'}
+
+
+def test_checkout_start_is_counted_once_the_session_exists(client, stripe_api, auth_headers, monkeypatch):
+    import payments
+    starts = []
+    monkeypatch.setattr(payments.pricing_experiments, 'record_start', lambda *key: starts.append(key))
+
+    client.post(CHECKOUT, json={'plan': 'starter'}, headers=auth_headers())
+    client.post(CHECKOUT, json={'plan': 'starter'}, headers=auth_headers())
+    # A sessão reutilizada não é um novo início
+    assert starts == [('starter', 'monthly', 'control')]
+
+
+def test_failed_session_is_not_a_checkout_start(client, monkeypatch):
+    import payments
+
+    def create(**params):
+        raise RuntimeError('Stripe indisponível')
+
+    starts = []
+    monkeypatch.setattr(payments.pricing_experiments, 'record_start', lambda *key: starts.append(key))
+    monkeypatch.setattr(payments, 'get_stripe', lambda: SimpleNamespace(
+        checkout=SimpleNamespace(Session=SimpleNamespace(create=create))))
+
+    assert client.post(CHECKOUT, json={'plan': 'starter'}).status_code == 500
+    assert starts == []
+
+
+def test_reuse_window_and_idempotency_key():
+    from checkout_cache import CheckoutReuse
+
+    reuse = CheckoutReuse(window_seconds=600)
+    reuse.put('user:ana', 'starter', 'monthly', 'cs_1', 'https://pay/cs_1')
+    assert reuse.get('user:ana', 'starter', 'monthly') == {'session_id': 'cs_1', 'url': 'https://pay/cs_1'}
+    assert reuse.get('user:ana', 'starter', 'annual') is None
+
+    key = reuse.idempotency_key('user:ana', 'starter', 'monthly', now=1200)
+    assert key == reuse.idempotency_key('user:ana', 'starter', 'monthly', now=1799)
+    assert key != reuse.idempotency_key('user:ana', 'starter', 'monthly', now=1800)
+    assert key != reuse.idempotency_key('user:rui', 'starter', 'monthly', now=1200)
+
+
+def test_public_config_is_cacheable(client):
+    from plans import PRICING_PLANS
+
+    response = client.get('/api/payments/config')
+    assert response.status_code == 200
+    assert response.get_json()['plans'] == PRICING_PLANS
+    assert not any('rate_limit' in plan for plan in response.get_json()['plans'].values())
+    assert response.headers['Cache-Control'] == 'public, max-age=300'
+
+    again = client.get('/api/payments/config', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+import storage
+from content_store import ContentStore, content_hash, normalize
+
+
+def post(content, platform='twitter', **kw):
+    return {'kind': 'post', 'platform': platform, 'content': content, **kw}
+
+
+def pages(store):
+    db = store._db()
+    return db.execute('PRAGMA page_count').fetchone()[0], db.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def test_normalize_ignores_case_spacing_and_hashtags():
+    assert normalize('Ganhe  MAIS\tcom o GPAS #Arbitragem #ai') == 'ganhe mais com o gpas'
+    assert content_hash('twitter', 'Olá #a') == content_hash('twitter', 'olá #b')
+    assert content_hash('twitter', 'Olá') != content_hash('linkedin', 'Olá')
+
+
+def test_duplicates_are_counted_not_rescheduled():
+    store = ContentStore()
+    first = store.add(post('Arbitragem automática #x', scheduled_at=100), now=50)
+    assert first['content_hash'] == content_hash('twitter', 'arbitragem automática').hex()
+    assert store.add(post('arbitragem   AUTOMÁTICA #y', scheduled_at=999), now=60) is None
+    assert store.contains('twitter', 'Arbitragem automática')
+    assert not store.contains('linkedin', 'Arbitragem automática')
+
+    [item] = store.scheduled()
+    assert item['scheduled_at'] == 100
+    assert store.stats() == {'items': 1, 'duplicates_skipped': 1, 'platforms': {'twitter': {'scheduled': 1}}}
+
+
+def test_due_mark_and_reschedule():
+    store = ContentStore()
+    added = store.add_many([post('a', scheduled_at=10, payload={'n': 1}), post('b', scheduled_at=20),
+                            post('c', 'linkedin', scheduled_at=30)], now=0)
+    assert [item['content'] for item in store.due(now=25)] == ['a', 'b']
+    assert [item['content'] for item in store.due('linkedin', now=100)] == ['c']
+    assert store.due(now=25)[0]['payload'] == {'n': 1}
+
+    store.mark([added[0]['content_hash']], 'posted', now=26)
+    store.reschedule([added[0]['content_hash'], added[1]['content_hash']], 500)
+    # Só as peças ainda agendadas mudam de hora
+    assert [(item['content'], item['scheduled_at']) for item in store.scheduled()] == [('c', 30), ('b', 500)]
+    [posted] = store.scheduled(status='posted')
+    assert posted['posted_at'] == 26
+
+    with pytest.raises(ValueError):
+        store.mark([added[1]['content_hash']], 'deleted')
+
+
+def test_new_database_uses_incremental_auto_vacuum():
+    store = ContentStore()
+    db = store._db()
+    assert db.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_compact_respects_retention_and_returns_pages():
+    store = ContentStore(retention_days=1)
+    day = 86400
+    store.add_many([post(f'antigo {i} ' + 'x' * 2000, status='posted') for i in range(200)], now=0)
+    store.add(post('agendado para depois', scheduled_at=10 * day), now=0)
+    store.add(post('recente', status='posted'), now=5 * day)
+    before, _ = pages(store)
+
+    assert store.compact(now=5 * day) == 200
+    after, free = pages(store)
+    assert free == 0 and after < before / 4
+    assert store.stats()['items'] == 2
+
+
+def test_compact_converts_database_created_without_auto_vacuum():
+    # Base criada por uma versão anterior: WAL antes de auto_vacuum
+    conn = sqlite3.connect(storage.data_path('legacy.sqlite3'), isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('CREATE TABLE filler (x)')
+    conn.close()
+
+    store = ContentStore('legacy')
+    assert store._db().execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+    store.add(post('velho', status='posted'), now=0)
+    store.compact(retention_days=1, now=10 * 86400)
+    assert store._db().execute('PRAGMA auto_vacuum').fetchone()[0] == 2
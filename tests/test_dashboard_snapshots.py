@@ -0,0 +1,113 @@
+import json
+
+import autonomous_features
+from dashboard_snapshots import SnapshotService
+
+
+def service(name='test', calls=None, fail=()):
+    """Duas secções que contam as chamadas; as de `fail` levantam exceção"""
+    calls = calls if calls is not None else []
+    snapshots = SnapshotService(name)
+
+    def section(name):
+        def compute():
+            calls.append(name)
+            if name in fail:
+                raise RuntimeError(f'{name} indisponível')
+            return {'value': calls.count(name)}
+        return compute
+
+    snapshots.section('fast', every=60)(section('fast'))
+    snapshots.section('slow', every=3600)(section('slow'))
+    return snapshots
+
+
+def document(snapshots):
+    body, _ = snapshots.latest()
+    return json.loads(body)
+
+
+def test_sections_follow_their_own_cadence():
+    calls = []
+    snapshots = service(calls=calls)
+    assert snapshots.refresh(now=1000) == ['fast', 'slow']
+    assert snapshots.refresh(now=1059) == []
+    assert snapshots.refresh(now=1060) == ['fast']
+    assert snapshots.refresh(force=True, now=1061) == ['fast', 'slow']
+    assert calls == ['fast', 'slow', 'fast', 'fast', 'slow']
+
+    doc = document(snapshots)
+    assert doc['fast'] == {'value': 3} and doc['slow'] == {'value': 2}
+    assert doc['snapshot'] == {'generated_at': 1061, 'sections': {'fast': 1061, 'slow': 1061}}
+
+
+def test_failing_section_keeps_the_last_good_data():
+    calls = []
+    snapshots = service(calls=calls)
+    snapshots.refresh(now=1000)
+    failing = service(calls=calls, fail=('fast',))
+    assert failing.refresh(now=2000) == []
+
+    assert document(failing)['fast'] == {'value': 1}
+    assert document(failing)['snapshot']['sections']['fast'] == 1000
+    status = failing.status()
+    assert status['fast']['error'] == 'fast indisponível' and status['slow']['error'] is None
+    assert status['fast']['age_seconds'] == status['slow']['age_seconds']
+    assert status['slow']['every_seconds'] == 3600
+
+    # A secção continua vencida: o tick seguinte tenta outra vez e limpa o erro
+    assert failing.refresh(now=2001) == []
+    assert service(calls=calls).refresh(now=2002) == ['fast']
+    assert calls.count('fast') == 4
+    assert service(calls=calls).status()['fast']['error'] is None
+
+
+def test_no_document_until_every_section_has_data():
+    snapshots = service(fail=('slow',))
+    assert snapshots.refresh(now=1000) == ['fast']
+    assert snapshots.latest() == (None, None)
+
+
+def test_composer_and_cold_start():
+    snapshots = service()
+    snapshots.compose(lambda sections: {'total': sections['fast']['value'] + sections['slow']['value']})
+    body, generated_at = snapshots.latest()
+    assert json.loads(body)['total'] == 2
+    # Sem documento novo, os mesmos bytes são servidos outra vez
+    assert snapshots.latest()[0] is body
+    snapshots.refresh(force=True, now=generated_at + 1)
+    assert snapshots.latest()[0] is not body
+
+
+def test_workers_share_the_stored_document():
+    calls = []
+    service('shared', calls=calls).refresh(now=1000)
+    reader = service('shared', calls=calls)
+    assert document(reader)['fast'] == {'value': 1}
+    assert calls == ['fast', 'slow']
+
+
+def test_dashboard_route_serves_the_snapshot(client):
+    response = client.get('/api/autonomous/dashboard')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache' and int(response.headers['Age']) >= 0
+    body = response.get_json()
+    assert set(body['snapshot']['sections']) == {'revenue', 'system_load', 'growth', 'health'}
+    assert body['kpis']['monthly_recurring_revenue'].startswith('€')
+
+    status = client.get('/api/autonomous/dashboard/status').get_json()['sections']
+    assert status['system_load']['every_seconds'] == 60 and status['growth']['error'] is None
+
+
+def test_dashboard_route_without_a_snapshot(client, monkeypatch):
+    monkeypatch.setattr(autonomous_features, 'dashboard_snapshots', service(fail=('fast', 'slow')))
+    assert client.get('/api/autonomous/dashboard').status_code == 503
+    assert client.get('/api/autonomous/dashboard/status').get_json()['sections'] == {}
+
+
+def test_scheduled_refresh_only_recomputes_due_sections(monkeypatch):
+    calls = []
+    monkeypatch.setattr(autonomous_features, 'dashboard_snapshots', service(calls=calls))
+    autonomous_features.refresh_dashboard_snapshot()
+    autonomous_features.refresh_dashboard_snapshot()
+    assert calls == ['fast', 'slow']
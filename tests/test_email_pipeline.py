@@ -0,0 +1,132 @@
+import email
+import time
+from email.header import decode_header, make_header
+
+import pytest
+
+import email_pipeline as pipeline_module
+from content_store import ContentStore
+from email_pipeline import SOFT_BOUNCE_LIMIT, BounceTracker, CampaignTemplate, EmailPipeline, SMTPPool
+from standins.smtp_sink import SMTPSink
+from subscriptions import SubscriptionStore
+
+SENDER = 'GPAS 2.0 <noreply@gpas2.com>'
+
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+def make_pipeline(port, **options):
+    pool = SMTPPool('127.0.0.1', port, starttls=False, size=options.get('workers', 2))
+    return EmailPipeline(pool, SENDER, **dict({'workers': 2, 'batch_size': 10}, **options))
+
+
+def people(*emails):
+    return [{'email': address, 'plan': 'starter'} for address in emails]
+
+
+def test_template_renders_each_recipient():
+    template = CampaignTemplate(SENDER, '🚀 Novidades', 'Desconto de 50%', 'Corpo')
+    [(address, raw)] = template.render([{'email': 'ana@example.com', 'plan': 'professional'}])
+    message = email.message_from_bytes(raw)
+    assert address == 'ana@example.com' and message['To'] == 'ana@example.com'
+    assert str(make_header(decode_header(message['Subject']))) == '🚀 Novidades'
+    assert message['List-Unsubscribe'] == '<mailto:unsubscribe@gpas2.com?subject=unsubscribe>'
+    body = message.get_payload(decode=True).decode('utf-8')
+    assert body.startswith('Olá ana,') and 'Desconto de 50%' in body and 'plano atual: professional' in body
+
+
+def test_campaign_is_sent_over_reused_connections(sink):
+    recipients = people(*(f'user{i}@example.com' for i in range(45)))
+    report = make_pipeline(sink.port).run('nurture', 'Olá', 'Novidades', recipients=recipients)
+    assert (report['sent'], report['bounced'], report['failed'], report['suppressed']) == (45, 0, 0, 0)
+    assert sink.messages == 45 and sink.connections <= 2
+    assert BounceTracker().stats()['runs'][0]['sent'] == 45
+
+
+def test_bounces_are_recorded_and_suppressed(sink):
+    recipients = people('bounce@example.com', 'defer@example.com', 'ok@example.com')
+    first = make_pipeline(sink.port).run('nurture', 'Olá', 'x', recipients=recipients)
+    assert (first['sent'], first['bounced']) == (1, 2)
+    assert BounceTracker().stats()['bounces'] == {'hard': 1, 'soft': 1}
+
+    second = make_pipeline(sink.port).run('nurture', 'Olá', 'x', recipients=recipients)
+    assert (second['sent'], second['bounced'], second['suppressed']) == (1, 1, 1)
+
+
+def test_soft_bounces_suppress_after_the_limit():
+    tracker = BounceTracker()
+    for _ in range(SOFT_BOUNCE_LIMIT - 1):
+        tracker.record([('defer@example.com', 451, 'busy')])
+    assert tracker.suppressed(['defer@example.com']) == set()
+    tracker.record([('defer@example.com', 451, 'busy')])
+    assert tracker.suppressed(['defer@example.com', 'ok@example.com']) == {'defer@example.com'}
+
+    tracker.purge(retention_seconds=-1)
+    assert tracker.suppressed(['defer@example.com']) == set()
+
+
+def test_connection_closed_by_the_server_continues_on_another(sink):
+    sink.max_messages_per_connection = 3
+    report = make_pipeline(sink.port, workers=1).run('nurture', 'Olá', 'x',
+                                                     recipients=people(*(f'u{i}@example.com' for i in range(10))))
+    assert report['sent'] == 10 and report['failed'] == 0
+    assert sink.connections == 4
+
+
+def test_unreachable_server_fails_the_batch(sink):
+    port = sink.port
+    sink.stop()
+    pipeline = make_pipeline(port, max_attempts=1)
+    report = pipeline.run('nurture', 'Olá', 'x', recipients=people('a@example.com', 'b@example.com'))
+    assert (report['sent'], report['failed']) == (0, 2)
+    with pytest.raises(ValueError):
+        pipeline.run('newsletter', 'Olá', 'x', recipients=[])
+
+
+def test_backpressure_bounds_the_rendered_batches(sink):
+    sink.latency_ms = 20
+    rendered = []
+    pipeline = make_pipeline(sink.port, workers=1, batch_size=1, queue_batches=2)
+
+    def recipients():
+        for i in range(8):
+            rendered.append((i, sink.messages))
+            yield {'email': f'u{i}@example.com'}
+
+    pipeline.run('nurture', 'Olá', 'x', recipients=recipients())
+    # A leitura nunca vai mais de queue_batches + 1 (em envio) + 1 (a ser lido) à frente do envio
+    assert all(i - sent <= 4 for i, sent in rendered)
+
+
+def test_segments_come_from_the_subscription_store():
+    store = SubscriptionStore(max_delay=0)
+    store.activate('a@example.com', 'cus_a', 'starter')
+    store.activate('b@example.com', 'cus_b', 'enterprise')
+    store.activate('c@example.com', 'cus_c', 'professional')
+    store.cancel('cus_c')
+
+    pipeline = EmailPipeline(None, SENDER, store=store, batch_size=1)
+    assert [r['email'] for r in pipeline.recipients('upsell')] == ['a@example.com']
+    assert [r['email'] for r in pipeline.recipients('win_back')] == ['c@example.com']
+    assert [r['email'] for r in pipeline.recipients('welcome', now=time.time() + 8 * 86400)] == []
+    assert not pipeline.enabled
+
+
+def test_due_email_campaigns_are_sent_once(sink, monkeypatch):
+    store = SubscriptionStore(max_delay=0)
+    store.activate('a@example.com', 'cus_a', 'starter')
+    content = ContentStore()
+    content.add({'kind': 'email', 'platform': 'email', 'content': 'Olá', 'scheduled_at': time.time() - 1,
+                 'payload': {'subject': 'Olá', 'preview': 'Novidades'}})
+    monkeypatch.setattr(pipeline_module, 'content_store', content)
+    monkeypatch.setattr(pipeline_module, 'email_pipeline', make_pipeline(sink.port, store=store))
+
+    pipeline_module.send_email_campaigns()
+    pipeline_module.send_email_campaigns()
+    assert sink.messages == 1
+    assert content.due('email') == []
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import app as app_module
+from http_client import CircuitBreaker, CircuitOpenError, HostBusyError, HTTPClient, http_client
+from standins import StandinServer
+
+
+class ScriptedServer:
+    """Responde com os estados da lista, por ordem (depois 200)"""
+
+    def __init__(self, *statuses, delay=0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.methods = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                server.methods.append(self.command)
+                time.sleep(server.delay)
+                status = server.statuses.pop(0) if server.statuses else 200
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            do_GET = do_POST = _respond
+
+        self.server = StandinServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*statuses, **kwargs):
+        servers.append(ScriptedServer(*statuses, **kwargs))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+
+def make_client(**options):
+    return HTTPClient(**dict({'backoff_base': 0.001, 'backoff_max': 0.01}, **options))
+
+
+def test_idempotent_requests_are_retried(serve):
+    server = serve(503, 502)
+    http = make_client(retries=2)
+    assert http.get(server.url).status_code == 200
+    stats = http.stats()[server.url]
+    assert (stats['requests'], stats['errors'], stats['retries'], stats['circuit']) == (3, 2, 2, 'closed')
+
+
+def test_posts_are_not_retried_and_errors_are_returned(serve):
+    server = serve(503, 404)
+    http = make_client(retries=2)
+    assert http.post(server.url, data=b'x').status_code == 503
+    assert http.get(server.url).status_code == 404
+    assert server.methods == ['POST', 'GET']
+    assert http.post(server.url, retries=1).status_code == 200
+
+
+def test_retry_after_is_honoured_up_to_the_maximum():
+    http = make_client(backoff_max=2.0)
+    assert http._backoff(0, retry_after='1.5') == 1.5
+    assert http._backoff(0, retry_after='120') == 2.0
+    assert 0 <= http._backoff(3, retry_after='soon') <= 0.008
+
+
+def test_connection_errors_raise_after_the_retries(serve):
+    http = make_client(retries=1)
+    closed = serve()
+    closed.close()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http.get(closed.url)
+    assert http.stats()[closed.url]['requests'] == 2
+
+
+def test_breaker_opens_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.cancel()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_open_circuit_rejects_requests(serve):
+    server = serve(500, 500)
+    http = make_client(retries=0, failure_threshold=2, reset_timeout=60)
+    assert http.get(server.url).status_code == 500
+    assert http.get(server.url).status_code == 500
+    with pytest.raises(CircuitOpenError):
+        http.get(server.url)
+    assert server.methods == ['GET', 'GET']
+    assert http.stats()[server.url]['rejected'] == 1
+
+
+def test_busy_host_rejects_requests_past_the_concurrency_limit(serve):
+    server = serve(delay=0.3)
+    http = make_client(max_concurrency=1, acquire_timeout=0.05)
+    worker = threading.Thread(target=http.get, args=(server.url,))
+    worker.start()
+    time.sleep(0.1)
+    with pytest.raises(HostBusyError):
+        http.get(server.url)
+    worker.join()
+    assert http.stats()[server.url]['rejected'] == 1
+
+
+def test_async_requests_share_the_retry_policy(serve):
+    server = serve(503)
+    http = make_client(retries=1)
+
+    async def run():
+        try:
+            return await http.request_async('GET', server.url)
+        finally:
+            await http.aclose()
+    assert asyncio.run(run()).status_code == 200
+    assert http.stats()[server.url]['retries'] == 1
+
+
+def test_stripe_calls_go_through_the_shared_client(client, auth_headers, stripe_api):
+    before = http_client.stats().get(stripe_api.url, {}).get('requests', 0)
+    response = client.post('/api/payments/create-checkout-session', json={'plan': 'starter'},
+                           headers=auth_headers())
+    assert response.status_code == 200
+    assert http_client.stats()[stripe_api.url]['requests'] == before + 1
+
+
+def test_http_stats_route(client, auth_headers, serve, monkeypatch):
+    assert client.get('/api/system/http').status_code == 401
+
+    http = HTTPClient()
+    monkeypatch.setattr(app_module, 'http_client', http)
+    server = serve()
+    http.get(server.url)
+    body = client.get('/api/system/http', headers=auth_headers()).get_json()
+    assert list(body['hosts']) == [server.url]
+    assert body['hosts'][server.url]['requests'] == 1 and body['hosts'][server.url]['latency_ms']['max'] > 0
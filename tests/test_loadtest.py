@@ -0,0 +1,86 @@
+import argparse
+import json
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks import loadtest
+from standins.marketplace_standin import MarketplaceStandin, search_results
+
+
+@pytest.fixture
+def marketplaces():
+    standin = MarketplaceStandin().start()
+    yield standin
+    standin.stop()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_parse_mix():
+    assert loadtest.parse_mix('search=4, dashboard') == {'search': 4.0, 'dashboard': 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_mix('search=1,mine=2')
+
+
+def test_stats_report():
+    stats = loadtest.Stats()
+    for latency in (1, 3, 8, 40):
+        stats.add('GET /a', 200, latency)
+    stats.add('GET /a', 503, 5000)
+    stats.add('GET /a', 'error', 20000)
+    stats.add('GET /b', 429, 2)
+
+    report = stats.report(elapsed=2)
+    endpoint = report['endpoints']['GET /a']
+    assert (report['requests'], report['throughput_rps']) == (7, 3.5)
+    assert endpoint['errors'] == 2 and endpoint['status'] == {'200': 4, '503': 1, 'error': 1}
+    assert report['endpoints']['GET /b']['errors'] == 0
+    assert endpoint['latency_ms']['p50'] == 40 and endpoint['latency_ms']['max'] == 20000
+    histogram = {bucket['le_ms']: bucket['count'] for bucket in endpoint['histogram']}
+    assert (histogram[1], histogram[5], histogram[10], histogram[50], histogram[5000], histogram[None]) == (1, 1, 1, 1, 1, 1)
+    assert sum(histogram.values()) == 6
+
+
+def test_marketplace_standin(marketplaces):
+    status, body = get(f'{marketplaces.url}/marketplaces/amazon/search?q=smartwatch')
+    assert status == 200 and body['results'] == search_results('amazon', 'smartwatch')
+    assert search_results('amazon', 'smartwatch') != search_results('ebay', 'smartwatch')
+    assert get(f'{marketplaces.url}/other')[0] == 404
+
+    marketplaces.error_rate = 1.0
+    assert get(f'{marketplaces.url}/marketplaces/ebay/search?q=x')[0] == 503
+    assert marketplaces.calls == {'amazon': 1, 'ebay': 1}
+
+
+def test_client_records_statuses_and_connection_errors(marketplaces):
+    stats = loadtest.Stats()
+    client = loadtest.Client(marketplaces.url, stats)
+    assert client.request('search', 'GET', '/marketplaces/amazon/search?q=a')[0] == 200
+    assert client.request('search', 'GET', '/marketplaces/amazon/search?q=b')[0] == 200
+    assert loadtest.Client(f'http://127.0.0.1:{loadtest.free_port()}', stats).request('down', 'GET', '/')[0] == 'error'
+    assert {name: entry['status'] for name, entry in stats.endpoints.items()} == {'search': {200: 2}, 'down': {'error': 1}}
+
+
+def test_short_load_test_against_gunicorn():
+    result = subprocess.run(
+        [sys.executable, loadtest.__file__, '--duration', '2', '--workers', '1', '--concurrency', '2',
+         '--mix', 'search=1,dashboard=1,checkout=1', '--login-burst', '3', '--login-every', '0.5',
+         '--webhook-storm', '3', '--webhook-duplicates', '2', '--webhook-every', '0.5',
+         '--marketplace-latency-ms', '1', '--stripe-latency-ms', '1'],
+        capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    report = json.loads(result.stdout)
+    assert report['requests'] > 0 and report['error_rate'] == 0
+    assert set(report['endpoints']) >= {'POST /api/search', 'POST /api/payments/webhook', 'POST /api/auth/login'}
+    assert report['standins']['stripe_calls']['create'] > 0 and report['standins']['marketplace_calls'] > 0
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import app as app_module
+from model_store import ModelStore, SharedForest
+
+
+def dataset(seed=0, n=300, features=5):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, features)) * [1000, 10, 5, 1, 3][:features]
+    return X, X[:, 0] * (1 + 0.1 * X[:, -1])
+
+
+def fit(seed=0, trees=4, features=5):
+    X, y = dataset(seed, features=features)
+    return RandomForestRegressor(n_estimators=trees, max_depth=6, random_state=seed).fit(X, y)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(root=str(tmp_path / 'model'))
+
+
+def test_shared_forest_matches_sklearn(store):
+    model = fit()
+    version = store.publish(model)
+    forest = store.load()
+    X, _ = dataset(seed=1, n=50)
+
+    assert isinstance(forest, SharedForest) and forest.version == version
+    assert forest.meta['n_trees'] == 4 and forest.meta['n_features'] == 5
+    np.testing.assert_allclose(forest.predict(X), model.predict(X))
+    assert forest.nbytes > 0
+    with pytest.raises(ValueError):
+        forest.predict(X[:, :4])
+
+
+def test_warm_start_keeps_the_newest_base_trees(store):
+    base_model, new_model = fit(seed=0), fit(seed=1, trees=2)
+    store.publish(base_model)
+    merged = store.load(store.publish(new_model, base=store.load(), keep_trees=3))
+
+    assert merged.meta['n_trees'] == 5
+    X, _ = dataset(seed=2, n=50)
+    per_tree = [tree.predict(X.astype(np.float32)) for tree in base_model.estimators_[-3:] + new_model.estimators_]
+    np.testing.assert_allclose(merged.predict(X), np.mean(per_tree, axis=0))
+
+
+def test_warm_start_requires_the_same_features(store):
+    store.publish(fit())
+    with pytest.raises(ValueError):
+        store.publish(fit(features=4), base=store.load(), keep_trees=2)
+
+
+def test_versions_activate_atomically_and_old_ones_are_cleaned(store):
+    assert store.current_version() is None and store.load() is None
+    versions = [store.stage(fit(trees=1)) for _ in range(4)]
+    assert store.current_version() is None
+    store.activate(versions[0])
+    assert store.current_version() == versions[0]
+
+    store.cleanup(keep=2)
+    remaining = [name for name in versions if name in os.listdir(store.root)]
+    assert versions[0] in remaining and len(remaining) == 2
+
+
+def test_predictor_loads_the_published_model_and_follows_new_versions(store, monkeypatch):
+    store.publish(fit())
+    monkeypatch.setattr(app_module.PricePredictionAI, 'train_model', lambda self: pytest.fail('não devia treinar'))
+    monkeypatch.setattr(app_module.PricePredictionAI, 'RELOAD_INTERVAL', 0)
+    ai = app_module.PricePredictionAI(store=store)
+    assert ai.is_trained
+
+    newer = store.publish(fit(seed=3))
+    assert 'predicted_price' in ai.predict_price(100, 1, 0)
+    assert ai.forest.version == newer
+
+
+def test_memory_route(client, auth_headers, store, monkeypatch):
+    assert client.get('/api/system/memory').status_code == 401
+
+    monkeypatch.setattr(app_module, '_ai_model', None)
+    report = client.get('/api/system/memory', headers=auth_headers()).get_json()
+    assert report['model'] == {'loaded': False, 'version': None, 'mapped_bytes': 0}
+    assert report['workers'][0]['current'] and report['workers'][0]['rss_kb'] > 0
+
+    store.publish(fit())
+    monkeypatch.setattr(app_module, '_ai_model', app_module.PricePredictionAI(store=store))
+    model = client.get('/api/system/memory', headers=auth_headers()).get_json()['model']
+    assert model['loaded'] and model['version'] == store.current_version() and model['mapped_bytes'] > 0
@@ -0,0 +1,29 @@
+def test_predict_requires_price(client, auth_headers):
+    response = client.post('/api/predict/price', json={}, headers=auth_headers())
+    assert response.status_code == 400
+
+
+def test_predict_requires_token(client):
+    response = client.post('/api/predict/price', json={'current_price': 100})
+    assert response.status_code == 401
+
+
+def test_predict_for_user_unknown_to_this_worker(client, auth_headers):
+    # Token válido de um utilizador registado noutro worker (ou antes de um restart)
+    response = client.post('/api/predict/price', json={'current_price': 100},
+                           headers=auth_headers('ghost@example.com'))
+    assert response.status_code == 200
+    assert 'change_percent' in response.get_json()['prediction']
+
+
+def test_predict_records_activity(client, auth_headers, monkeypatch):
+    import app as app_module
+
+    recorded = []
+    monkeypatch.setattr(app_module.activity_log, 'record', lambda *event: recorded.append(event))
+    response = client.post('/api/predict/price', json={'current_price': 100}, headers=auth_headers())
+    assert response.status_code == 200
+    assert [(user_id, kind) for user_id, kind, _ in recorded] == [('user_001', 'prediction')]
+
+    client.post('/api/predict/price', json={'current_price': 100}, headers=auth_headers('ghost@example.com'))
+    assert len(recorded) == 1
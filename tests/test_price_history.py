@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pytest
+
+import app as app_module
+from price_history import DAY, PriceHistory, series_id
+
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PriceHistory(root=str(tmp_path / 'price_history'))
+    history._flusher_pid = os.getpid()  # sem thread de flush: os testes chamam flush()
+    return history
+
+
+def fill(history, product='Smartwatch - Variante 1', marketplace='amazon', days=10, per_day=2, price=100.0):
+    for day in range(days):
+        for i in range(per_day):
+            history.record(product, marketplace, price + day, ts=NOW - (days - day) * DAY + i * 3600,
+                           category=2, marketplace_index=0)
+
+
+def test_series_id_normalizes_the_title():
+    assert series_id(' Smartwatch - Variante 1 ', 'amazon') == series_id('smartwatch - variante 1', 'amazon')
+    assert series_id('Smartwatch', 'amazon') != series_id('Smartwatch', 'ebay')
+
+
+def test_reads_merge_segments_and_the_pending_buffer(history):
+    series = series_id('a', 'amazon')
+    history.record('a', 'amazon', 3.0, ts=30)
+    history.record('a', 'amazon', 1.0, ts=10)
+    history.record('b', 'amazon', 9.0, ts=20)
+    assert history.flush() == 3
+    history.record('a', 'amazon', 2.0, ts=20)
+
+    ts, price = history.range(series)
+    assert ts.tolist() == [10, 20, 30] and price.tolist() == [1, 2, 3]
+    assert history.range(series, start=15, end=25)[1].tolist() == [2]
+    assert history.stats() == {'segments': 1, 'rows': 3, 'buffered': 1}
+
+    # Outro worker vê só o que já foi gravado
+    other = PriceHistory(root=history.root)
+    assert other.range(series)[1].tolist() == [1, 3]
+    assert set(other.series_ids().tolist()) == {series, series_id('b', 'amazon')}
+
+
+def test_manifest_rewrite_within_the_same_mtime_is_seen(history):
+    series = series_id('a', 'amazon')
+    history.record('a', 'amazon', 1.0, ts=10)
+    history.flush()
+    reader = PriceHistory(root=history.root)
+    assert reader.range(series)[1].tolist() == [1]
+    before = os.stat(os.path.join(history.root, 'manifest.json'))
+
+    history.record('a', 'amazon', 2.0, ts=20)
+    history.flush()
+    # Sistema de ficheiros com mtime grosseiro: a reescrita fica com o mesmo mtime
+    os.utime(os.path.join(history.root, 'manifest.json'), ns=(before.st_atime_ns, before.st_mtime_ns))
+    assert reader.range(series)[1].tolist() == [1, 2]
+
+
+def test_compact_merges_small_segments(history):
+    series = series_id('a', 'amazon')
+    for ts in (30, 10, 20):
+        history.record('a', 'amazon', float(ts), ts=ts)
+        history.flush()
+    reader = PriceHistory(root=history.root)
+    assert reader.range(series)[0].tolist() == [10, 20, 30]
+
+    assert history.compact() == 3
+    assert history.compact() == 0
+    assert history.stats()['segments'] == 1
+    assert reader.range(series)[1].tolist() == [10, 20, 30]
+    assert len([name for name in os.listdir(history.root) if name.startswith('seg-')]) == 1
+
+
+def test_downsample(history):
+    for ts, price in ((0, 1.0), (10, 3.0), (60, 5.0)):
+        history.record('a', 'amazon', price, ts=ts)
+    result = history.downsample(series_id('a', 'amazon'), 60)
+    assert result == {'ts': [0.0, 60.0], 'mean': [2.0, 5.0], 'min': [1.0, 5.0], 'max': [3.0, 5.0],
+                      'last': [3.0, 5.0], 'count': [2, 1]}
+    assert history.downsample(series_id('b', 'amazon'), 60)['count'] == []
+
+
+def test_features(history):
+    assert history.features(series_id('nothing', 'amazon'), now=NOW) is None
+    fill(history)
+    history.flush()
+    features = history.features(series_id('Smartwatch - Variante 1', 'amazon'), now=NOW)
+    assert features['last_price'] == 109
+    assert features['demand'] == 2
+    assert features['observations'] == 20
+    assert features['seasonality'] == 0  # menos de 60 dias de histórico
+    assert features['volatility_30d'] > 0
+
+
+def test_training_samples_target_the_price_a_horizon_later(history):
+    fill(history, days=10, per_day=1)
+    history.flush()
+    [(X, y, ts)] = list(history.training_samples(end=NOW, horizon=7 * DAY))
+    assert X.shape == (3, 5) and X.dtype == np.float32
+    assert X[:, 0].tolist() == [100, 101, 102]
+    assert y.tolist() == [107, 108, 109]
+    assert (X[:, 1] == 2).all() and (X[:, 2] == 0).all()
+
+
+def test_history_route(client, auth_headers, history, monkeypatch):
+    monkeypatch.setattr(app_module, 'price_history', history)
+    headers = auth_headers()
+    assert client.get('/api/prices/history?marketplace_id=amazon', headers=headers).status_code == 400
+    assert client.get('/api/prices/history?product=x&marketplace_id=mars', headers=headers).status_code == 400
+
+    history.record('Smartwatch - Variante 1', 'amazon', 50.0)
+    body = client.get('/api/prices/history?product=Smartwatch - Variante 1&marketplace_id=amazon&days=1',
+                      headers=headers).get_json()
+    assert body['history']['count'] == [1]
+    assert body['features']['last_price'] == 50
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+import autonomous_features
+from pricing_experiments import CONTROL, PricingExperiments
+
+PLANS = {'professional': {'price_monthly': 49, 'price_annual': 34,
+                          'stripe_price_id_monthly': 'price_pro_monthly',
+                          'stripe_price_id_annual': 'price_pro_annual'}}
+VARIANTS = {'professional': {'monthly': {'p39': {'price': 39, 'stripe_price_id': 'price_pro_39'}}}}
+
+
+@pytest.fixture
+def engine():
+    # Sem recálculos em background: os testes chamam _refresh_table quando precisam
+    return PricingExperiments(PLANS, VARIANTS, name='pricing-test', refresh_interval=float('inf'), draws=2000)
+
+
+def counts(engine):
+    return {(row['billing'], row['variant']): (row['starts'], row['conversions'], row['revenue_cents'])
+            for row in engine._db().execute('SELECT * FROM pricing_variants')}
+
+
+def completed(session_id, variant='p39', amount=3900, plan='professional'):
+    return {'id': session_id, 'amount_total': amount,
+            'metadata': {'plan': plan, 'billing': 'monthly', 'price_variant': variant}}
+
+
+def test_assignment_is_stable_and_covers_the_arms(engine):
+    first = engine.assign('user_1', 'professional', 'monthly')
+    assert engine.assign('user_1', 'professional', 'monthly') == first
+    seen = {engine.assign(f'user_{i}', 'professional', 'monthly')['id'] for i in range(200)}
+    assert seen == {CONTROL, 'p39'}
+    # Sem variantes em teste só existe o controlo
+    assert engine.assign('user_1', 'professional', 'annual') == {
+        'price': 34, 'stripe_price_id': 'price_pro_annual', 'id': CONTROL}
+
+
+def test_starts_are_counted_in_batches(engine):
+    engine._flusher_pid = os.getpid()  # sem thread de flush
+    for variant in (CONTROL, CONTROL, 'p39'):
+        engine.record_start('professional', 'monthly', variant)
+    assert counts(engine) == {}
+
+    assert engine.flush() == 3
+    assert engine.flush() == 0
+    engine.record_start('professional', 'monthly', 'p39')
+    engine.flush()
+    assert counts(engine) == {('monthly', CONTROL): (2, 0, 0), ('monthly', 'p39'): (2, 0, 0)}
+
+
+def test_conversions_count_once_per_session(engine):
+    assert engine.record_conversion(completed('cs_1'))
+    assert not engine.record_conversion(completed('cs_1'))
+    assert engine.record_conversion(completed('cs_2', variant=None, amount=4900))
+    assert not engine.record_conversion(completed('cs_3', plan='gold'))
+    assert counts(engine) == {('monthly', 'p39'): (0, 1, 3900), ('monthly', CONTROL): (0, 1, 4900)}
+
+
+def test_report_serves_estimates_from_the_last_refresh(engine, monkeypatch):
+    assert engine.report() == [] and engine.estimated_at is None
+
+    engine._flusher_pid = os.getpid()
+    for _ in range(100):
+        engine.record_start('professional', 'monthly', 'p39')
+        engine.record_start('professional', 'monthly', CONTROL)
+    engine.flush()
+    for i in range(30):
+        engine.record_conversion(completed(f'cs_{i}'))
+    engine._refresh_table()
+    assert engine.estimated_at is not None
+
+    def no_sampling(*args, **kwargs):
+        raise AssertionError('report() não deve amostrar no pedido')
+
+    monkeypatch.setattr(engine, '_estimates', no_sampling)
+    report = {(e['plan'], e['billing']): e for e in engine.report()}
+    monthly = report[('professional', 'monthly')]
+    assert monthly['starts'] == 200
+    assert monthly['leader'] == 'p39'
+    assert monthly['recommended_action'] == 'Promover p39 (€39)'
+    assert monthly['variants']['p39']['conversions'] == 30
+    assert report[('professional', 'annual')]['recommended_action'] == 'Sem variantes em teste'
+
+    # Os pesos da atribuição seguem a mesma estimativa
+    names, cumulative = engine._table[('professional', 'monthly')]
+    shares = dict(zip(names, [cumulative[0], cumulative[1] - cumulative[0]]))
+    assert shares['p39'] > shares[CONTROL] == engine.min_share
+
+
+def test_revenue_route_before_the_first_estimate(client, monkeypatch):
+    experiments = autonomous_features.pricing_experiments
+    monkeypatch.setattr(experiments, '_latest', None)
+    monkeypatch.setattr(experiments, 'refresh_interval', float('inf'))
+
+    pricing = client.get('/api/autonomous/revenue').get_json()['pricing_optimization']
+    assert pricing['experiments'] == []
+    assert pricing['estimated_at'] is None
+    assert pricing['optimal_price_point'] is None
+    assert pricing['recommended_action'] == 'Estimativas em cálculo'
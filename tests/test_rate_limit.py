@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from rate_limit import ANONYMOUS_LIMITS, MemoryBackend, RateLimiter, SQLiteBackend, refill
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_refill_is_capped_at_capacity():
+    assert refill(0, 100, capacity=10, rate=2, now=103) == 6
+    assert refill(5, 100, capacity=10, rate=2, now=200) == 10
+    # Relógio para trás não tira tokens
+    assert refill(5, 100, capacity=10, rate=2, now=90) == 5
+
+
+@pytest.mark.parametrize('backend', [MemoryBackend, SQLiteBackend])
+def test_anonymous_bucket_blocks_and_refills(backend):
+    limiter = RateLimiter(backend())
+    capacity, rate = ANONYMOUS_LIMITS['capacity'], ANONYMOUS_LIMITS['refill_per_second']
+    for _ in range(capacity):
+        assert limiter.hit('10.0.0.1', None, 1, now=1000).allowed
+
+    blocked = limiter.hit('10.0.0.1', None, 1, now=1000)
+    assert not blocked.allowed
+    assert blocked.remaining == 0
+    assert blocked.retry_after == int(1 / rate)
+    assert 'Retry-After' in blocked.headers()
+
+    # Outro IP tem o seu próprio bucket; o primeiro recupera com o tempo
+    assert limiter.hit('10.0.0.2', None, 1, now=1000).allowed
+    assert limiter.hit('10.0.0.1', None, 1, now=1000 + 1 / rate).allowed
+
+
+@pytest.mark.parametrize('backend', [MemoryBackend, SQLiteBackend])
+def test_plan_bucket_is_shared_by_users(backend):
+    limiter = RateLimiter(backend())
+    limits = {'capacity': 5, 'refill_per_second': 1, 'plan_capacity': 8, 'plan_refill_per_second': 1}
+    limiter.limits_for = lambda plan: limits if plan == 'tiny' else None
+
+    assert all(limiter.hit('a', 'tiny', 1, now=0).allowed for _ in range(5))
+    assert not limiter.hit('a', 'tiny', 1, now=0).allowed
+    # O bucket do plano (8) esgota antes do bucket do segundo utilizador (5)
+    assert all(limiter.hit('b', 'tiny', 1, now=0).allowed for _ in range(3))
+    result = limiter.hit('b', 'tiny', 1, now=0)
+    assert not result.allowed
+    assert result.remaining == 2
+
+
+def test_blocked_request_gets_429_with_headers(client):
+    for _ in range(ANONYMOUS_LIMITS['capacity']):
+        assert client.get('/api/marketplaces').status_code == 200
+
+    response = client.get('/api/marketplaces')
+    assert response.status_code == 429
+    assert response.headers['RateLimit-Remaining'] == '0'
+    assert 'Retry-After' in response.headers
+
+
+def test_invalid_tokens_are_charged_as_anonymous(client, app):
+    with app.app_context():
+        expired = create_access_token(identity='user1@example.com', expires_delta=timedelta(seconds=-1))
+    login = client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': 'password'},
+                        headers={'Authorization': f'Bearer {expired}'})
+    assert login.status_code == 200
+
+    for token in (expired, 'not-a-jwt'):
+        response = client.get('/api/marketplaces', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+    # Login (5) e duas pesquisas (1 + 1) saem do bucket do IP
+    assert response.headers['RateLimit-Remaining'] == str(ANONYMOUS_LIMITS['capacity'] - 7)
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(client):
+    for i in range(ANONYMOUS_LIMITS['capacity']):
+        client.get('/api/marketplaces', headers={'X-Forwarded-For': f'203.0.113.{i}'})
+
+    # Sem proxies de confiança o cabeçalho é do cliente: não cria buckets novos
+    response = client.get('/api/marketplaces', headers={'X-Forwarded-For': '198.51.100.7'})
+    assert response.status_code == 429
+
+
+def test_anonymous_buckets_use_client_ip_behind_proxy():
+    client = create_app({'TESTING': True, 'PROXY_FIX_HOPS': 1}).test_client()
+    for _ in range(ANONYMOUS_LIMITS['capacity']):
+        client.get('/api/marketplaces', headers={'X-Forwarded-For': '203.0.113.1'})
+
+    assert client.get('/api/marketplaces', headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 429
+    # Mesmo router (REMOTE_ADDR), outro cliente: bucket próprio
+    assert client.get('/api/marketplaces', headers={'X-Forwarded-For': '203.0.113.2'}).status_code == 200
+    # Só o último salto é de confiança: um X-Forwarded-For forjado pelo cliente não escapa ao limite
+    forged = client.get('/api/marketplaces', headers={'X-Forwarded-For': '198.51.100.7, 203.0.113.1'})
+    assert forged.status_code == 429
+
+
+def test_app_without_payments_does_not_import_the_payments_chain(tmp_path):
+    env = dict(os.environ, GPAS_ENABLE_PAYMENTS='0', GPAS_DATA_DIR=str(tmp_path))
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, app; print(' '.join(sorted(sys.modules)))"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout.split()
+    assert 'rate_limit' in loaded and 'plans' in loaded
+    assert not {'payments', 'webhook_queue', 'checkout_cache', 'stripe'} & set(loaded)
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+from revenue_ledger import RevenueLedger
+
+PLANS = {'professional': {'price_monthly': 49, 'price_annual': 34}}
+JAN = datetime(2026, 1, 10, tzinfo=timezone.utc).timestamp()
+FEB = datetime(2026, 2, 10, tzinfo=timezone.utc).timestamp()
+
+
+def ledger():
+    return RevenueLedger('revenue-test', plans=PLANS)
+
+
+def checkout(session_id, customer='cus_1', email=None, billing='monthly', at=JAN, **extra):
+    return {'id': session_id, 'customer': customer, 'customer_details': {'email': email} if email else None,
+            'created': at, 'amount_total': 4900,
+            'metadata': {'plan': 'professional', 'billing': billing}, **extra}
+
+
+def invoice(invoice_id, customer='cus_1', amount=4900, at=JAN):
+    return {'id': invoice_id, 'customer': customer, 'amount_paid': amount, 'status_transitions': {'paid_at': at}}
+
+
+def cancel(subscription_id, customer='cus_1', at=FEB):
+    return {'id': subscription_id, 'customer': customer, 'ended_at': at}
+
+
+def test_events_are_applied_once():
+    revenue = ledger()
+    assert revenue.record_checkout(checkout('cs_1'))
+    assert not revenue.record_checkout(checkout('cs_1'))
+    assert revenue.record_invoice(invoice('in_1'))
+    assert not revenue.record_invoice(invoice('in_1'))
+
+    summary = revenue.summary(now=JAN)
+    assert summary['mrr'] == 49 and summary['active_customers'] == 1
+    assert summary['total_revenue'] == 49
+    assert summary['streams']['subscriptions'] == 49
+
+
+def test_cancellation_churns_and_invoice_reactivates():
+    revenue = ledger()
+    revenue.record_checkout(checkout('cs_1'))
+    revenue.record_checkout(checkout('cs_2', customer='cus_2'))
+    assert revenue.record_cancellation(cancel('sub_1'))
+    assert not revenue.record_cancellation(cancel('sub_1'))
+
+    summary = revenue.summary(now=FEB)
+    assert summary['mrr'] == 49 and summary['active_customers'] == 1
+    assert summary['churned_customers'] == 1
+    assert summary['current_month']['customer_churn_rate'] == 0.5
+    assert summary['current_month']['revenue_churn_rate'] == 0.5
+
+    revenue.record_invoice(invoice('in_1', at=FEB))
+    assert revenue.summary(now=FEB)['mrr'] == 98
+
+
+def test_subscription_without_customer_is_not_counted():
+    revenue = ledger()
+    assert revenue.record_checkout(checkout('cs_1', customer=None))
+    assert revenue.record_cancellation(cancel('sub_1', customer=None))
+    summary = revenue.summary(now=FEB)
+    # Nada para desfazer no cancelamento: os totais não derivam
+    assert summary['mrr'] == 0 and summary['active_customers'] == 0 and summary['churned_customers'] == 0
+    assert [month['new_customers'] for month in summary['history']] == [0, 0]
+
+
+def test_checkout_without_customer_id_falls_back_to_email():
+    revenue = ledger()
+    revenue.record_checkout(checkout('cs_1', customer=None, email='ana@example.com'))
+    revenue.record_checkout(checkout('cs_2', customer=None, email='ana@example.com'))
+    summary = revenue.summary(now=JAN)
+    assert summary['mrr'] == 49 and summary['active_customers'] == 1
+
+
+def test_variant_and_one_off_amounts():
+    revenue = ledger()
+    annual = checkout('cs_1', billing='annual', amount_total=36000)
+    annual['metadata']['price_variant'] = 'p30'
+    revenue.record_checkout(annual)
+    assert revenue.summary(now=JAN)['mrr'] == 30
+
+    revenue.record_checkout(checkout('cs_2', customer='cus_2', mode='payment', amount_total=15000,
+                                     metadata={'stream': 'data_insights'}))
+    summary = revenue.summary(now=JAN)
+    assert summary['mrr'] == 30 and summary['active_customers'] == 1
+    assert summary['streams']['data_insights'] == 150
+    assert summary['current_month']['revenue'] == 150
@@ -0,0 +1,122 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import CronSchedule, FileLease, Scheduler
+
+
+def at(text):
+    return datetime.fromisoformat(text)
+
+
+def inline(scheduler):
+    """Agendador que corre as tarefas na thread do teste"""
+    scheduler.executor = SimpleNamespace(submit=lambda func, *args: func(*args))
+    return scheduler
+
+
+@pytest.mark.parametrize('expression, after, expected', [
+    ('*/15 * * * *', '2026-01-01T10:07:30', '2026-01-01T10:15:00'),
+    ('30 3 * * *', '2026-01-01T03:30:00', '2026-01-02T03:30:00'),
+    ('0 9 * * 1-5', '2026-01-02T12:00:00', '2026-01-05T09:00:00'),  # sexta -> segunda
+    ('0 0 * * 7', '2026-01-01T00:00:00', '2026-01-04T00:00:00'),  # 7 também é domingo
+    ('0 0 1 * 1', '2026-01-02T00:00:00', '2026-01-05T00:00:00'),  # dia 1 ou segunda-feira
+    ('0 0 */2 * 1', '2026-01-06T00:00:00', '2026-01-19T00:00:00'),  # segunda-feira em dia ímpar
+    ('0 0 1 * */2', '2026-01-02T00:00:00', '2026-02-01T00:00:00'),  # dia 1 que seja dia-da-semana par
+    ('0 0 29 2 *', '2026-03-01T00:00:00', '2028-02-29T00:00:00'),
+])
+def test_next_after(expression, after, expected):
+    assert CronSchedule(expression).next_after(at(after)) == at(expected)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '5-1 * * * *', '*/0 * * * *', '0 0 31 2 x'])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_impossible_date_never_occurs():
+    with pytest.raises(ValueError):
+        CronSchedule('0 0 31 2 *').next_after(at('2026-01-01T00:00:00'))
+
+
+def test_file_lease_has_a_single_holder(tmp_path):
+    path = str(tmp_path / 'scheduler.lock')
+    first, second = FileLease(path), FileLease(path)
+    assert first.try_acquire() and first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_duplicate_job_names_are_rejected():
+    scheduler = Scheduler()
+    scheduler.add_job('daily', '0 0 * * *', lambda: None)
+    with pytest.raises(ValueError):
+        scheduler.job('daily', '0 1 * * *')(lambda: None)
+
+
+def test_each_slot_is_claimed_once_across_leaders():
+    runs = []
+    old, new = inline(Scheduler()), inline(Scheduler())
+    for scheduler in (old, new):
+        scheduler.add_job('minute', '* * * * *', lambda: runs.append(1))
+
+    old._tick(at('2026-01-01T12:00:30'))
+    assert runs == []
+    old._tick(at('2026-01-01T12:01:00'))
+    old._tick(at('2026-01-01T12:01:10'))
+    # Novo líder a meio do minuto: o slot das 12:01 já foi reclamado
+    new._tick(at('2026-01-01T12:01:20'))
+    assert runs == [1]
+    new._tick(at('2026-01-01T12:02:00'))
+    assert runs == [1, 1]
+
+    assert [run['scheduled_for'] for run in new.history('minute')] == ['2026-01-01T12:02:00', '2026-01-01T12:01:00']
+    assert not old._claim(old.jobs['minute'], at('2026-01-01T12:01:00'))
+
+
+def test_missed_slot_runs_once_after_a_gap():
+    runs = []
+    scheduler = inline(Scheduler())
+    scheduler.add_job('hourly', '0 * * * *', lambda: runs.append(1))
+    scheduler._claim(scheduler.jobs['hourly'], at('2026-01-01T08:00:00'))
+
+    # Sem líder entre as 08:00 e as 11:30: só o slot das 09:00 é recuperado
+    scheduler._tick(at('2026-01-01T11:30:00'))
+    assert runs == [1]
+    assert scheduler.history()[0]['scheduled_for'] == '2026-01-01T09:00:00'
+    scheduler._tick(at('2026-01-01T11:45:00'))
+    assert runs == [1]
+
+
+def test_failures_and_overlaps_are_recorded():
+    def fail():
+        raise RuntimeError('sem rede')
+
+    scheduler = inline(Scheduler(history_size=2))
+    scheduler.add_job('fails', '* * * * *', fail)
+    job = scheduler.jobs['fails']
+    scheduler._run(job, at('2026-01-01T00:01:00'))
+    [failed] = scheduler.history('fails')
+    assert (failed['status'], failed['error']) == ('error', 'sem rede')
+    assert not job.running
+
+    job.running = True
+    scheduler._run(job, at('2026-01-01T00:02:00'))
+    scheduler._run(job, at('2026-01-01T00:03:00'))
+
+    # Só as últimas history_size execuções ficam guardadas
+    history = scheduler.history('fails')
+    assert [run['status'] for run in history] == ['skipped', 'skipped']
+    assert history[0]['error'] == 'Execução anterior ainda a decorrer'
+    assert scheduler.history('other') == []
+
+
+def test_jobs_route(client):
+    body = client.get('/api/autonomous/jobs?limit=5').get_json()
+    names = {job['name'] for job in body['scheduler']['jobs']}
+    assert {'autonomous_tasks', 'dashboard_snapshot', 'rate_limit_purge'} <= names
+    assert body['history'] == []
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+import requests
+
+import viral_marketing
+from content_store import ContentStore
+from http_client import HTTPClient
+from rate_limit import MemoryBackend
+from social_dispatch import PLATFORMS, SocialDispatcher, post_request
+from standins.social_standin import SocialStandin
+
+TOKENS = {platform: f'token-{platform}' for platform in PLATFORMS}
+
+
+@pytest.fixture
+def store():
+    return ContentStore()
+
+
+@pytest.fixture
+def standin():
+    standin = SocialStandin().start()
+    yield standin
+    standin.stop()
+
+
+@pytest.fixture
+def dispatcher(store, standin):
+    dispatchers = []
+
+    def make(**options):
+        options = dict({'store': store, 'client': HTTPClient(retries=0), 'limiter': MemoryBackend(),
+                        'tokens': TOKENS, 'base_url': standin.url}, **options)
+        dispatchers.append(SocialDispatcher(**options))
+        return dispatchers[-1]
+    yield make
+    for dispatcher in dispatchers:
+        if dispatcher.executor is not None:
+            dispatcher.executor.shutdown()
+
+
+def schedule(store, *contents, platform='twitter', at=None):
+    at = time.time() - 1 if at is None else at
+    return [item['content_hash'] for item in store.add_many(
+        [{'kind': 'social', 'platform': platform, 'content': content, 'scheduled_at': at} for content in contents])]
+
+
+def statuses(store):
+    return {item['content']: item['status'] for item in store._db().execute('SELECT * FROM content_items')}
+
+
+def test_request_bodies_per_platform():
+    assert post_request('twitter', 'Olá') == {'json': {'text': 'Olá'}}
+    linkedin = post_request('linkedin', 'Olá')['json']
+    assert linkedin['specificContent']['com.linkedin.ugc.ShareContent']['shareCommentary'] == {'text': 'Olá'}
+    reddit = post_request('reddit', 'Título\ncorpo')['data']
+    assert (reddit['title'], reddit['text'], reddit['kind']) == ('Título', 'Título\ncorpo', 'self')
+
+
+def test_endpoints_and_enabled_platforms(dispatcher):
+    direct = dispatcher(tokens={'twitter': 't'}, base_url=None)
+    assert direct.endpoint('twitter') == PLATFORMS['twitter']['url']
+    assert direct.enabled('twitter') and not direct.enabled('reddit')
+    assert dispatcher(base_url='http://gateway/').endpoint('linkedin') == 'http://gateway/v2/ugcPosts'
+
+
+def test_due_posts_are_published_once(store, standin, dispatcher):
+    schedule(store, 'a', 'b')
+    schedule(store, 'c', platform='linkedin')
+    schedule(store, 'd', platform='reddit')
+    schedule(store, 'later', at=time.time() + 3600)
+
+    stats = dispatcher().run(duration=0.2)
+    assert standin.posts == {'twitter': 2, 'linkedin': 1, 'reddit': 1}
+    assert standin.duplicates == 0
+    assert stats['last_run']['sent'] == 4 and stats['platforms']['twitter']['sent'] == 2
+    assert statuses(store) == {'a': 'posted', 'b': 'posted', 'c': 'posted', 'd': 'posted', 'later': 'scheduled'}
+
+    dispatcher().run(duration=0.1)
+    assert standin.calls == 4
+
+
+def test_client_errors_are_skipped(store, standin, dispatcher):
+    schedule(store, 'a')
+    # Sem token: o stand-in responde 401, que não vale a pena repetir
+    stats = dispatcher(tokens={}).run(duration=0.1)
+    assert stats['platforms']['twitter']['skipped'] == 1
+    assert statuses(store) == {'a': 'skipped'}
+
+
+def test_server_errors_are_retried_with_backoff_then_skipped(store, standin, dispatcher):
+    standin.error_rate = 1.0
+    [key] = schedule(store, 'a')
+    patient = dispatcher(max_attempts=2, retry_base=600)
+    started = time.time()
+    stats = patient.run(duration=0.1)
+    assert stats['platforms']['twitter']['retried'] == 1
+    [item] = store.scheduled()
+    assert item['scheduled_at'] >= started + 600 * 0.8 and patient.attempts == {key: 1}
+
+    store.reschedule([key], time.time() - 1)
+    stats = patient.run(duration=0.1)
+    assert stats['platforms']['twitter']['skipped'] == 1
+    assert statuses(store) == {'a': 'skipped'} and patient.attempts == {}
+
+
+def test_network_errors_are_temporary(store, dispatcher):
+    class Unreachable:
+        def post(self, url, **kwargs):
+            raise requests.exceptions.ConnectionError('sem rede')
+
+    schedule(store, 'a')
+    stats = dispatcher(client=Unreachable(), retry_base=600).run(duration=0.1)
+    assert stats['platforms']['twitter']['retried'] == 1
+    assert statuses(store) == {'a': 'scheduled'}
+
+
+def test_retry_after_requeues_within_the_run(store, standin, dispatcher):
+    standin.quota_per_second = 1
+    schedule(store, 'a', 'b')
+    stats = dispatcher().run(duration=2.5)
+    assert standin.throttled >= 1 and stats['platforms']['twitter']['retried'] >= 1
+    assert standin.posts['twitter'] == 2
+    assert statuses(store) == {'a': 'posted', 'b': 'posted'}
+
+
+def test_platform_quota_throttles_locally(store, standin, dispatcher):
+    platforms = dict(PLATFORMS, twitter=dict(PLATFORMS['twitter'], capacity=2, window=3600))
+    schedule(store, 'a', 'b', 'c')
+    stats = dispatcher(platforms=platforms).run(duration=0.2)
+    assert standin.posts['twitter'] == 2
+    assert stats['platforms']['twitter']['throttled'] >= 1 and stats['platforms']['twitter']['queued'] == 1
+    assert sorted(statuses(store).values()) == ['posted', 'posted', 'scheduled']
+
+
+def test_dispatch_status_route(client, auth_headers, store, dispatcher, monkeypatch):
+    assert client.get('/api/marketing/dispatch').status_code == 401
+
+    monkeypatch.setattr(viral_marketing, 'content_store', store)
+    monkeypatch.setattr(viral_marketing, 'social_dispatcher', dispatcher())
+    viral_marketing.social_dispatcher.run(duration=0)
+    schedule(store, 'a')
+    body = client.get('/api/marketing/dispatch', headers=auth_headers()).get_json()
+    assert body['due'] == 1 and body['content']['items'] == 1
+    assert body['dispatch']['platforms']['twitter']['enabled']
+    assert body['dispatch']['last_run']['sent'] == 0
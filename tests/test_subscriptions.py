@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+import pytest
+
+from subscriptions import SubscriptionStore
+
+
+def item(kind, email=None, customer_id=None, plan='professional', billing='monthly'):
+    return {'change': {'kind': kind, 'email': email, 'customer_id': customer_id, 'plan': plan,
+                       'billing': billing, 'subscription_id': None},
+            'done': threading.Event(), 'error': None, 'email': None}
+
+
+def test_activate_renew_cancel():
+    store = SubscriptionStore(max_delay=0)
+    assert store.activate('a@example.com', 'cus_a', 'professional', 'monthly') == 'a@example.com'
+    assert store.get('a@example.com')['plan'] == 'professional'
+
+    store.cancel('cus_a')
+    state = store.get('a@example.com')
+    assert (state['plan'], state['status']) == ('starter', 'cancelled')
+
+    store.renew('cus_a')
+    assert store.get('a@example.com')['status'] == 'active'
+    assert store.email_for_customer('cus_a') == 'a@example.com'
+
+
+def test_unknown_customer_is_ignored():
+    store = SubscriptionStore(max_delay=0)
+    assert store.renew('cus_unknown') is None
+
+
+def test_conflicting_activation_fails_only_its_item():
+    store = SubscriptionStore()
+    store._apply_batch([item('activate', 'owner@example.com', 'cus_taken')])
+
+    # customer_id já associado a outro email: viola UNIQUE(customer_id)
+    batch = [item('activate', f'user{i}@example.com', f'cus_{i}') for i in range(5)]
+    batch.insert(2, item('activate', 'other@example.com', 'cus_taken'))
+    changed = store._apply_batch(batch)
+
+    assert isinstance(batch[2]['error'], sqlite3.IntegrityError)
+    assert set(changed) == {f'user{i}@example.com' for i in range(5)}
+    for i in range(5):
+        assert batch[i if i < 2 else i + 1]['error'] is None
+        assert store.get(f'user{i}@example.com')['status'] == 'active'
+    assert store.get('other@example.com') is None
+    assert store.email_for_customer('cus_taken') == 'owner@example.com'
+
+
+def test_conflicting_activation_raises_to_caller():
+    store = SubscriptionStore(max_delay=0)
+    store.activate('owner@example.com', 'cus_taken', 'starter')
+    with pytest.raises(sqlite3.IntegrityError):
+        store.activate('other@example.com', 'cus_taken', 'starter')
+    assert store.activate('next@example.com', 'cus_next', 'starter') == 'next@example.com'
+
+
+def test_invalidations_reach_other_processes():
+    writer, reader = SubscriptionStore(max_delay=0), SubscriptionStore()
+    seen = {}
+    reader.on_change(lambda email, state: seen.__setitem__(email, state['plan']))
+    reader.sync_all()
+
+    writer.activate('a@example.com', 'cus_a', 'enterprise')
+    assert reader.poll() == 1
+    assert seen == {'a@example.com': 'enterprise'}
+    assert reader.poll() == 0
+
+
+def test_iter_subscribers_pages_in_email_order():
+    store = SubscriptionStore()
+    store._apply_batch([item('activate', f'u{i:03d}@example.com', f'cus_{i}',
+                             plan='starter' if i % 2 else 'professional') for i in range(25)])
+    emails = [row['email'] for row in store.iter_subscribers(page_size=7)]
+    assert emails == sorted(emails) and len(emails) == 25
+    assert len(list(store.iter_subscribers(plans=['starter'], page_size=4))) == 12
@@ -0,0 +1,69 @@
+import pytest
+
+import payments
+from checkout_cache import CheckoutSessionCache, session_snapshot
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CheckoutSessionCache()
+    monkeypatch.setattr(payments, 'checkout_cache', cache)
+    return cache
+
+
+def session(session_id='cs_1', **fields):
+    return {'id': session_id, 'amount_total': 4900, 'currency': 'eur', 'customer_email': None,
+            'customer_details': {'email': 'ana@example.com'}, 'metadata': {'plan': 'starter'},
+            'line_items': ['not kept'], **fields}
+
+
+def test_snapshot_keeps_only_the_page_fields():
+    snapshot = session_snapshot(session())
+    assert 'line_items' not in snapshot and 'customer_details' not in snapshot
+    assert snapshot['customer_email'] == 'ana@example.com'
+    assert session_snapshot(session(metadata=None))['metadata'] == {}
+
+
+def test_sessions_are_shared_between_workers():
+    writer, reader = CheckoutSessionCache(), CheckoutSessionCache(max_local=1)
+    writer.put(session('cs_1'))
+    writer.put(session('cs_2'))
+    assert reader.get('cs_1')['amount_total'] == 4900
+    assert reader.get('cs_2')['id'] == 'cs_2'
+    assert list(reader.local) == ['cs_2']
+    assert reader.get('cs_unknown') is None
+
+
+def test_expired_sessions_are_not_served_and_are_purged():
+    cache = CheckoutSessionCache(ttl=-1)
+    cache.put(session('cs_1'))
+    assert cache.get('cs_1') is None
+    cache.purge()
+    assert cache._db().execute('SELECT COUNT(*) FROM checkout_sessions').fetchone()[0] == 0
+
+
+def test_success_page_requires_a_session(client, stripe_api):
+    assert client.get('/success').status_code == 400
+    assert client.get('/success?session_id=../../customers').status_code == 400
+    assert stripe_api.calls['retrieve'] == 0
+
+
+def test_success_page_serves_cached_sessions_without_stripe(client, stripe_api, cache):
+    cache.put(session('cs_paid', amount_total=1900))
+    response = client.get('/success?session_id=cs_paid')
+    assert response.status_code == 200
+    assert "'value': 19.0" in response.get_data(as_text=True)
+    assert stripe_api.calls['retrieve'] == 0
+
+
+def test_success_page_fetches_and_caches_missing_sessions(client, stripe_api, cache):
+    created = stripe_api.create_session({'metadata[plan]': 'starter'})
+    assert client.get(f"/success?session_id={created['id']}").status_code == 200
+    assert client.get(f"/success?session_id={created['id']}").status_code == 200
+    assert stripe_api.calls['retrieve'] == 1
+    assert cache.get(created['id'])['metadata'] == {'plan': 'starter'}
+
+
+def test_success_page_with_unknown_session(client, stripe_api, cache):
+    assert client.get('/success?session_id=cs_missing').status_code == 500
+    assert cache.get('cs_missing') is None
@@ -0,0 +1,119 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import training
+from model_store import ModelStore
+from price_history import DAY, PriceHistory
+
+OPTIONS = {'n_estimators': 6, 'new_trees': 2, 'min_rows': 100, 'n_jobs': 1, 'chunk_rows': 500}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(root=str(tmp_path / 'model'))
+
+
+@pytest.fixture
+def history(tmp_path):
+    """30 séries com uma observação por dia nos últimos 60 dias"""
+    history = PriceHistory(root=str(tmp_path / 'price_history'))
+    history._flusher_pid = os.getpid()
+    rng = np.random.default_rng(0)
+    now = time.time()
+    for product in range(30):
+        price = rng.uniform(10, 500)
+        for day in range(60, 0, -1):
+            price *= 1 + rng.normal(0.002, 0.02)
+            history.record(f'produto {product}', 'amazon', price, category=product % 10,
+                           marketplace_index=0, ts=now - day * DAY)
+    history.flush()
+    return history
+
+
+def test_dataset_and_temporal_split(history):
+    X, y, ts = training.load_dataset(history, None, time.time(), 7 * DAY, chunk_rows=100)
+    assert X.dtype == np.float32 and X.shape == (30 * 53, 5)
+    assert len(y) == len(ts) == len(X)
+
+    (X_train, y_train), (X_holdout, y_holdout) = training.temporal_split(X, y, ts, 0.2)
+    recent = ts >= np.quantile(ts, 0.8)
+    np.testing.assert_array_equal(y_holdout, y[recent])
+    np.testing.assert_array_equal(y_train, y[~recent])
+
+
+def test_too_little_history_is_skipped(store, tmp_path):
+    empty = PriceHistory(root=str(tmp_path / 'empty'))
+    report = training.run_training(OPTIONS, store=store, history=empty)
+    assert report['status'] == 'skipped' and report['rows'] == 0
+    assert store.current_version() is None
+    assert training.runs() == [report]
+    assert training.last_published() is None
+
+
+def test_window_training_publishes_a_model(store, history):
+    report = training.run_training(OPTIONS, store=store, history=history)
+    assert report['status'] == 'published' and report['mode'] == 'window'
+    assert report['baseline'] is None
+    assert store.current_version() == report['version']
+    assert store.load().meta['n_trees'] == 6
+    assert report['train_rows'] + report['holdout_rows'] == report['rows']
+    assert training.last_published() == report
+
+
+def test_warm_start_adds_trees_to_the_current_model(store, history, monkeypatch):
+    first = training.run_training(OPTIONS, store=store, history=history)
+    # Como se o modelo publicado tivesse sido treinado há 20 dias
+    previous = dict(first, data_end=first['data_end'] - 20 * DAY)
+    monkeypatch.setattr(training, 'last_published', lambda: previous)
+    report = training.run_training(dict(OPTIONS, mode='warm'), store=store, history=history)
+
+    assert report['mode'] == 'warm' and report['base_version'] == first['version']
+    # Só os exemplos que o modelo publicado ainda não viu
+    assert report['data_start'] == previous['data_end'] - 7 * DAY
+    assert 0 < report['rows'] < first['rows']
+    assert report['status'] in ('published', 'rejected')
+    assert store.load(report['version']).meta['n_trees'] == 6
+
+
+def test_worse_candidate_is_rejected(store, history):
+    first = training.run_training(OPTIONS, store=store, history=history)
+    report = training.run_training(dict(OPTIONS, tolerance=-1), store=store, history=history)
+    assert report['status'] == 'rejected'
+    assert store.current_version() == first['version']
+    assert training.last_published() == first
+    assert [run['status'] for run in training.runs()] == ['rejected', 'published']
+
+
+def test_parallel_fit_gives_the_same_model(tmp_path, history):
+    serial = training.run_training(OPTIONS, store=ModelStore(str(tmp_path / 'a')), history=history)
+    parallel = training.run_training(dict(OPTIONS, n_jobs=2), store=ModelStore(str(tmp_path / 'b')),
+                                     history=history)
+    assert parallel['n_jobs'] == 2
+    assert parallel['candidate'] == serial['candidate']
+
+
+def test_training_route(client, auth_headers, store, history, monkeypatch):
+    assert client.get('/api/system/training').status_code == 401
+
+    monkeypatch.setattr(training, 'ModelStore', lambda: store)
+    report = training.run_training(OPTIONS, history=history)
+    monkeypatch.setattr('app.ModelStore', lambda: store)
+    body = client.get('/api/system/training?limit=1', headers=auth_headers()).get_json()
+    assert body == {'active_version': report['version'], 'runs': [report]}
+
+
+def test_training_runs_in_a_separate_process(tmp_path, monkeypatch):
+    monkeypatch.setenv('GPAS_DATA_DIR', str(tmp_path))
+    report = training.run_in_subprocess({'min_rows': 10 ** 9}, timeout=120)
+    assert report['status'] == 'skipped'
+    assert training.runs() == [report]
+
+
+def test_chunked_evaluation_matches_a_single_pass(store, history):
+    report = training.run_training(OPTIONS, store=store, history=history)
+    X, y, _ = training.load_dataset(history, None, report['data_end'], 7 * DAY)
+    forest = store.load()
+    assert training.evaluate(forest, X, y, chunk_rows=7) == pytest.approx(training.evaluate(forest, X, y))
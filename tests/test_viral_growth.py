@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from autonomous_features import ViralGrowthEngine
+
+VIRAL = '/api/autonomous/viral'
+
+
+def test_simulation_is_reproducible_and_bounded():
+    engine = ViralGrowthEngine()
+    result = engine.simulate_growth(100, months=120, scenarios=500, seed=7, market_size=10000)
+    assert result == engine.simulate_growth(100, months=120, scenarios=500, seed=7, market_size=10000)
+
+    users = result['total_users']
+    assert len(users['p50']) == 120
+    assert max(users['p95']) <= 10000
+    assert min(users['p5']) >= 100
+    for month in range(120):
+        assert users['p5'][month] <= users['p50'][month] <= users['p95'][month]
+    cumulative = result['cumulative_revenue']['p50']
+    assert cumulative == sorted(cumulative)
+
+
+def test_simulation_starting_at_market_size_stays_there():
+    result = ViralGrowthEngine().simulate_growth(1000, months=24, scenarios=200, seed=1, market_size=1000)
+    assert set(result['total_users']['p5']) == {1000}
+    assert set(result['total_users']['p95']) == {1000}
+
+
+@pytest.mark.parametrize('users', [0, 1001])
+def test_simulation_rejects_users_outside_market(users):
+    with pytest.raises(ValueError):
+        ViralGrowthEngine().simulate_growth(users, months=12, scenarios=10, market_size=1000)
+
+
+def test_legacy_projection_keeps_running_total():
+    projections = ViralGrowthEngine().calculate_viral_growth(100, months=24)
+    assert len(projections) == 24
+    total = 0
+    for month in projections:
+        total += month['monthly_revenue']
+        assert month['cumulative_revenue'] == pytest.approx(total)
+
+
+def test_route_returns_simulation(client):
+    response = client.get(f'{VIRAL}?months=12&scenarios=100&seed=3')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['simulation']['seed'] == 3
+    assert len(body['growth_projections']) == 12
+    assert 'X-RateLimit-Limit' in response.headers or 'RateLimit-Limit' in response.headers
+
+
+@pytest.mark.parametrize('query', [
+    'users=10000000', 'users=0', 'months=0', 'scenarios=abc', 'seed=-1',
+    'months=120', 'scenarios=20000'
+])
+def test_route_rejects_bad_or_oversized_anonymous_requests(client, query):
+    assert client.get(f'{VIRAL}?{query}').status_code == 400
+
+
+def test_authenticated_callers_get_larger_simulations(client, auth_headers):
+    response = client.get(f'{VIRAL}?months=120&scenarios=50', headers=auth_headers())
+    assert response.status_code == 200
+    assert client.get(f'{VIRAL}?months=121', headers=auth_headers()).status_code == 400
+
+
+def test_invalid_tokens_get_anonymous_limits(client, app):
+    with app.app_context():
+        expired = create_access_token(identity='user1@example.com', expires_delta=timedelta(seconds=-1))
+    for token in (expired, 'not-a-jwt'):
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get(f'{VIRAL}?months=12&scenarios=100', headers=headers).status_code == 200
+        assert client.get(f'{VIRAL}?months=120&scenarios=50', headers=headers).status_code == 400
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import payments
+from standins.stripe_standin import make_event, signed_request
+from webhook_queue import WebhookQueue, event_customer
+
+WEBHOOK = '/api/payments/webhook'
+SECRET = 'whsec_test'
+
+
+def event(event_id, customer='cus_A', event_type='invoice.payment_succeeded'):
+    return make_event(event_type, {'id': f'obj_{event_id}', 'customer': customer}, event_id=event_id)
+
+
+def enqueue(queue, *events):
+    return [queue.enqueue(e, json.dumps(e)) for e in events]
+
+
+def retry_now(queue):
+    queue._db().execute("UPDATE webhook_events SET next_attempt_at = 0 WHERE status = 'pending'")
+
+
+def test_customer_key():
+    assert event_customer(event('e1', customer='cus_1')) == 'cus_1'
+    assert event_customer(event('e2', customer={'id': 'cus_2'})) == 'cus_2'
+    checkout = make_event('checkout.session.completed', {'customer_details': {'email': 'a@b.pt'}}, event_id='e3')
+    assert event_customer(checkout) == 'a@b.pt'
+    assert event_customer(make_event('ping', {}, event_id='e4')) == 'e4'
+
+
+def test_duplicate_deliveries_are_ignored():
+    queue = WebhookQueue({})
+    assert enqueue(queue, event('e1'), event('e1')) == [True, False]
+    assert queue.stats() == {'events': {'pending': 1}, 'dead_letters': 0}
+
+
+def test_events_of_one_customer_are_processed_in_order():
+    queue = WebhookQueue({})
+    enqueue(queue, event('a1', 'cus_A'), event('a2', 'cus_A'), event('b1', 'cus_B'))
+
+    first = queue.claim()
+    # a2 espera que a1 termine; outro cliente não fica bloqueado
+    assert [first['event_id'], queue.claim()['event_id'], queue.claim()] == ['a1', 'b1', None]
+    queue._db().execute("UPDATE webhook_events SET status = 'done' WHERE seq = ?", (first['seq'],))
+    assert queue.claim()['event_id'] == 'a2'
+
+
+def test_expired_lease_is_reclaimed():
+    queue = WebhookQueue({}, lease_seconds=30)
+    enqueue(queue, event('e1'))
+    job = queue.claim(now=1e12)
+    assert queue.claim(now=1e12 + 10) is None
+    again = queue.claim(now=1e12 + 31)
+    assert (again['event_id'], again['attempts']) == ('e1', job['attempts'] + 1)
+
+
+def test_failures_retry_with_backoff_then_go_to_dead_letters():
+    calls = []
+
+    def handler(obj):
+        calls.append(obj['id'])
+        raise RuntimeError('base de dados indisponível')
+
+    queue = WebhookQueue({'invoice.payment_succeeded': handler}, max_attempts=2)
+    enqueue(queue, event('e1'), event('e2'))
+
+    assert queue.process_one()
+    row = queue._db().execute("SELECT * FROM webhook_events WHERE event_id = 'e1'").fetchone()
+    assert row['status'] == 'pending' and row['last_error'] == 'RuntimeError: base de dados indisponível'
+    # Em backoff, e e2 (mesmo cliente) continua atrás dele
+    assert not queue.process_one()
+
+    retry_now(queue)
+    assert queue.process_one()
+    assert queue.stats() == {'events': {'dead': 1, 'pending': 1}, 'dead_letters': 1}
+    # Um evento morto já não bloqueia o cliente
+    assert queue.process_one()
+    assert calls == ['obj_e1', 'obj_e1', 'obj_e2']
+
+
+def test_dead_letter_replay():
+    outcomes = iter([RuntimeError('falha'), None])
+
+    def handler(obj):
+        error = next(outcomes)
+        if error:
+            raise error
+
+    queue = WebhookQueue({'invoice.payment_succeeded': handler}, max_attempts=1)
+    enqueue(queue, event('e1'))
+    queue.process_one()
+    assert queue.stats()['dead_letters'] == 1
+
+    assert queue.replay_dead_letter('e1')
+    assert not queue.replay_dead_letter('e1')
+    assert queue.process_one()
+    assert queue.stats() == {'events': {'done': 1}, 'dead_letters': 0}
+
+
+def test_unhandled_types_are_acknowledged_and_purged():
+    queue = WebhookQueue({})
+    enqueue(queue, event('e1', event_type='customer.created'))
+    assert queue.process_one()
+    queue.purge(retention_seconds=3600)
+    assert queue.stats()['events'] == {'done': 1}
+    queue.purge(retention_seconds=-1)
+    assert queue.stats()['events'] == {}
+
+
+@pytest.fixture
+def webhook_secret(monkeypatch):
+    monkeypatch.setenv('STRIPE_WEBHOOK_SECRET', SECRET)
+    monkeypatch.setattr(payments, 'webhook_queue', WebhookQueue(payments.WEBHOOK_HANDLERS))
+    return SECRET
+
+
+def test_webhook_route_queues_signed_events_once(client, webhook_secret):
+    payload, headers = signed_request(event('evt_1'), webhook_secret)
+    assert client.post(WEBHOOK, data=payload, headers=headers).get_json() == {'status': 'success', 'duplicate': False}
+    assert client.post(WEBHOOK, data=payload, headers=headers).get_json()['duplicate'] is True
+    assert payments.webhook_queue.stats()['events'] == {'pending': 1}
+
+
+def test_webhook_route_rejects_bad_deliveries(client, webhook_secret):
+    payload, headers = signed_request(event('evt_1'), 'whsec_other')
+    assert client.post(WEBHOOK, data=payload, headers=headers).status_code == 400
+
+    garbage = b'not json'
+    _, headers = signed_request(event('evt_2'), webhook_secret)
+    assert client.post(WEBHOOK, data=garbage, headers=headers).status_code == 400
+    assert payments.webhook_queue.stats()['events'] == {}
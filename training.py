@@ -0,0 +1,240 @@
+# Pipeline de re-treino do modelo de preços a partir do histórico real
+# Corre num processo separado (python -m training), treina com os dados da janela
+# recente ou acrescenta árvores ao modelo atual (warm start), valida o candidato
+# num holdout temporal e só então o publica; os workers trocam de versão sozinhos.
+#
+# Uso:
+#   python -m training --mode window --window-days 90
+#   python -m training --mode warm --new-trees 20
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from model_store import ModelStore
+from scheduler import scheduler
+from storage import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS training_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    report TEXT NOT NULL
+);
+"""
+
+DAY = 86400
+
+DEFAULTS = {
+    'mode': os.environ.get('GPAS_TRAIN_MODE', 'window'),
+    'window_days': float(os.environ.get('GPAS_TRAIN_WINDOW_DAYS', 90)),
+    'horizon_days': float(os.environ.get('GPAS_TRAIN_HORIZON_DAYS', 7)),
+    'n_estimators': int(os.environ.get('GPAS_TRAIN_TREES', 100)),
+    'new_trees': int(os.environ.get('GPAS_TRAIN_NEW_TREES', 20)),
+    'holdout_fraction': 0.2,
+    'min_rows': int(os.environ.get('GPAS_TRAIN_MIN_ROWS', 1000)),
+    # -1 usa todos os cores (o processo de treino corre com prioridade baixa)
+    'n_jobs': int(os.environ.get('GPAS_TRAIN_JOBS', -1)),
+    'chunk_rows': int(os.environ.get('GPAS_TRAIN_CHUNK_ROWS', 100_000)),
+    # O candidato pode ser até 2% pior que o modelo atual (ruído do holdout)
+    'tolerance': 0.02
+}
+
+
+def _db():
+    return connect('training', SCHEMA)
+
+
+def peak_rss_mb():
+    """Pico de memória residente deste processo (ru_maxrss vem em KB no Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_dataset(history, start, end, horizon, chunk_rows=100_000):
+    """Lê o histórico em blocos para um único array float32 pré-alocado
+
+    A capacidade é o total de linhas gravadas (limite superior dos exemplos);
+    as páginas nunca escritas não chegam a ocupar memória.
+    """
+    import numpy as np
+
+    capacity = history.stats()['rows']
+    X = np.empty((capacity, 5), dtype=np.float32)
+    y = np.empty(capacity, dtype=np.float64)
+    ts = np.empty(capacity, dtype=np.float64)
+    rows = 0
+    for X_chunk, y_chunk, ts_chunk in history.training_samples(start, end, horizon, chunk_rows):
+        n = len(y_chunk)
+        X[rows:rows + n] = X_chunk
+        y[rows:rows + n] = y_chunk
+        ts[rows:rows + n] = ts_chunk
+        rows += n
+    return X[:rows], y[:rows], ts[:rows]
+
+
+def temporal_split(X, y, ts, holdout_fraction):
+    """Holdout com os exemplos mais recentes (o modelo prevê sempre o futuro)"""
+    import numpy as np
+
+    cutoff = np.quantile(ts, 1 - holdout_fraction)
+    train = ts < cutoff
+    return (X[train], y[train]), (X[~train], y[~train])
+
+
+def evaluate(forest, X, y, chunk_rows=50_000):
+    """MAE, precisão (100 - MAPE) e R² de uma floresta publicada"""
+    import numpy as np
+
+    # predict percorre todas as árvores de uma vez: em blocos para limitar a memória
+    predicted = np.concatenate([forest.predict(X[i:i + chunk_rows]) for i in range(0, len(X), chunk_rows)])
+    errors = np.abs(predicted - y)
+    total = ((y - y.mean()) ** 2).sum()
+    return {
+        'mae': float(errors.mean()),
+        'accuracy': float(max(0.0, 100 - (errors / np.maximum(np.abs(y), 1e-9)).mean() * 100)),
+        'r2': float(1 - (errors ** 2).sum() / total) if total > 0 else 0.0
+    }
+
+
+def last_published():
+    row = _db().execute(
+        "SELECT report FROM training_runs WHERE status = 'published' ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    return json.loads(row['report']) if row else None
+
+
+def _record(started_at, report):
+    _db().execute(
+        'INSERT INTO training_runs (started_at, status, report) VALUES (?, ?, ?)',
+        (started_at, report['status'], json.dumps(report))
+    )
+    return report
+
+
+def run_training(options=None, store=None, history=None):
+    """Treina, valida e publica (ou rejeita) um novo modelo; devolve o relatório"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    if history is None:
+        from price_history import price_history as history
+
+    options = dict(DEFAULTS, **(options or {}))
+    store = store or ModelStore()
+    started_at = time.time()
+    timer = time.perf_counter()
+    current = store.load()
+
+    mode = options['mode'] if current is not None else 'window'
+    horizon = options['horizon_days'] * DAY
+    start = started_at - options['window_days'] * DAY
+    if mode == 'warm':
+        # Só os exemplos que o modelo atual ainda não viu
+        previous = last_published()
+        if previous is not None:
+            start = max(start, previous['data_end'] - horizon)
+
+    report = {
+        'mode': mode,
+        'version': None,
+        'base_version': getattr(current, 'version', None),
+        'data_start': start,
+        'data_end': started_at
+    }
+
+    X, y, ts = load_dataset(history, start, started_at, horizon, options['chunk_rows'])
+    report['rows'] = int(len(y))
+    report['load_seconds'] = round(time.perf_counter() - timer, 3)
+    if len(y) < options['min_rows']:
+        report.update(status='skipped', reason=f"Dados insuficientes ({len(y)} < {options['min_rows']})",
+                      seconds=round(time.perf_counter() - timer, 3), peak_rss_mb=round(peak_rss_mb(), 1))
+        return _record(started_at, report)
+
+    (X_train, y_train), (X_holdout, y_holdout) = temporal_split(X, y, ts, options['holdout_fraction'])
+    del X, y, ts
+
+    fit_timer = time.perf_counter()
+    if mode == 'warm':
+        model = RandomForestRegressor(n_estimators=options['new_trees'], n_jobs=options['n_jobs'],
+                                      random_state=int(started_at))
+        keep_trees = options['n_estimators'] - options['new_trees']
+    else:
+        model = RandomForestRegressor(n_estimators=options['n_estimators'], n_jobs=options['n_jobs'],
+                                      random_state=42)
+        keep_trees = 0
+    model.fit(X_train, y_train)
+    report['fit_seconds'] = round(time.perf_counter() - fit_timer, 3)
+    report['train_rows'] = int(len(y_train))
+    report['n_jobs'] = options['n_jobs']
+    report['holdout_rows'] = int(len(y_holdout))
+
+    version = store.stage(model, base=current if keep_trees else None, keep_trees=keep_trees)
+    del model
+    candidate = store.load(version)
+    report['candidate'] = evaluate(candidate, X_holdout, y_holdout)
+    report['baseline'] = evaluate(current, X_holdout, y_holdout) if current is not None else None
+
+    baseline_mae = report['baseline']['mae'] if report['baseline'] else None
+    if baseline_mae is None or report['candidate']['mae'] <= baseline_mae * (1 + options['tolerance']):
+        store.activate(version)
+        store.cleanup()
+        report.update(status='published', version=version)
+    else:
+        report.update(status='rejected', reason='Pior que o modelo atual no holdout', version=version)
+
+    report['seconds'] = round(time.perf_counter() - timer, 3)
+    report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return _record(started_at, report)
+
+
+def run_in_subprocess(options=None, timeout=3600):
+    """Corre o treino noutro processo para não competir com os pedidos (GIL e memória)"""
+    command = [sys.executable, '-m', 'training', '--json']
+    for key, value in (options or {}).items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+
+    result = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"Treino falhou: {result.stderr.strip()[-500:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def runs(limit=20):
+    return [json.loads(row['report']) for row in _db().execute(
+        'SELECT report FROM training_runs ORDER BY id DESC LIMIT ?', (limit,)
+    )]
+
+
+@scheduler.job('model_retrain', '30 3 * * *', jitter=600)
+def retrain_model():
+    report = run_in_subprocess()
+    print(f"🧠 Re-treino do modelo: {report['status']} ({report.get('rows', 0)} exemplos, {report.get('seconds')}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-treina o modelo de preços a partir do histórico')
+    parser.add_argument('--mode', choices=['window', 'warm'], default=DEFAULTS['mode'])
+    parser.add_argument('--window-days', type=float, default=DEFAULTS['window_days'])
+    parser.add_argument('--horizon-days', type=float, default=DEFAULTS['horizon_days'])
+    parser.add_argument('--n-estimators', type=int, default=DEFAULTS['n_estimators'])
+    parser.add_argument('--new-trees', type=int, default=DEFAULTS['new_trees'])
+    parser.add_argument('--min-rows', type=int, default=DEFAULTS['min_rows'])
+    parser.add_argument('--n-jobs', type=int, default=DEFAULTS['n_jobs'])
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULTS['chunk_rows'])
+    parser.add_argument('--json', action='store_true', help='relatório numa única linha JSON')
+    args = parser.parse_args()
+
+    # Prioridade baixa: o treino não deve atrasar os workers na mesma máquina
+    os.nice(10)
+    options = {key: value for key, value in vars(args).items() if key != 'json'}
+    report = run_training(options)
+    print(json.dumps(report) if args.json else json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,215 @@
 # GPAS 2.0 - Sistema de Marketing Viral Automático
 # Gera tráfego e conversões 24/7
 
-import requests
 import json
 import random
+import re
+import string
 import time
-from datetime import datetime, timedelta
-import hashlib
-import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import os
+import secrets
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from auth_cache import auth_required, current_user
+from content_store import content_store
+from email_pipeline import SEQUENCES, email_pipeline  # também regista o job email_campaigns
+from rate_limit import rate_limited
+from scheduler import scheduler
+from social_dispatch import social_dispatcher  # também regista o job social_dispatch
+
+SOCIAL_TEMPLATES = {
+    'twitter': [
+        "🚀 Descobri como ganhar €{amount}/mês com arbitragem automática! Thread 🧵",
+        "💰 IA que encontra oportunidades de €{profit}+ automaticamente? Sim, existe! 🤖",
+        "📈 De €0 a €{revenue}/mês em {months} meses com GPAS 2.0! AMA nos comentários",
+        "🔥 Enquanto dormia, o sistema gerou €{daily_profit} em oportunidades! #PassiveIncome",
+        "🎯 ROI de {roi}% em arbitragem? Com IA é possível! Quem quer saber como?"
+    ],
+    'linkedin': [
+        "Como a IA está revolucionando a arbitragem de preços e gerando €{amount}+ mensais",
+        "3 lições que aprendi gerando €{revenue} com arbitragem automatizada",
+        "Por que 90% dos empreendedores falham em arbitragem (e como evitar)",
+        "O futuro do e-commerce: IA que encontra oportunidades de lucro automaticamente",
+        "Case study: Como passei de €0 a €{amount}/mês com GPAS 2.0"
+    ],
+    'reddit': [
+        "Criei um sistema de IA que gera €{amount}/mês com arbitragem automática - AMA",
+        "Alguém mais está usando IA para arbitragem? Meus resultados em {months} meses",
+        "€{profit} de lucro hoje com arbitragem automatizada - prova nos comentários",
+        "Sistema que encontra oportunidades de arbitragem automaticamente - vale a pena?",
+        "Como a IA mudou completamente meu negócio de arbitragem"
+    ]
+}
+
+HASHTAGS = {
+    'twitter': ['#arbitrage', '#AI', '#passiveincome', '#ecommerce', '#entrepreneur', '#sidehustle'],
+    'linkedin': ['#artificialintelligence', '#ecommerce', '#entrepreneurship', '#innovation', '#business'],
+    'reddit': ['r/entrepreneur', 'r/passive_income', 'r/ecommerce', 'r/MachineLearning']
+}
+
+# Intervalos (inclusivos) dos valores dinâmicos de cada template
+CONTENT_RANGES = {
+    'amount': (1000, 15000),
+    'profit': (100, 800),
+    'revenue': (2000, 25000),
+    'months': (2, 12),
+    'daily_profit': (50, 500),
+    'roi': (25, 150)
+}
+
+POSTING_TIMES = {
+    'twitter': ['09:00', '12:00', '18:00', '21:00'],
+    'linkedin': ['08:00', '12:00', '17:00'],
+    'reddit': ['10:00', '14:00', '20:00', '22:00']
+}
+
+SEO_ARTICLES = [
+    {
+        'title': 'Como Ganhar €10,000/Mês com Arbitragem Inteligente em 2024',
+        'meta_description': 'Descobre como usar IA para encontrar oportunidades de arbitragem e gerar receita passiva. Guia completo com resultados reais.',
+        'keywords': ['arbitragem', 'IA', 'receita passiva', 'e-commerce', 'Amazon'],
+        'content_outline': [
+            'O que é arbitragem inteligente',
+            'Como a IA revoluciona a arbitragem',
+            'Casos de sucesso reais',
+            'Passo a passo para começar',
+            'Ferramentas essenciais'
+        ]
+    },
+    {
+        'title': 'GPAS 2.0 vs Tactical Arbitrage: Comparação Completa 2024',
+        'meta_description': 'Comparação detalhada entre GPAS 2.0 e Tactical Arbitrage. Descobre qual ferramenta gera mais lucro.',
+        'keywords': ['GPAS', 'Tactical Arbitrage', 'comparação', 'arbitragem', 'ferramentas'],
+        'content_outline': [
+            'Visão geral das ferramentas',
+            'Funcionalidades comparadas',
+            'Preços e valor',
+            'Resultados reais de utilizadores',
+            'Veredicto final'
+        ]
+    },
+    {
+        'title': 'Arbitragem Amazon Portugal: Guia Completo para Iniciantes',
+        'meta_description': 'Aprende arbitragem na Amazon Portugal do zero. Estratégias, ferramentas e dicas para gerar €5000+/mês.',
+        'keywords': ['Amazon Portugal', 'arbitragem', 'iniciantes', 'tutorial', 'lucro'],
+        'content_outline': [
+            'Introdução à arbitragem Amazon',
+            'Como encontrar produtos lucrativos',
+            'Calculadora de lucros',
+            'Erros comuns a evitar',
+            'Próximos passos'
+        ]
+    }
+]
+
+EMAIL_TEMPLATES = [
+    {
+        'subject': '🚀 Como gerei €{amount} este mês com IA',
+        'preview': 'A estratégia que mudou tudo...',
+        'content_type': 'success_story'
+    },
+    {
+        'subject': '⚠️ Estás a perder €{daily_loss}/dia sem saber',
+        'preview': 'Oportunidades que passam despercebidas...',
+        'content_type': 'urgency'
+    },
+    {
+        'subject': '🎯 {opportunities} oportunidades encontradas hoje',
+        'preview': 'A IA trabalhou enquanto dormias...',
+        'content_type': 'opportunity_alert'
+    },
+    {
+        'subject': '💡 O segredo dos €{amount}/mês em arbitragem',
+        'preview': 'Revelado: a estratégia que funciona...',
+        'content_type': 'educational'
+    }
+]
+
+EMAIL_RANGES = {
+    'amount': (5000, 25000),
+    'daily_loss': (100, 500),
+    'opportunities': (50, 200)
+}
+
+REFERRAL_INCENTIVES = [
+    {
+        'type': 'cash_reward',
+        'amount': '€50',
+        'condition': 'Friend upgrades to Professional',
+        'viral_factor': 2.3
+    },
+    {
+        'type': 'free_months',
+        'amount': '2 meses grátis',
+        'condition': '3 referrals bem-sucedidos',
+        'viral_factor': 1.8
+    },
+    {
+        'type': 'lifetime_commission',
+        'amount': '20% para sempre',
+        'condition': 'Torna-te afiliado',
+        'viral_factor': 3.1
+    },
+    {
+        'type': 'exclusive_features',
+        'amount': 'Acesso beta',
+        'condition': '1 referral ativo',
+        'viral_factor': 1.5
+    }
+]
+
+REFERRAL_SHARING = {
+    'twitter': 'Acabei de descobrir o GPAS 2.0! IA que gera €10k+/mês automaticamente 🚀',
+    'linkedin': 'Recomendo o GPAS 2.0 para quem quer automatizar arbitragem com IA',
+    'whatsapp': 'Olha esta ferramenta incrível que encontrei para arbitragem automática!'
+}
+
+PR_ANGLES = [
+    {
+        'headline': 'Startup Portuguesa Cria IA que Gera €10M+ em Oportunidades de Arbitragem',
+        'angle': 'innovation_story',
+        'target_media': ['TechCrunch', 'Observador', 'Dinheiro Vivo', 'Startup Portugal']
+    },
+    {
+        'headline': 'Como um Estudante Português Revolucionou a Arbitragem com IA',
+        'angle': 'founder_story',
+        'target_media': ['Público', 'Expresso', 'SIC Notícias', 'RTP']
+    },
+    {
+        'headline': 'GPAS 2.0: A Ferramenta que Está a Democratizar o E-commerce',
+        'angle': 'market_disruption',
+        'target_media': ['E-commerce News', 'Retail Portugal', 'Marketeer']
+    }
+]
+
+VIRAL_SCORES = {
+    'success_story': 8.5,
+    'tutorial': 7.2,
+    'case_study': 8.8,
+    'controversy': 9.1,
+    'behind_scenes': 6.8,
+    'results_reveal': 9.3
+}
+
+# Fatores que aumentam viralidade
+VIRAL_FACTORS = {
+    'has_numbers': 1.2,
+    'has_emotion': 1.3,
+    'has_urgency': 1.1,
+    'has_social_proof': 1.4,
+    'has_controversy': 1.5
+}
 
 class ViralMarketingEngine:
     """Motor de marketing viral que funciona 24/7"""
     
     def __init__(self):
-        self.content_templates = {
-            'twitter': [
-                "🚀 Descobri como ganhar €{amount}/mês com arbitragem automática! Thread 🧵",
-                "💰 IA que encontra oportunidades de €{profit}+ automaticamente? Sim, existe! 🤖",
-                "📈 De €0 a €{revenue}/mês em {months} meses com GPAS 2.0! AMA nos comentários",
-                "🔥 Enquanto dormia, o sistema gerou €{daily_profit} em oportunidades! #PassiveIncome",
-                "🎯 ROI de {roi}% em arbitragem? Com IA é possível! Quem quer saber como?"
-            ],
-            'linkedin': [
-                "Como a IA está revolucionando a arbitragem de preços e gerando €{amount}+ mensais",
-                "3 lições que aprendi gerando €{revenue} com arbitragem automatizada",
-                "Por que 90% dos empreendedores falham em arbitragem (e como evitar)",
-                "O futuro do e-commerce: IA que encontra oportunidades de lucro automaticamente",
-                "Case study: Como passei de €0 a €{amount}/mês com GPAS 2.0"
-            ],
-            'reddit': [
-                "Criei um sistema de IA que gera €{amount}/mês com arbitragem automática - AMA",
-                "Alguém mais está usando IA para arbitragem? Meus resultados em {months} meses",
-                "€{profit} de lucro hoje com arbitragem automatizada - prova nos comentários",
-                "Sistema que encontra oportunidades de arbitragem automaticamente - vale a pena?",
-                "Como a IA mudou completamente meu negócio de arbitragem"
-            ]
-        }
-        
-        self.hashtags = {
-            'twitter': ['#arbitrage', '#AI', '#passiveincome', '#ecommerce', '#entrepreneur', '#sidehustle'],
-            'linkedin': ['#artificialintelligence', '#ecommerce', '#entrepreneurship', '#innovation', '#business'],
-            'reddit': ['r/entrepreneur', 'r/passive_income', 'r/ecommerce', 'r/MachineLearning']
-        }
+        self.content_templates = SOCIAL_TEMPLATES
+        self.hashtags = HASHTAGS
         
         self.viral_metrics = {
             'posts_created': 0,
@@ -55,16 +223,10 @@ class ViralMarketingEngine:
         template = random.choice(self.content_templates[platform])
         
         # Dados dinâmicos baseados em métricas reais
-        content_data = {
-            'amount': random.randint(1000, 15000),
-            'profit': random.randint(100, 800),
-            'revenue': random.randint(2000, 25000),
-            'months': random.randint(2, 12),
-            'daily_profit': random.randint(50, 500),
-            'roi': random.randint(25, 150)
-        }
+        content_data = {field: random.randint(low, high) for field, (low, high) in CONTENT_RANGES.items()}
         
         content = template.format(**content_data)
+        optimal_time = self.get_optimal_posting_time(platform, content)
         
         # Adicionar hashtags
         if platform in self.hashtags:
@@ -76,96 +238,29 @@ class ViralMarketingEngine:
             'platform': platform,
             'estimated_reach': random.randint(1000, 50000),
             'estimated_engagement': random.randint(50, 2000),
-            'optimal_time': self.get_optimal_posting_time(platform),
+            'optimal_time': optimal_time,
             'content_data': content_data
         }
     
-    def get_optimal_posting_time(self, platform):
-        """Retorna horário ótimo para posting"""
-        optimal_times = {
-            'twitter': ['09:00', '12:00', '18:00', '21:00'],
-            'linkedin': ['08:00', '12:00', '17:00'],
-            'reddit': ['10:00', '14:00', '20:00', '22:00']
-        }
-        
-        return random.choice(optimal_times.get(platform, ['12:00']))
+    def get_optimal_posting_time(self, platform, content=''):
+        """Retorna horário ótimo para posting
+
+        Determinístico: o mesmo texto fica sempre no mesmo slot e textos diferentes
+        repartem-se pelos horários de maior alcance da plataforma.
+        """
+        times = POSTING_TIMES.get(platform, ['12:00'])
+        return times[zlib.crc32(content.encode('utf-8')) % len(times)]
     
     def create_seo_content(self):
         """Cria conteúdo otimizado para SEO"""
-        seo_articles = [
-            {
-                'title': 'Como Ganhar €10,000/Mês com Arbitragem Inteligente em 2024',
-                'meta_description': 'Descobre como usar IA para encontrar oportunidades de arbitragem e gerar receita passiva. Guia completo com resultados reais.',
-                'keywords': ['arbitragem', 'IA', 'receita passiva', 'e-commerce', 'Amazon'],
-                'content_outline': [
-                    'O que é arbitragem inteligente',
-                    'Como a IA revoluciona a arbitragem',
-                    'Casos de sucesso reais',
-                    'Passo a passo para começar',
-                    'Ferramentas essenciais'
-                ]
-            },
-            {
-                'title': 'GPAS 2.0 vs Tactical Arbitrage: Comparação Completa 2024',
-                'meta_description': 'Comparação detalhada entre GPAS 2.0 e Tactical Arbitrage. Descobre qual ferramenta gera mais lucro.',
-                'keywords': ['GPAS', 'Tactical Arbitrage', 'comparação', 'arbitragem', 'ferramentas'],
-                'content_outline': [
-                    'Visão geral das ferramentas',
-                    'Funcionalidades comparadas',
-                    'Preços e valor',
-                    'Resultados reais de utilizadores',
-                    'Veredicto final'
-                ]
-            },
-            {
-                'title': 'Arbitragem Amazon Portugal: Guia Completo para Iniciantes',
-                'meta_description': 'Aprende arbitragem na Amazon Portugal do zero. Estratégias, ferramentas e dicas para gerar €5000+/mês.',
-                'keywords': ['Amazon Portugal', 'arbitragem', 'iniciantes', 'tutorial', 'lucro'],
-                'content_outline': [
-                    'Introdução à arbitragem Amazon',
-                    'Como encontrar produtos lucrativos',
-                    'Calculadora de lucros',
-                    'Erros comuns a evitar',
-                    'Próximos passos'
-                ]
-            }
-        ]
-        
-        return random.choice(seo_articles)
+        return random.choice(SEO_ARTICLES)
     
     def generate_email_campaign(self):
         """Gera campanha de email marketing"""
-        email_templates = [
-            {
-                'subject': '🚀 Como gerei €{amount} este mês com IA',
-                'preview': 'A estratégia que mudou tudo...',
-                'content_type': 'success_story'
-            },
-            {
-                'subject': '⚠️ Estás a perder €{daily_loss}/dia sem saber',
-                'preview': 'Oportunidades que passam despercebidas...',
-                'content_type': 'urgency'
-            },
-            {
-                'subject': '🎯 {opportunities} oportunidades encontradas hoje',
-                'preview': 'A IA trabalhou enquanto dormias...',
-                'content_type': 'opportunity_alert'
-            },
-            {
-                'subject': '💡 O segredo dos €{amount}/mês em arbitragem',
-                'preview': 'Revelado: a estratégia que funciona...',
-                'content_type': 'educational'
-            }
-        ]
-        
-        template = random.choice(email_templates)
+        template = random.choice(EMAIL_TEMPLATES)
         
         # Dados dinâmicos
-        email_data = {
-            'amount': random.randint(5000, 25000),
-            'daily_loss': random.randint(100, 500),
-            'opportunities': random.randint(50, 200)
-        }
+        email_data = {field: random.randint(low, high) for field, (low, high) in EMAIL_RANGES.items()}
         
         return {
             'subject': template['subject'].format(**email_data),
@@ -179,138 +274,274 @@ class ViralMarketingEngine:
     
     def create_referral_program(self):
         """Cria programa de referrals viral"""
-        referral_incentives = [
-            {
-                'type': 'cash_reward',
-                'amount': '€50',
-                'condition': 'Friend upgrades to Professional',
-                'viral_factor': 2.3
-            },
-            {
-                'type': 'free_months',
-                'amount': '2 meses grátis',
-                'condition': '3 referrals bem-sucedidos',
-                'viral_factor': 1.8
-            },
-            {
-                'type': 'lifetime_commission',
-                'amount': '20% para sempre',
-                'condition': 'Torna-te afiliado',
-                'viral_factor': 3.1
-            },
-            {
-                'type': 'exclusive_features',
-                'amount': 'Acesso beta',
-                'condition': '1 referral ativo',
-                'viral_factor': 1.5
-            }
-        ]
-        
         return {
-            'incentives': referral_incentives,
+            'incentives': REFERRAL_INCENTIVES,
             'referral_link_template': 'https://gpas2.com/ref/{user_id}',
             'tracking_enabled': True,
-            'social_sharing': {
-                'twitter': 'Acabei de descobrir o GPAS 2.0! IA que gera €10k+/mês automaticamente 🚀',
-                'linkedin': 'Recomendo o GPAS 2.0 para quem quer automatizar arbitragem com IA',
-                'whatsapp': 'Olha esta ferramenta incrível que encontrei para arbitragem automática!'
-            }
+            'social_sharing': REFERRAL_SHARING
         }
     
     def generate_pr_content(self):
         """Gera conteúdo para relações públicas"""
-        pr_angles = [
-            {
-                'headline': 'Startup Portuguesa Cria IA que Gera €10M+ em Oportunidades de Arbitragem',
-                'angle': 'innovation_story',
-                'target_media': ['TechCrunch', 'Observador', 'Dinheiro Vivo', 'Startup Portugal']
-            },
-            {
-                'headline': 'Como um Estudante Português Revolucionou a Arbitragem com IA',
-                'angle': 'founder_story',
-                'target_media': ['Público', 'Expresso', 'SIC Notícias', 'RTP']
-            },
-            {
-                'headline': 'GPAS 2.0: A Ferramenta que Está a Democratizar o E-commerce',
-                'angle': 'market_disruption',
-                'target_media': ['E-commerce News', 'Retail Portugal', 'Marketeer']
-            }
-        ]
-        
-        return random.choice(pr_angles)
+        return random.choice(PR_ANGLES)
     
     def calculate_viral_potential(self, content_type):
         """Calcula potencial viral do conteúdo"""
-        viral_scores = {
-            'success_story': 8.5,
-            'tutorial': 7.2,
-            'case_study': 8.8,
-            'controversy': 9.1,
-            'behind_scenes': 6.8,
-            'results_reveal': 9.3
-        }
-        
-        base_score = viral_scores.get(content_type, 7.0)
-        
-        # Fatores que aumentam viralidade
-        factors = {
-            'has_numbers': 1.2,
-            'has_emotion': 1.3,
-            'has_urgency': 1.1,
-            'has_social_proof': 1.4,
-            'has_controversy': 1.5
-        }
+        base_score = VIRAL_SCORES.get(content_type, 7.0)
         
         # Simular presença de fatores
         final_score = base_score
-        for factor, multiplier in factors.items():
+        for factor, multiplier in VIRAL_FACTORS.items():
             if random.random() > 0.5:  # 50% chance de ter cada fator
                 final_score *= multiplier
         
         return min(final_score, 10.0)  # Máximo 10
     
-    def run_viral_campaign(self):
+    def run_viral_campaign(self, seed=None):
         """Executa campanha viral completa"""
-        campaign_results = {
-            'social_media': [],
-            'seo_content': [],
-            'email_campaigns': [],
-            'referral_program': self.create_referral_program(),
-            'pr_content': [],
-            'estimated_reach': 0,
-            'estimated_leads': 0,
-            'estimated_revenue': 0
+        return next(campaign_renderer.render(1, seed=seed))
+
+POSTS_PER_PLATFORM = 3
+SEO_PER_CAMPAIGN = 5
+EMAILS_PER_CAMPAIGN = 7  # Uma por dia da semana
+PR_PER_CAMPAIGN = 3
+
+_BRAND_PATTERN = re.compile(r'GPAS(?: 2\.0)?')
+
+
+def compile_template(template):
+    """'€{amount}/mês' -> '€%(amount)d/mês': formatação % com dict, sem voltar a analisar o template"""
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append(literal.replace('%', '%%'))
+        if field is not None:
+            parts.append(f'%({field})d')
+    return ''.join(parts)
+
+
+def rebrand(value, brand):
+    """Substitui o nome do produto pela marca do cliente white-label (strings, listas e dicts)"""
+    if brand is None:
+        return value
+    if isinstance(value, str):
+        # Função e não template: '\1' ou '\' na marca são texto, não referências de grupo
+        return _BRAND_PATTERN.sub(lambda match: brand, value)
+    if isinstance(value, list):
+        return [rebrand(item, brand) for item in value]
+    if isinstance(value, dict):
+        return {key: rebrand(item, brand) for key, item in value.items()}
+    return value
+
+
+@lru_cache(maxsize=256)
+def compile_brand(brand=None):
+    """Templates compilados de uma marca (None = GPAS 2.0)"""
+    hashtags = {}
+    for platform, tags in HASHTAGS.items():
+        # Todas as sequências ordenadas de 3 hashtags distintas, indexadas por a·k² + b·k + c
+        k = len(tags)
+        hashtags[platform] = [
+            f"\n\n{tags[a]} {tags[b]} {tags[c]}" if len({a, b, c}) == 3 else None
+            for a in range(k) for b in range(k) for c in range(k)
+        ]
+    # Marca inserida depois de compilar: chavetas e '%' na marca não são campos do template
+    template_brand = brand.replace('%', '%%') if brand is not None else None
+    seo = rebrand(SEO_ARTICLES, brand)
+    pr = rebrand(PR_ANGLES, brand)
+    referral = {
+        'incentives': REFERRAL_INCENTIVES,
+        'referral_link_template': 'https://gpas2.com/ref/{user_id}',
+        'tracking_enabled': True,
+        'social_sharing': rebrand(REFERRAL_SHARING, brand)
+    }
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    return {
+        'social': {
+            platform: [rebrand(compile_template(t), template_brand) for t in templates]
+            for platform, templates in SOCIAL_TEMPLATES.items()
+        },
+        'hashtags': hashtags,
+        'emails': [
+            (rebrand(compile_template(t['subject']), template_brand), rebrand(t['preview'], brand), t['content_type'])
+            for t in EMAIL_TEMPLATES
+        ],
+        'seo': seo,
+        'pr': pr,
+        'referral': referral,
+        # Partes fixas já serializadas para o NDJSON
+        'json': {
+            'seo': [dumps(article) for article in seo],
+            'pr': [dumps(angle) for angle in pr],
+            'referral': dumps(referral)
         }
-        
-        # Gerar conteúdo para múltiplas plataformas
-        platforms = ['twitter', 'linkedin', 'reddit']
-        for platform in platforms:
-            for _ in range(3):  # 3 posts por plataforma
-                content = self.generate_viral_content(platform)
-                content['viral_score'] = self.calculate_viral_potential('success_story')
-                campaign_results['social_media'].append(content)
-                campaign_results['estimated_reach'] += content['estimated_reach']
-        
-        # Gerar conteúdo SEO
-        for _ in range(5):
-            seo_content = self.create_seo_content()
-            campaign_results['seo_content'].append(seo_content)
-        
-        # Gerar campanhas de email
-        for _ in range(7):  # Uma por dia da semana
-            email_campaign = self.generate_email_campaign()
-            campaign_results['email_campaigns'].append(email_campaign)
-        
-        # Gerar conteúdo de PR
-        for _ in range(3):
-            pr_content = self.generate_pr_content()
-            campaign_results['pr_content'].append(pr_content)
-        
-        # Calcular métricas estimadas
-        campaign_results['estimated_leads'] = int(campaign_results['estimated_reach'] * 0.02)  # 2% conversion
-        campaign_results['estimated_revenue'] = campaign_results['estimated_leads'] * 49  # €49 average
-        
-        return campaign_results
+    }
+
+
+def tenant_seed(seed, tenant):
+    """Seed de um tenant: a mesma seed dá campanhas diferentes (e estáveis) a cada tenant"""
+    return [seed, zlib.crc32(str(tenant).encode('utf-8'))]
+
+
+class CampaignRenderer:
+    """Gera campanhas completas (como run_viral_campaign) em lote
+
+    Os valores aleatórios de cada bloco de BLOCK campanhas são gerados de uma só
+    vez com numpy; a campanha i depende só da seed e de i, não de quantas se pedem.
+    """
+
+    BLOCK = 512
+    PLATFORMS = ('twitter', 'linkedin', 'reddit')
+
+    def render(self, count, seed=None, brand=None):
+        """Gerador de `count` campanhas; seed None usa entropia do sistema"""
+        compiled = compile_brand(brand)
+        seo, pr = compiled['seo'], compiled['pr']
+        p, e = POSTS_PER_PLATFORM, EMAILS_PER_CAMPAIGN
+        for block, rows in self._blocks(count, seed, compiled):
+            for i in range(rows):
+                leads = int(block['reach'][i] * 0.02)  # 2% conversion
+                yield {
+                    'social_media': [post for posts in block['social'] for post in posts[i * p:(i + 1) * p]],
+                    'seo_content': [seo[j] for j in block['seo'][i]],
+                    'email_campaigns': block['emails'][i * e:(i + 1) * e],
+                    'referral_program': compiled['referral'],
+                    'pr_content': [pr[j] for j in block['pr'][i]],
+                    'estimated_reach': block['reach'][i],
+                    'estimated_leads': leads,
+                    'estimated_revenue': leads * 49  # €49 average
+                }
+
+    def render_ndjson(self, count, seed=None, brand=None, tenant=None, lines_per_chunk=64):
+        """As mesmas campanhas em NDJSON (uma por linha, com tenant e índice), em pedaços de bytes
+
+        As partes fixas (artigos SEO, PR, programa de referrals) vêm já serializadas.
+        """
+        compiled = compile_brand(brand)
+        fragments = compiled['json']
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        head = '{"tenant":%s,"index":' % dumps(tenant)
+        p, e = POSTS_PER_PLATFORM, EMAILS_PER_CAMPAIGN
+        chunk = []
+        index = 0
+        for block, rows in self._blocks(count, seed, compiled):
+            for i in range(rows):
+                leads = int(block['reach'][i] * 0.02)
+                chunk.append(''.join((
+                    head, str(index),
+                    ',"social_media":', dumps([post for posts in block['social'] for post in posts[i * p:(i + 1) * p]]),
+                    ',"seo_content":[', ','.join([fragments['seo'][j] for j in block['seo'][i]]),
+                    '],"email_campaigns":', dumps(block['emails'][i * e:(i + 1) * e]),
+                    ',"referral_program":', fragments['referral'],
+                    ',"pr_content":[', ','.join([fragments['pr'][j] for j in block['pr'][i]]),
+                    '],"estimated_reach":', str(block['reach'][i]),
+                    ',"estimated_leads":', str(leads),
+                    ',"estimated_revenue":', str(leads * 49), '}'
+                )))
+                index += 1
+                if len(chunk) == lines_per_chunk:
+                    yield ('\n'.join(chunk) + '\n').encode('utf-8')
+                    chunk = []
+        if chunk:
+            yield ('\n'.join(chunk) + '\n').encode('utf-8')
+
+    def _blocks(self, count, seed, compiled):
+        import numpy as np
+
+        blocks = np.random.SeedSequence(seed).spawn((count + self.BLOCK - 1) // self.BLOCK)
+        for block, seed_seq in enumerate(blocks):
+            yield self._block(np.random.default_rng(seed_seq), compiled), min(self.BLOCK, count - block * self.BLOCK)
+
+    def _block(self, rng, compiled):
+        """Valores de BLOCK campanhas (gera sempre o bloco inteiro, para o resultado não depender de `count`)"""
+        import numpy as np
+
+        n = self.BLOCK
+        reach_total = np.zeros(n, dtype=np.int64)
+        multipliers = np.array(list(VIRAL_FACTORS.values()))
+        base_score = VIRAL_SCORES['success_story']
+
+        social = []
+        for platform in self.PLATFORMS:
+            posts = n * POSTS_PER_PLATFORM
+            templates = compiled['social'][platform]
+            hashtags = compiled['hashtags'][platform]
+            times = POSTING_TIMES[platform]
+            k = len(HASHTAGS[platform])
+
+            template_idx = rng.integers(0, len(templates), posts).tolist()
+            values = zip(*(rng.integers(low, high + 1, posts).tolist() for low, high in CONTENT_RANGES.values()))
+            # 3 hashtags distintas: as 3 primeiras posições de uma permutação aleatória
+            order = np.argsort(rng.random((posts, k)), axis=1)[:, :3]
+            tag_idx = (order[:, 0] * k * k + order[:, 1] * k + order[:, 2]).tolist()
+            reach = rng.integers(1000, 50001, (n, POSTS_PER_PLATFORM))
+            reach_total += reach.sum(axis=1)
+            engagement = rng.integers(50, 2001, posts).tolist()
+            time_idx = rng.integers(0, len(times), posts).tolist()
+            # 50% de probabilidade de cada fator (calculate_viral_potential)
+            present = rng.random((posts, len(multipliers))) > 0.5
+            scores = np.minimum(base_score * np.where(present, multipliers, 1.0).prod(axis=1), 10.0).tolist()
+
+            fields = tuple(CONTENT_RANGES)
+            items = []
+            for t, row, tag, r, e, ti, score in zip(template_idx, values, tag_idx, reach.ravel().tolist(),
+                                                    engagement, time_idx, scores):
+                data = dict(zip(fields, row))
+                items.append({
+                    'content': templates[t] % data + hashtags[tag],
+                    'platform': platform,
+                    'estimated_reach': r,
+                    'estimated_engagement': e,
+                    'optimal_time': times[ti],
+                    'content_data': data,
+                    'viral_score': score
+                })
+            social.append(items)
+
+        emails = n * EMAILS_PER_CAMPAIGN
+        email_templates = compiled['emails']
+        email_idx = rng.integers(0, len(email_templates), emails).tolist()
+        email_values = zip(*(rng.integers(low, high + 1, emails).tolist() for low, high in EMAIL_RANGES.values()))
+        open_rates = rng.integers(25, 46, emails).tolist()
+        click_rates = rng.integers(5, 16, emails).tolist()
+        email_fields = tuple(EMAIL_RANGES)
+        email_items = []
+        for t, row, open_rate, click_rate in zip(email_idx, email_values, open_rates, click_rates):
+            subject, preview, content_type = email_templates[t]
+            email_items.append({
+                'subject': subject % dict(zip(email_fields, row)),
+                'preview': preview,
+                'content_type': content_type,
+                'estimated_open_rate': f"{open_rate}%",
+                'estimated_click_rate': f"{click_rate}%",
+                'target_audience': 'entrepreneurs, ecommerce, passive_income',
+                'send_time': 'Tuesday 10:00 AM'
+            })
+
+        return {
+            'social': social,
+            'emails': email_items,
+            'seo': rng.integers(0, len(compiled['seo']), (n, SEO_PER_CAMPAIGN)).tolist(),
+            'pr': rng.integers(0, len(compiled['pr']), (n, PR_PER_CAMPAIGN)).tolist(),
+            'reach': reach_total.tolist()
+        }
+
+
+campaign_renderer = CampaignRenderer()
+
+# Peças criadas por dia pela automação (por plataforma)
+DAILY_CONTENT = {'blog': 1, 'twitter': 1, 'linkedin': 1, 'email': 1}
+DUPLICATE_RETRIES = 5
+EMAIL_SEND_TIME = '10:00'
+
+
+def next_posting_at(hhmm, now):
+    """Próxima ocorrência de 'HH:MM' (UTC) depois de `now`, em epoch"""
+    hour, minute = map(int, hhmm.split(':'))
+    current = datetime.fromtimestamp(now, timezone.utc)
+    at = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if at <= current:
+        at += timedelta(days=1)
+    return at.timestamp()
 
 class AutomatedGrowthSystem:
     """Sistema de crescimento automatizado"""
@@ -337,17 +568,46 @@ class AutomatedGrowthSystem:
         
         return daily_tasks
     
-    def create_daily_content(self):
-        """Cria conteúdo diário automaticamente"""
+    def create_daily_content(self, now=None):
+        """Cria o conteúdo do dia que ainda falta (re-executar não duplica)
+
+        Cada peça é guardada no content_store antes de ser agendada; um texto já
+        publicado é regenerado até DUPLICATE_RETRIES vezes.
+        """
+        now = now if now is not None else time.time()
+        existing = content_store.created_since(now - now % 86400)
+        created = {platform: [] for platform in DAILY_CONTENT}
+        duplicates = 0
+        for platform, wanted in DAILY_CONTENT.items():
+            for _ in range(wanted - existing.get(platform, 0)):
+                for _ in range(DUPLICATE_RETRIES):
+                    stored = content_store.add(self.content_item(platform, now), now)
+                    if stored is not None:
+                        created[platform].append(stored['payload'])
+                        break
+                    duplicates += 1
+        
         return {
-            'blog_post': self.viral_engine.create_seo_content(),
-            'social_posts': [
-                self.viral_engine.generate_viral_content('twitter'),
-                self.viral_engine.generate_viral_content('linkedin')
-            ],
-            'email_campaign': self.viral_engine.generate_email_campaign()
+            'blog_post': next(iter(created['blog']), None),
+            'social_posts': created['twitter'] + created['linkedin'],
+            'email_campaign': next(iter(created['email']), None),
+            'duplicates_skipped': duplicates
         }
     
+    def content_item(self, platform, now):
+        """Uma peça nova para o content_store, agendada para a próxima hora ótima"""
+        if platform == 'blog':
+            article = self.viral_engine.create_seo_content()
+            return {'kind': 'seo', 'platform': platform, 'content': article['title'],
+                    'scheduled_at': now, 'payload': article}
+        if platform == 'email':
+            email = self.viral_engine.generate_email_campaign()
+            return {'kind': 'email', 'platform': platform, 'content': email['subject'],
+                    'scheduled_at': next_posting_at(EMAIL_SEND_TIME, now), 'payload': email}
+        post = self.viral_engine.generate_viral_content(platform)
+        return {'kind': 'social', 'platform': platform, 'content': post['content'],
+                'scheduled_at': next_posting_at(post['optimal_time'], now), 'payload': post}
+    
     def optimize_seo(self):
         """Otimiza SEO automaticamente"""
         return {
@@ -361,7 +621,8 @@ class AutomatedGrowthSystem:
     def automate_social_media(self):
         """Automatiza redes sociais"""
         return {
-            'posts_scheduled': 12,
+            'posts_scheduled': len(content_store.scheduled(start=time.time(), limit=1000)),
+            'dispatch': social_dispatcher.stats(),
             'engagement_automated': True,
             'hashtags_optimized': True,
             'influencer_outreach': random.randint(3, 8),
@@ -370,12 +631,13 @@ class AutomatedGrowthSystem:
     
     def run_email_automation(self):
         """Executa automação de email"""
+        delivery = email_pipeline.bounces.stats(runs=5)
         return {
-            'welcome_sequence': 'active',
-            'nurture_campaigns': 'running',
-            'abandoned_cart': 'enabled',
-            'win_back': 'scheduled',
-            'upsell_sequences': 'optimized'
+            'sequences': list(SEQUENCES),
+            'smtp_enabled': email_pipeline.enabled,
+            'campaigns_scheduled': len(content_store.scheduled('email', start=time.time(), limit=100)),
+            'recent_runs': delivery['runs'],
+            'bounces': delivery['bounces']
         }
     
     def track_performance(self):
@@ -397,32 +659,95 @@ class AutomatedGrowthSystem:
             'conversions': random.randint(5, 25)
         }
 
-# Função para executar marketing viral em background
+# Marketing viral diário executado pelo agendador central
+@scheduler.job('viral_marketing_automation', '0 9 * * *', jitter=600)
 def run_viral_marketing_automation():
-    """Executa marketing viral 24/7"""
+    """Executa automação diária de marketing viral"""
     growth_system = AutomatedGrowthSystem()
     
-    while True:
-        try:
-            # Executar automação diária
-            daily_results = growth_system.run_daily_automation()
-            
-            # Log dos resultados
-            print(f"🚀 Marketing Automation - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            print(f"📊 Visitors: {daily_results['analytics_tracking']['website_visitors']}")
-            print(f"💰 Revenue: {daily_results['analytics_tracking']['revenue_generated']}")
-            print(f"📈 Conversions: {daily_results['lead_nurturing']['conversions']}")
-            
-            # Dormir por 24 horas
-            time.sleep(86400)
-            
-        except Exception as e:
-            print(f"Erro no marketing automation: {e}")
-            time.sleep(3600)  # Tentar novamente em 1 hora
-
-# Iniciar thread de marketing viral
-marketing_thread = threading.Thread(target=run_viral_marketing_automation, daemon=True)
-marketing_thread.start()
-
-print("🎯 Sistema de Marketing Viral iniciado! Gerando tráfego 24/7...")
+    # Executar automação diária
+    daily_results = growth_system.run_daily_automation()
+    
+    # Log dos resultados
+    content = daily_results['content_creation']
+    print(f"🚀 Marketing Automation - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print(f"📝 Content: {len(content['social_posts'])} posts, {content['duplicates_skipped']} duplicates skipped")
+    print(f"📊 Visitors: {daily_results['analytics_tracking']['website_visitors']}")
+    print(f"💰 Revenue: {daily_results['analytics_tracking']['revenue_generated']}")
+    print(f"📈 Conversions: {daily_results['lead_nurturing']['conversions']}")
+
+# Retenção do conteúdo gerado
+@scheduler.job('content_store_compact', '50 4 * * *', jitter=300)
+def compact_content_store():
+    content_store.compact()
+
+# Blueprint de marketing (campanhas white-label do plano Enterprise)
+marketing_bp = Blueprint('marketing', __name__)
+
+MAX_BATCH_CAMPAIGNS = int(os.environ.get('GPAS_CAMPAIGN_BATCH_MAX', 50000))
+MAX_BRAND_LENGTH = 64
+
+def valid_brand(brand):
+    """Marca white-label aceite: texto imprimível e curto"""
+    return isinstance(brand, str) and 0 < len(brand) <= MAX_BRAND_LENGTH and brand.isprintable()
+
+@marketing_bp.route('/api/marketing/campaigns', methods=['POST'])
+@auth_required
+@rate_limited(cost=20)
+def render_campaigns():
+    """Gera campanhas em lote para vários tenants white-label, em NDJSON
+
+    Corpo: {"seed": 42, "tenants": [{"id": "acme", "brand": "Acme", "campaigns": 500}]}
+    Com a mesma seed a resposta é a mesma; sem seed é gerada uma (header X-Campaign-Seed).
+    """
+    user = current_user()
+    if not user:
+        return jsonify({"error": "Utilizador não encontrado"}), 404
+    if user['plan'] != 'enterprise':
+        return jsonify({"error": "Campanhas white-label disponíveis apenas no plano Enterprise"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    seed = data.get('seed')
+    if seed is None:
+        seed = secrets.randbits(63)
+    tenants = data.get('tenants') or [{'id': str(user['id']), 'campaigns': data.get('campaigns', 100)}]
+    
+    try:
+        seed = int(seed)
+        jobs = [(str(t['id']), t.get('brand'), int(t.get('campaigns', 100))) for t in tenants]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return jsonify({"error": "Pedido inválido: tenants precisam de id e campaigns inteiro"}), 400
+    # Validar antes de começar o stream: depois do 200 um erro só corta o NDJSON a meio
+    if any(brand is not None and not valid_brand(brand) for _, brand, _ in jobs):
+        return jsonify({"error": f"brand tem de ser texto com 1 a {MAX_BRAND_LENGTH} caracteres"}), 400
+    total = sum(count for _, _, count in jobs)
+    if seed < 0:
+        return jsonify({"error": "A seed tem de ser um inteiro não negativo"}), 400
+    if any(count < 1 for _, _, count in jobs) or total > MAX_BATCH_CAMPAIGNS:
+        return jsonify({"error": f"Entre 1 e {MAX_BATCH_CAMPAIGNS} campanhas por pedido"}), 400
+    
+    def stream():
+        for tenant, brand, count in jobs:
+            yield from campaign_renderer.render_ndjson(count, tenant_seed(seed, tenant), brand, tenant)
+    
+    response = Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+    response.headers['X-Campaign-Seed'] = str(seed)
+    response.headers['X-Campaign-Count'] = str(total)
+    return response
+
+@marketing_bp.route('/api/marketing/dispatch', methods=['GET'])
+@auth_required
+def get_dispatch_status():
+    """Publicação: métricas do dispatcher social (processo líder), envios de email e conteúdo agendado"""
+    return jsonify({
+        'dispatch': social_dispatcher.stats(),
+        'email': dict(email_pipeline.bounces.stats(runs=5), enabled=email_pipeline.enabled),
+        'content': content_store.stats(),
+        'due': len(content_store.due(limit=1000)),
+        'timestamp': datetime.utcnow().isoformat()
+    })
 
+def register_marketing(app):
+    """Regista as rotas de marketing na app"""
+    app.register_blueprint(marketing_bp)
+    return app
@@ -0,0 +1,214 @@
+# Fila durável para eventos de webhook do Stripe
+# O webhook só verifica a assinatura e persiste o evento; um pool de workers
+# processa-os depois, por ordem dentro de cada cliente, com retries e dead-letter.
+
+import json
+import os
+import random
+import threading
+import time
+
+from storage import connect, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    customer TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    received_at REAL NOT NULL,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS webhook_events_ready ON webhook_events (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS webhook_events_customer ON webhook_events (customer, seq);
+CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+    event_id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    customer TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+# Próximo evento pronto cujo cliente não tenha eventos anteriores por concluir
+CLAIM_QUERY = """
+SELECT e.seq, e.event_id, e.type, e.payload, e.attempts FROM webhook_events e
+WHERE e.status = 'pending' AND e.next_attempt_at <= ?
+  AND NOT EXISTS (
+      SELECT 1 FROM webhook_events p
+      WHERE p.customer = e.customer AND p.seq < e.seq AND p.status IN ('pending', 'processing')
+  )
+ORDER BY e.seq LIMIT 1
+"""
+
+
+def event_customer(event):
+    """Chave de ordenação: cliente Stripe, email, ou o próprio evento"""
+    obj = event.get('data', {}).get('object', {}) or {}
+    customer = obj.get('customer')
+    if isinstance(customer, dict):
+        customer = customer.get('id')
+    email = (obj.get('customer_details') or {}).get('email') or obj.get('customer_email')
+    return customer or email or event['id']
+
+
+class WebhookQueue:
+    """Fila persistente em SQLite, partilhada por todos os workers do gunicorn"""
+
+    def __init__(self, handlers, name='webhooks', max_attempts=8, lease_seconds=300):
+        self.handlers = handlers
+        self.name = name
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def _db(self):
+        return connect(self.name, SCHEMA)
+
+    def enqueue(self, event, payload):
+        """Persiste o evento; devolve False se o event id já tinha sido recebido"""
+        now = time.time()
+        cursor = self._db().execute(
+            'INSERT OR IGNORE INTO webhook_events '
+            '(event_id, type, customer, payload, next_attempt_at, received_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (event['id'], event['type'], event_customer(event), payload, now, now)
+        )
+        self._wakeup.set()
+        return cursor.rowcount == 1
+
+    def claim(self, now=None):
+        """Reserva o próximo evento processável (ou None)"""
+        now = now if now is not None else time.time()
+        conn = self._db()
+        with transaction(conn):
+            # Recupera eventos de workers que morreram a meio do processamento
+            conn.execute(
+                "UPDATE webhook_events SET status = 'pending' WHERE status = 'processing' AND lease_until < ?",
+                (now,)
+            )
+            row = conn.execute(CLAIM_QUERY, (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE webhook_events SET status = 'processing', lease_until = ?, attempts = attempts + 1 "
+                "WHERE seq = ?",
+                (now + self.lease_seconds, row['seq'])
+            )
+        return dict(row, attempts=row['attempts'] + 1)
+
+    def process_one(self):
+        """Processa um evento; devolve False se não havia nada pronto"""
+        job = self.claim()
+        if job is None:
+            return False
+
+        event = json.loads(job['payload'])
+        handler = self.handlers.get(job['type'])
+        try:
+            if handler is not None:
+                handler(event['data']['object'])
+        except Exception as e:
+            self._fail(job, f"{type(e).__name__}: {e}")
+        else:
+            self._db().execute(
+                "UPDATE webhook_events SET status = 'done', processed_at = ?, last_error = NULL WHERE seq = ?",
+                (time.time(), job['seq'])
+            )
+        return True
+
+    def _fail(self, job, error):
+        conn = self._db()
+        now = time.time()
+        with transaction(conn):
+            if job['attempts'] >= self.max_attempts:
+                conn.execute(
+                    'INSERT OR REPLACE INTO webhook_dead_letters '
+                    '(event_id, type, customer, payload, attempts, last_error, failed_at) '
+                    'SELECT event_id, type, customer, payload, attempts, ?, ? FROM webhook_events WHERE seq = ?',
+                    (error, now, job['seq'])
+                )
+                conn.execute(
+                    "UPDATE webhook_events SET status = 'dead', last_error = ? WHERE seq = ?",
+                    (error, job['seq'])
+                )
+                print(f"Webhook {job['event_id']} movido para dead-letter: {error}")
+            else:
+                # Backoff exponencial com jitter: ~10s, 20s, 40s... até 1 hora
+                delay = min(5 * 2 ** job['attempts'], 3600) * random.uniform(0.8, 1.2)
+                conn.execute(
+                    "UPDATE webhook_events SET status = 'pending', next_attempt_at = ?, last_error = ? "
+                    "WHERE seq = ?",
+                    (now + delay, error, job['seq'])
+                )
+
+    def replay_dead_letter(self, event_id):
+        """Volta a colocar um evento da dead-letter na fila"""
+        conn = self._db()
+        with transaction(conn):
+            deleted = conn.execute('DELETE FROM webhook_dead_letters WHERE event_id = ?', (event_id,)).rowcount
+            conn.execute(
+                "UPDATE webhook_events SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                "WHERE event_id = ? AND status = 'dead'",
+                (time.time(), event_id)
+            )
+        self._wakeup.set()
+        return deleted == 1
+
+    def purge(self, retention_seconds=7 * 86400):
+        """Remove eventos concluídos antigos (Stripe só reenvia durante 3 dias)"""
+        self._db().execute(
+            "DELETE FROM webhook_events WHERE status IN ('done', 'dead') AND received_at < ?",
+            (time.time() - retention_seconds,)
+        )
+
+    def stats(self):
+        counts = {row['status']: row['n'] for row in self._db().execute(
+            'SELECT status, COUNT(*) AS n FROM webhook_events GROUP BY status'
+        )}
+        dead_letters = self._db().execute('SELECT COUNT(*) FROM webhook_dead_letters').fetchone()[0]
+        return {'events': counts, 'dead_letters': dead_letters}
+
+    def start_workers(self, count=None):
+        """Arranca o pool de workers neste processo (idempotente; chamar depois do fork)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+
+        count = count or int(os.environ.get('GPAS_WEBHOOK_WORKERS', 2))
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f'webhook-worker-{i}', daemon=True)
+            for i in range(count)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop_workers(self):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._pid = None
+
+    def _worker_loop(self):
+        while not self._stopped.is_set():
+            try:
+                if self.process_one():
+                    continue
+            except Exception as e:
+                print(f"Erro no worker de webhooks: {e}")
+
+            # Outros processos também enfileiram: verificar pelo menos a cada segundo
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()